@@ -0,0 +1,129 @@
+"""Move the event chains of sealed envelopes out of the hot `event` table.
+
+Each chain is checkpointed, written as gzipped JSONL next to the envelope's
+.audit.json (a header line with the checkpoint, then one event per line)
+and its rows are deleted. audit.events_after reads archived chains back, so
+verification and proofs work the same before and after archival.
+
+Keys carry the last archived event id. A re-archive writes a new object,
+commits the row pointing at it and only then removes the old one, so the
+recorded sha256 always matches the object it names.
+"""
+import gzip
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlmodel import Session, select, delete
+
+from . import storage
+from .audit import archived_events, checkpoint_envelope, latest_checkpoint
+from .config import EVENT_ARCHIVE_AFTER_DAYS
+from .events import lock_chain_head
+from .models import Event, EventArchive, FinalArtifact
+from .utils import sha256_bytes
+
+log = logging.getLogger(__name__)
+
+
+def archive_key(final_artifact: FinalArtifact, last_event_id: int) -> str:
+    key = final_artifact.s3_key_audit_json
+    if key.endswith(".audit.json"):
+        key = key[:-len(".audit.json")]
+    return f"{key}.events.{last_event_id}.jsonl.gz"
+
+
+def _event_row(event: Event) -> dict:
+    return {
+        "id": event.id,
+        "envelope_id": event.envelope_id,
+        "actor": event.actor,
+        "type": event.type,
+        "meta_json": event.meta_json,
+        "ip": event.ip,
+        "ua": event.ua,
+        "at": event.at.isoformat(),
+        "prev_hash": event.prev_hash,
+        "hash": event.hash,
+    }
+
+
+def archivable_envelope_ids(session: Session, older_than_days: int = EVENT_ARCHIVE_AFTER_DAYS) -> List[int]:
+    """Sealed envelopes, sealed at least `older_than_days` ago, that still have hot events."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    stmt = (
+        select(FinalArtifact.envelope_id)
+        .where(FinalArtifact.completed_at <= cutoff)
+        .where(select(Event.id).where(Event.envelope_id == FinalArtifact.envelope_id).exists())
+        .order_by(FinalArtifact.envelope_id)
+        .distinct()
+    )
+    return list(session.exec(stmt).all())
+
+
+def archive_envelope(session: Session, env_id: int) -> dict:
+    """Archive an envelope's events; re-archives (merging) if new events arrived since."""
+    final_artifact = session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == env_id)).first()
+    if final_artifact is None:
+        return {"envelope_id": env_id, "archived": False, "reason": "envelope is not sealed"}
+    report = checkpoint_envelope(session, env_id)
+    if not report["ok"]:
+        return {"envelope_id": env_id, "archived": False, "reason": "chain verification failed", "errors": report["errors"]}
+
+    # Hold the chain head so nothing is appended between reading and deleting.
+    lock_chain_head(session, env_id)
+    checkpoint = latest_checkpoint(session, env_id)
+    hot = session.exec(select(Event).where(Event.envelope_id == env_id).order_by(Event.id)).all()
+    if not hot:
+        session.rollback()
+        return {"envelope_id": env_id, "archived": False, "reason": "no events to archive"}
+    if hot[-1].id != checkpoint.last_event_id:
+        session.rollback()
+        return {"envelope_id": env_id, "archived": False, "reason": "events appended during archival; retry"}
+    events = archived_events(session, env_id) + list(hot)
+
+    header = {
+        "envelope_id": env_id,
+        "event_count": checkpoint.event_count,
+        "last_event_id": checkpoint.last_event_id,
+        "head_hash": checkpoint.head_hash,
+        "merkle_root": checkpoint.merkle_root,
+        "checkpoint_id": checkpoint.id,
+    }
+    lines = [json.dumps(header, sort_keys=True)] + [json.dumps(_event_row(e), sort_keys=True) for e in events]
+    data = gzip.compress(("\n".join(lines) + "\n").encode(), mtime=0)
+    key = archive_key(final_artifact, events[-1].id)
+    storage.put_bytes(key, data, content_type="application/gzip")
+
+    archive = session.get(EventArchive, env_id) or EventArchive(envelope_id=env_id)
+    previous_key = archive.s3_key
+    archive.s3_key = key
+    archive.sha256 = sha256_bytes(data)
+    archive.first_event_id = events[0].id
+    archive.last_event_id = events[-1].id
+    archive.event_count = len(events)
+    archive.head_hash = checkpoint.head_hash
+    archive.merkle_root = checkpoint.merkle_root
+    archive.archived_at = datetime.utcnow()
+    session.add(archive)
+    session.exec(delete(Event).where(Event.envelope_id == env_id, Event.id <= checkpoint.last_event_id))
+    session.commit()
+    if previous_key and previous_key != key:
+        storage.delete_object(previous_key)
+    return {"envelope_id": env_id, "archived": True, "event_count": len(events), "moved": len(hot), "s3_key": key}
+
+
+def archive_completed(session: Session, older_than_days: int = EVENT_ARCHIVE_AFTER_DAYS,
+                      envelope_ids: Optional[List[int]] = None) -> List[dict]:
+    ids = envelope_ids if envelope_ids is not None else archivable_envelope_ids(session, older_than_days)
+    reports = []
+    for env_id in ids:
+        try:
+            reports.append(archive_envelope(session, env_id))
+        except Exception as exc:
+            # One unreadable archive or storage hiccup must not stop the rest.
+            session.rollback()
+            log.exception("archiving events of envelope %s failed", env_id)
+            reports.append({"envelope_id": env_id, "archived": False, "reason": repr(exc)})
+    return reports
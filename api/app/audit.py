@@ -0,0 +1,444 @@
+"""Verification of the per-envelope event hash chain.
+
+Every envelope's chain is summarised by EventCheckpoint rows: the events up
+to `last_event_id` were rehashed once and folded into an RFC 6962 style
+Merkle tree over their hashes. Later checks start from the newest checkpoint
+and only rehash events appended since. Each checkpoint also stores the
+Merkle subtrees it creates (EventMerkleNode), so a single event's inclusion
+is proven with a log-sized audit path read from a handful of stored nodes.
+Chains of archived envelopes are read back from their cold-storage object
+transparently.
+"""
+import gzip
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from minio.error import S3Error
+from sqlalchemy import and_, func, or_
+from sqlmodel import Session, delete, select
+
+from . import storage
+from .events import GENESIS_HASH
+from .models import Envelope, Event, EventArchive, EventChainHead, EventCheckpoint, EventMerkleNode
+from .utils import sha256_bytes
+
+
+# -- Merkle tree ---------------------------------------------------------------
+# Leaves are event hashes. Leaf and node hashes are domain-separated so an
+# inner node can never be passed off as a leaf.
+
+def _leaf(event_hash: str) -> str:
+    return hashlib.sha256(b"\x00" + bytes.fromhex(event_hash)).hexdigest()
+
+
+def _node(left: str, right: str) -> str:
+    return hashlib.sha256(b"\x01" + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _split(n: int) -> int:
+    # largest power of two strictly below n
+    k = 1
+    while k * 2 < n:
+        k *= 2
+    return k
+
+
+def _subtree_root(leaves: Sequence[str]) -> str:
+    if len(leaves) == 1:
+        return leaves[0]
+    k = _split(len(leaves))
+    return _node(_subtree_root(leaves[:k]), _subtree_root(leaves[k:]))
+
+
+def merkle_root(event_hashes: Sequence[str]) -> str:
+    if not event_hashes:
+        return GENESIS_HASH
+    return _subtree_root([_leaf(h) for h in event_hashes])
+
+
+def extend_frontier(frontier: List[list], event_hashes: Sequence[str], nodes: Optional[list] = None) -> List[list]:
+    """Append leaves to a frontier of [size, root] perfect subtrees (largest first).
+
+    Every subtree created on the way is appended to `nodes`, when given, as
+    (level, position, hash).
+    """
+    frontier = [list(entry) for entry in frontier]
+    count = sum(size for size, _ in frontier)
+    for event_hash in event_hashes:
+        frontier.append([1, _leaf(event_hash)])
+        if nodes is not None:
+            nodes.append((0, count, frontier[-1][1]))
+        count += 1
+        while len(frontier) > 1 and frontier[-1][0] == frontier[-2][0]:
+            right = frontier.pop()
+            left = frontier.pop()
+            frontier.append([left[0] * 2, _node(left[1], right[1])])
+            if nodes is not None:
+                size = left[0] * 2
+                nodes.append((size.bit_length() - 1, (count - size) // size, frontier[-1][1]))
+    return frontier
+
+
+def _fold(peaks: Sequence[str]) -> str:
+    root = peaks[-1]
+    for peak in reversed(peaks[:-1]):
+        root = _node(peak, root)
+    return root
+
+
+def frontier_root(frontier: Sequence[list]) -> str:
+    if not frontier:
+        return GENESIS_HASH
+    return _fold([peak for _, peak in frontier])
+
+
+def _audit_path(leaves: Sequence[str], index: int) -> List[dict]:
+    if len(leaves) == 1:
+        return []
+    k = _split(len(leaves))
+    if index < k:
+        return _audit_path(leaves[:k], index) + [{"side": "right", "hash": _subtree_root(leaves[k:])}]
+    return _audit_path(leaves[k:], index - k) + [{"side": "left", "hash": _subtree_root(leaves[:k])}]
+
+
+def inclusion_proof(event_hashes: Sequence[str], index: int) -> List[dict]:
+    return _audit_path([_leaf(h) for h in event_hashes], index)
+
+
+def _range_nodes(start: int, end: int) -> List[tuple]:
+    """The aligned perfect subtrees covering leaves [start, end), as (level, position)."""
+    keys = []
+    while start < end:
+        size = 1
+        while start % (size * 2) == 0 and start + size * 2 <= end:
+            size *= 2
+        keys.append((size.bit_length() - 1, start // size))
+        start += size
+    return keys
+
+
+def _sibling_ranges(index: int, start: int, end: int) -> List[tuple]:
+    """(side, start, end) of each sibling on the audit path, leaf first."""
+    if end - start == 1:
+        return []
+    k = _split(end - start)
+    if index < start + k:
+        return _sibling_ranges(index, start, start + k) + [("right", start + k, end)]
+    return _sibling_ranges(index, start + k, end) + [("left", start, start + k)]
+
+
+def stored_inclusion_proof(session: Session, env_id: int, index: int, tree_size: int) -> List[dict]:
+    """inclusion_proof for a checkpointed tree, from its stored subtree nodes."""
+    siblings = [(side, _range_nodes(start, end)) for side, start, end in _sibling_ranges(index, 0, tree_size)]
+    keys = {key for _, keys in siblings for key in keys}
+    nodes = {}
+    if keys:
+        rows = session.exec(
+            select(EventMerkleNode.level, EventMerkleNode.position, EventMerkleNode.hash).where(
+                EventMerkleNode.envelope_id == env_id,
+                or_(*(and_(EventMerkleNode.level == level, EventMerkleNode.position == position)
+                      for level, position in keys)),
+            )
+        ).all()
+        nodes = {(level, position): node_hash for level, position, node_hash in rows}
+    return [{"side": side, "hash": _fold([nodes[key] for key in keys])} for side, keys in siblings]
+
+
+def verify_inclusion(event_hash: str, proof: Sequence[dict], root: str) -> bool:
+    """Check an audit path in O(log n) hashes."""
+    current = _leaf(event_hash)
+    for step in proof:
+        if step["side"] == "left":
+            current = _node(step["hash"], current)
+        else:
+            current = _node(current, step["hash"])
+    return current == root
+
+
+# -- Chain verification ----------------------------------------------------------
+
+def latest_checkpoint(session: Session, env_id: int) -> Optional[EventCheckpoint]:
+    return session.exec(
+        select(EventCheckpoint)
+        .where(EventCheckpoint.envelope_id == env_id)
+        .order_by(EventCheckpoint.id.desc())
+    ).first()
+
+
+def latest_checkpoints(session: Session, envelope_ids=None) -> Dict[int, EventCheckpoint]:
+    """envelope id -> newest checkpoint, in one query; `envelope_ids` may be a subquery."""
+    newest = select(func.max(EventCheckpoint.id)).group_by(EventCheckpoint.envelope_id)
+    if envelope_ids is not None:
+        newest = newest.where(EventCheckpoint.envelope_id.in_(envelope_ids))
+    rows = session.exec(select(EventCheckpoint).where(EventCheckpoint.id.in_(newest))).all()
+    return {checkpoint.envelope_id: checkpoint for checkpoint in rows}
+
+
+class ArchiveUnavailable(Exception):
+    """An envelope's archived events are missing or don't match their recorded hash."""
+
+
+def _event_from_row(row: dict) -> Event:
+    return Event(**{**row, "at": datetime.fromisoformat(row["at"])})
+
+
+def archived_events(session: Session, env_id: int) -> List[Event]:
+    """Events moved to cold storage by archive.archive_envelope, oldest first."""
+    archive = session.get(EventArchive, env_id)
+    if archive is None:
+        return []
+    try:
+        data = storage.get_bytes(archive.s3_key)
+    except S3Error as exc:
+        raise ArchiveUnavailable(f"archived events missing at {archive.s3_key}") from exc
+    if sha256_bytes(data) != archive.sha256:
+        raise ArchiveUnavailable(f"archived events at {archive.s3_key} do not match their recorded hash")
+    lines = gzip.decompress(data).decode().splitlines()
+    return [_event_from_row(json.loads(line)) for line in lines[1:]]  # line 0 is the header
+
+
+def events_after(session: Session, env_id: int, last_event_id: int) -> List[Event]:
+    """An envelope's events with id > last_event_id, from the archive and the hot table."""
+    events = []
+    archive = session.get(EventArchive, env_id)
+    if archive is not None and last_event_id < archive.last_event_id:
+        events = [e for e in archived_events(session, env_id) if e.id > last_event_id]
+    events += session.exec(
+        select(Event)
+        .where(Event.envelope_id == env_id, Event.id > last_event_id)
+        .order_by(Event.id)
+    ).all()
+    return events
+
+
+def _event_hashes(session: Session, env_id: int, limit: Optional[int] = None) -> List[str]:
+    hashes = []
+    if session.get(EventArchive, env_id) is not None:
+        hashes = [e.hash for e in archived_events(session, env_id)]
+    stmt = select(Event.hash).where(Event.envelope_id == env_id).order_by(Event.id)
+    if limit is not None:
+        if len(hashes) >= limit:
+            return hashes[:limit]
+        stmt = stmt.limit(limit - len(hashes))
+    return hashes + list(session.exec(stmt).all())
+
+
+def find_event(session: Session, event_id: int) -> Optional[Event]:
+    """Look an event up in the hot table, falling back to the archive holding it."""
+    event = session.get(Event, event_id)
+    if event is not None:
+        return event
+    archive = session.exec(
+        select(EventArchive).where(EventArchive.first_event_id <= event_id, EventArchive.last_event_id >= event_id)
+    ).first()
+    if archive is None:
+        return None
+    return next((e for e in archived_events(session, archive.envelope_id) if e.id == event_id), None)
+
+
+def _rehash(events: Sequence[Event], prev_hash: str) -> List[dict]:
+    errors = []
+    for event in events:
+        if event.prev_hash != prev_hash:
+            errors.append({"event_id": event.id, "error": "prev_hash does not match the previous event"})
+        expected = sha256_bytes((prev_hash + event.meta_json).encode())
+        if event.hash != expected:
+            errors.append({"event_id": event.id, "error": "hash does not match event contents"})
+        prev_hash = event.hash or expected
+    return errors
+
+
+def verify_envelope(session: Session, env_id: int, full: bool = False) -> dict:
+    """Verify an envelope's chain.
+
+    By default only events after the latest checkpoint are rehashed. With
+    `full=True` the whole chain is rehashed and the checkpointed prefix is
+    checked against its stored Merkle root as well.
+    """
+    checkpoint = latest_checkpoint(session, env_id)
+    try:
+        events = events_after(session, env_id, 0 if full or checkpoint is None else checkpoint.last_event_id)
+    except ArchiveUnavailable as exc:
+        return {
+            "envelope_id": env_id,
+            "ok": False,
+            "event_count": None,
+            "rehashed": 0,
+            "verified_from_event_id": None,
+            "head_hash": None,
+            "checkpoint_id": checkpoint.id if checkpoint else None,
+            "errors": [{"error": str(exc)}],
+        }
+    if full or checkpoint is None:
+        errors = _rehash(events, GENESIS_HASH)
+        if checkpoint is not None:
+            prefix = [e.hash for e in events[:checkpoint.event_count]]
+            if len(prefix) != checkpoint.event_count or merkle_root(prefix) != checkpoint.merkle_root:
+                errors.append({"checkpoint_id": checkpoint.id, "error": "checkpointed events were altered or removed"})
+        verified_from = 0
+        event_count = len(events)
+    else:
+        errors = _rehash(events, checkpoint.head_hash)
+        verified_from = checkpoint.last_event_id
+        event_count = checkpoint.event_count + len(events)
+
+    if events:
+        head_hash = events[-1].hash
+    else:
+        head_hash = checkpoint.head_hash if checkpoint and not full else GENESIS_HASH
+    head = session.get(EventChainHead, env_id)
+    if head is not None and head.head_hash != head_hash:
+        errors.append({"error": "stored chain head does not match the last event"})
+    return {
+        "envelope_id": env_id,
+        "ok": not errors,
+        "event_count": event_count,
+        "rehashed": len(events),
+        "verified_from_event_id": verified_from,
+        "head_hash": head_hash,
+        "checkpoint_id": checkpoint.id if checkpoint else None,
+        "errors": errors,
+    }
+
+
+def checkpoint_envelope(session: Session, env_id: int) -> dict:
+    """Verify events added since the last checkpoint and record a new one.
+
+    Work is proportional to the new events (plus O(log n) to extend the
+    Merkle frontier); a chain that fails verification is not checkpointed.
+    """
+    checkpoint = latest_checkpoint(session, env_id)
+    report = verify_envelope(session, env_id)
+    if not report["ok"] or not report["rehashed"]:
+        return report
+    last_event_id = checkpoint.last_event_id if checkpoint else 0
+    events = events_after(session, env_id, last_event_id)
+    frontier = json.loads(checkpoint.frontier_json) if checkpoint else []
+    if checkpoint is not None:
+        _ensure_nodes(session, env_id, checkpoint)
+    nodes = []
+    frontier = extend_frontier(frontier, [e.hash for e in events], nodes)
+    _store_nodes(session, env_id, nodes)
+    new_checkpoint = EventCheckpoint(
+        envelope_id=env_id,
+        last_event_id=events[-1].id,
+        event_count=(checkpoint.event_count if checkpoint else 0) + len(events),
+        head_hash=events[-1].hash,
+        merkle_root=frontier_root(frontier),
+        frontier_json=json.dumps(frontier),
+    )
+    session.add(new_checkpoint)
+    session.commit()
+    session.refresh(new_checkpoint)
+    report["checkpoint_id"] = new_checkpoint.id
+    report["merkle_root"] = new_checkpoint.merkle_root
+    return report
+
+
+def _store_nodes(session: Session, env_id: int, nodes: Sequence[tuple]):
+    session.add_all(
+        EventMerkleNode(envelope_id=env_id, level=level, position=position, hash=node_hash)
+        for level, position, node_hash in nodes
+    )
+
+
+def _ensure_nodes(session: Session, env_id: int, checkpoint: EventCheckpoint):
+    """Store the subtree nodes of a checkpoint written before nodes were kept.
+
+    One pass over the chain, once per envelope; later checkpoints extend the
+    stored tree incrementally.
+    """
+    if session.get(EventMerkleNode, (env_id, 0, checkpoint.event_count - 1)) is not None:
+        return
+    nodes = []
+    extend_frontier([], _event_hashes(session, env_id, checkpoint.event_count), nodes)
+    session.exec(delete(EventMerkleNode).where(EventMerkleNode.envelope_id == env_id))
+    _store_nodes(session, env_id, nodes)
+    session.commit()
+
+
+def prove_event(session: Session, event: Event) -> dict:
+    """Inclusion proof for one event against the newest checkpoint.
+
+    An event newer than every checkpoint is checkpointed first, so the proof
+    costs the new events plus O(log n) stored nodes. Only a chain that fails
+    verification is proven against its current, unverified state.
+    """
+    checkpoint = latest_checkpoint(session, event.envelope_id)
+    if checkpoint is None or event.id > checkpoint.last_event_id:
+        checkpoint_envelope(session, event.envelope_id)
+        checkpoint = latest_checkpoint(session, event.envelope_id)
+    index = None
+    if checkpoint is not None and event.id <= checkpoint.last_event_id:
+        _ensure_nodes(session, event.envelope_id, checkpoint)
+        index = session.exec(
+            select(EventMerkleNode.position).where(
+                EventMerkleNode.envelope_id == event.envelope_id,
+                EventMerkleNode.hash == _leaf(event.hash),
+                EventMerkleNode.level == 0,
+            )
+        ).first()
+    if index is not None:
+        tree_size = checkpoint.event_count
+        root = checkpoint.merkle_root
+        proof = stored_inclusion_proof(session, event.envelope_id, index, tree_size)
+    else:
+        checkpoint = None
+        hashes = _event_hashes(session, event.envelope_id)
+        index = hashes.index(event.hash)
+        tree_size = len(hashes)
+        root = merkle_root(hashes)
+        proof = inclusion_proof(hashes, index)
+    return {
+        "event_id": event.id,
+        "envelope_id": event.envelope_id,
+        "event_hash": event.hash,
+        "leaf_index": index,
+        "tree_size": tree_size,
+        "merkle_root": root,
+        "checkpoint_id": checkpoint.id if checkpoint else None,
+        "proof": proof,
+    }
+
+
+def project_root(session: Session, project_id: int) -> dict:
+    """Merkle root over the latest checkpoint root of each envelope in a project."""
+    checkpoints = latest_checkpoints(session, select(Envelope.id).where(Envelope.project_id == project_id))
+    envelopes = [
+        {
+            "envelope_id": env_id,
+            "checkpoint_id": checkpoint.id,
+            "event_count": checkpoint.event_count,
+            "merkle_root": checkpoint.merkle_root,
+        }
+        for env_id, checkpoint in sorted(checkpoints.items())
+    ]
+    return {
+        "project_id": project_id,
+        "merkle_root": merkle_root([e["merkle_root"] for e in envelopes]),
+        "envelopes": envelopes,
+    }
+
+
+def sweep(session: Session) -> List[dict]:
+    """Checkpoint every envelope whose chain grew since its last checkpoint."""
+    reports = []
+    heads = session.exec(select(EventChainHead).order_by(EventChainHead.envelope_id)).all()
+    checkpoints = latest_checkpoints(session)
+    pending = []
+    for head in heads:
+        checkpoint = checkpoints.get(head.envelope_id)
+        if checkpoint is None or checkpoint.head_hash != head.head_hash:
+            pending.append(head.envelope_id)
+    # envelopes whose events predate chain heads
+    pending += session.exec(
+        select(Event.envelope_id)
+        .where(Event.envelope_id.not_in(select(EventChainHead.envelope_id)))
+        .where(Event.envelope_id.not_in(select(EventCheckpoint.envelope_id)))
+        .distinct()
+    ).all()
+    for env_id in pending:
+        reports.append(checkpoint_envelope(session, env_id))
+    return reports
@@ -1,11 +1,23 @@
-from typing import Optional
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
 from fastapi import Depends, Header, HTTPException, Query, status
 from pydantic import BaseModel
 from sqlmodel import Session, select
 
-from .config import ADMIN_ACCESS_TOKEN
+from .config import (
+    ADMIN_ACCESS_TOKEN,
+    ACCESS_TOKEN_CACHE_REDIS,
+    ACCESS_TOKEN_CACHE_SIZE,
+    ACCESS_TOKEN_CACHE_TTL_SECONDS,
+    REDIS_URL,
+)
 from .db import get_session
 from .models import Project
+from .utils import sha256_bytes
 
 
 class AccessContext(BaseModel):
@@ -13,6 +25,104 @@ class AccessContext(BaseModel):
     project_id: Optional[int] = None
 
 
+def token_digest(token: str) -> str:
+    """What gets stored and cached instead of a raw project token."""
+    return sha256_bytes(token.encode())
+
+
+def issue_project_token(project: Project) -> str:
+    """Give a project a fresh access token; the caller commits.
+
+    Only its digest is stored, so the returned token must be handed to the
+    admin now; it cannot be shown again.
+    """
+    token = secrets.token_urlsafe(32)
+    project.access_token_hash = token_digest(token)
+    return token
+
+
+class AccessTokenCache:
+    """token digest -> project id, with a TTL.
+
+    Entries live in an in-process LRU and, when enabled, in Redis so replicas
+    share hits. Invalidation clears both; another replica's in-process copy
+    can outlive it by at most the TTL. Redis failures fall back to the DB.
+    """
+
+    _REDIS_PREFIX = "auth:project-token:"
+
+    def __init__(self, ttl: float, max_entries: int, redis_url: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        if redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get(self, digest: str) -> Optional[int]:
+        if self.ttl <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(digest)
+                    return entry[1]
+                del self._entries[digest]
+        if self._redis is not None:
+            try:
+                value = self._redis.get(self._REDIS_PREFIX + digest)
+            except Exception:
+                return None
+            if value is not None:
+                self._remember(digest, int(value), now)
+                return int(value)
+        return None
+
+    def put(self, digest: str, project_id: int):
+        if self.ttl <= 0:
+            return
+        self._remember(digest, project_id, time.monotonic())
+        if self._redis is not None:
+            try:
+                self._redis.set(self._REDIS_PREFIX + digest, project_id, ex=max(1, int(self.ttl)))
+            except Exception:
+                pass
+
+    def invalidate(self, digest: Optional[str]):
+        if not digest:
+            return
+        with self._lock:
+            self._entries.pop(digest, None)
+        if self._redis is not None:
+            try:
+                self._redis.delete(self._REDIS_PREFIX + digest)
+            except Exception:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, digest: str, project_id: int, now: float):
+        with self._lock:
+            self._entries[digest] = (now + self.ttl, project_id)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+access_token_cache = AccessTokenCache(
+    ACCESS_TOKEN_CACHE_TTL_SECONDS,
+    ACCESS_TOKEN_CACHE_SIZE,
+    REDIS_URL if ACCESS_TOKEN_CACHE_REDIS else None,
+)
+
+
 def resolve_access_context(
     x_access_token: Optional[str] = Header(default=None, alias="X-Access-Token"),
     token: Optional[str] = Query(default=None),
@@ -21,11 +131,16 @@ def resolve_access_context(
     candidate = x_access_token or token
     if not candidate:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing access token")
-    if ADMIN_ACCESS_TOKEN and candidate == ADMIN_ACCESS_TOKEN:
+    if ADMIN_ACCESS_TOKEN and hmac.compare_digest(candidate.encode(), ADMIN_ACCESS_TOKEN.encode()):
         return AccessContext(role="admin")
-    project = session.exec(select(Project).where(Project.access_token == candidate)).first()
-    if project:
-        return AccessContext(role="project", project_id=project.id)
+    digest = token_digest(candidate)
+    project_id = access_token_cache.get(digest)
+    if project_id is None:
+        project_id = session.exec(select(Project.id).where(Project.access_token_hash == digest)).first()
+        if project_id is not None:
+            access_token_cache.put(digest, project_id)
+    if project_id is not None:
+        return AccessContext(role="project", project_id=project_id)
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid access token")
 
 
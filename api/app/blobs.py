@@ -0,0 +1,81 @@
+"""Content-addressed blobs in MinIO, keyed by the SHA-256 of their bytes.
+
+Used for signer field values so `filled` events only carry digests: the
+chain still commits to exactly what was entered, and each distinct value is
+stored once no matter how many autosaves repeat it. Other content-addressed
+objects (signature images) use the same helpers under their own prefix, so a
+digest is only ever looked up where its kind of object is stored.
+"""
+import threading
+from collections import OrderedDict
+
+from minio.error import S3Error
+
+from . import storage
+from .utils import canonical_json, sha256_bytes
+
+BLOB_PREFIX = "blobs"
+_KNOWN_LIMIT = 4096
+
+# Keys this process has already stored or seen in MinIO, so repeated
+# autosaves of an unchanged value don't cost a stat round trip each.
+_known: "OrderedDict[str, None]" = OrderedDict()
+_known_lock = threading.Lock()
+
+
+def blob_key(digest: str, prefix: str = BLOB_PREFIX) -> str:
+    return f"{prefix}/{digest[:2]}/{digest}"
+
+
+def _remember(key: str):
+    with _known_lock:
+        _known[key] = None
+        _known.move_to_end(key)
+        while len(_known) > _KNOWN_LIMIT:
+            _known.popitem(last=False)
+
+
+def _is_known(key: str) -> bool:
+    with _known_lock:
+        if key in _known:
+            _known.move_to_end(key)
+            return True
+    return False
+
+
+def put_blob(data: bytes, content_type: str = "application/octet-stream", prefix: str = BLOB_PREFIX) -> str:
+    digest = sha256_bytes(data)
+    key = blob_key(digest, prefix)
+    if _is_known(key):
+        return digest
+    try:
+        storage.stat_object(key)
+    except S3Error:
+        storage.put_bytes(key, data, content_type=content_type)
+    _remember(key)
+    return digest
+
+
+def has_blob(digest: str, prefix: str = BLOB_PREFIX) -> bool:
+    key = blob_key(digest, prefix)
+    if _is_known(key):
+        return True
+    try:
+        storage.stat_object(key)
+    except S3Error:
+        return False
+    _remember(key)
+    return True
+
+
+def get_blob(digest: str, prefix: str = BLOB_PREFIX) -> bytes:
+    """Raises S3Error when no blob with that digest exists."""
+    return storage.get_bytes(blob_key(digest, prefix))
+
+
+def store_values(values: dict) -> dict:
+    """Store each field value once and return {field_id: digest of its canonical JSON}."""
+    return {
+        str(field_id): put_blob(canonical_json(value).encode(), "application/json")
+        for field_id, value in values.items()
+    }
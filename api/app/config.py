@@ -10,3 +10,29 @@ SECRET_KEY = os.getenv("SECRET_KEY", "devsecret")
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 WORKER_QUEUE = os.getenv("WORKER_QUEUE", "signing")
 ADMIN_ACCESS_TOKEN = os.getenv("ADMIN_ACCESS_TOKEN")
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))
+OBJECT_CACHE_DIR = os.getenv("OBJECT_CACHE_DIR", "/tmp/signing-object-cache")
+OBJECT_CACHE_MAX_BYTES = int(os.getenv("OBJECT_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "16"))
+BULK_SEAL_UPLOAD_THREADS = int(os.getenv("BULK_SEAL_UPLOAD_THREADS", "4"))
+SEAL_STALE_MINUTES = int(os.getenv("SEAL_STALE_MINUTES", "15"))
+EVENT_FLUSH_INTERVAL_SECONDS = float(os.getenv("EVENT_FLUSH_INTERVAL_SECONDS", "1.0"))
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "200"))
+EVENT_FLUSH_MAX_ATTEMPTS = int(os.getenv("EVENT_FLUSH_MAX_ATTEMPTS", "5"))
+OPENED_EVENT_COALESCE_SECONDS = int(os.getenv("OPENED_EVENT_COALESCE_SECONDS", "300"))
+EVENT_ARCHIVE_AFTER_DAYS = int(os.getenv("EVENT_ARCHIVE_AFTER_DAYS", "7"))
+MIGRATIONS_CONCURRENT_INDEXES = os.getenv("MIGRATIONS_CONCURRENT_INDEXES", "true").lower() not in ("0", "false", "no")
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))
+LIST_MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "200"))
+ACCESS_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("ACCESS_TOKEN_CACHE_TTL_SECONDS", "60"))
+ACCESS_TOKEN_CACHE_SIZE = int(os.getenv("ACCESS_TOKEN_CACHE_SIZE", "1024"))
+ACCESS_TOKEN_CACHE_REDIS = os.getenv("ACCESS_TOKEN_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+SIGN_TOKEN_MAX_AGE_DAYS = int(os.getenv("SIGN_TOKEN_MAX_AGE_DAYS", "90"))
+SIGN_TOKEN_CACHE_SIZE = int(os.getenv("SIGN_TOKEN_CACHE_SIZE", "4096"))
+SIGNATURE_MAX_UPLOAD_BYTES = int(os.getenv("SIGNATURE_MAX_UPLOAD_BYTES", str(2 * 1024 * 1024)))
+SIGNATURE_MAX_WIDTH = int(os.getenv("SIGNATURE_MAX_WIDTH", "600"))
+SIGNATURE_MAX_HEIGHT = int(os.getenv("SIGNATURE_MAX_HEIGHT", "240"))
+SIGNATURE_PALETTE_COLORS = int(os.getenv("SIGNATURE_PALETTE_COLORS", "16"))
+SIGNATURE_MAX_STROKE_POINTS = int(os.getenv("SIGNATURE_MAX_STROKE_POINTS", "5000"))
+SIGN_LAYOUT_CACHE_SIZE = int(os.getenv("SIGN_LAYOUT_CACHE_SIZE", "1024"))
@@ -0,0 +1,167 @@
+import mmap
+import os
+from typing import Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from . import storage
+from .config import DOWNLOAD_CHUNK_SIZE
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair.
+
+    Returns None when the header is absent or not something we serve partially
+    (other units, multiple ranges); the caller then sends the full body.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_s, sep, end_s = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_s == "":
+            suffix = int(end_s)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            start, end = max(0, size - suffix), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request: Request, etag: str) -> bool:
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    # We never send Last-Modified, so a date validator can't match; only a
+    # strong ETag comparison lets the partial response through.
+    return not if_range.startswith("W/") and if_range.strip() == etag
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for it)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in header.split(","))
+
+
+def _open_cached(digest: Optional[str]):
+    path = storage.object_cache.lookup(digest)
+    if path is None:
+        return None
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        return None  # evicted between lookup and open
+
+
+def _iter_file(fh, offset: int, length: int, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    # mmap lets the kernel serve hot cached files straight from the page cache.
+    try:
+        if length <= 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = offset + length
+            for start in range(offset, end, chunk_size):
+                yield mm[start:min(start + chunk_size, end)]
+    finally:
+        fh.close()
+
+
+def _ranged_response(request: Request, size: int, etag: str, headers: dict, media_type: str, read, close=None) -> Response:
+    """Shared 200/206/416 handling; `read(offset, length)` yields the body."""
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, **headers}
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except RangeNotSatisfiable:
+        if close:
+            close()
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+    if byte_range and not _if_range_matches(request, etag):
+        byte_range = None
+
+    status_code = 200
+    start, length = 0, size
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(read(start, length), status_code=status_code, media_type=media_type, headers=headers)
+
+
+def object_response(
+    request: Request,
+    key: str,
+    *,
+    etag: Optional[str] = None,
+    filename: Optional[str] = None,
+    media_type: str = "application/pdf",
+) -> Response:
+    """Stream a stored object, honouring Range / If-Range with 206 responses.
+
+    When `etag` is the object's SHA-256 the bytes are served from the local
+    object cache. A miss is streamed from MinIO straight away: a full read
+    fills the cache as it goes, a ranged one fills it in the background.
+    Raises S3Error if the object is missing so routes keep their own 404s.
+    """
+    digest = etag
+    cached = _open_cached(digest)
+    if cached is not None:
+        size = os.fstat(cached.fileno()).st_size
+    else:
+        stat = storage.stat_object(key)
+        size = stat.size
+        etag = etag or stat.etag
+    headers = {}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if cached is not None:
+        return _ranged_response(
+            request, size, f'"{etag}"', headers, media_type,
+            lambda start, length: _iter_file(cached, start, length), cached.close,
+        )
+
+    def read(start, length):
+        if start == 0 and length == size:
+            return storage.object_cache.stream_through(digest, size, storage.iter_object(key))
+        storage.object_cache.fill_in_background(digest, key)
+        return storage.iter_object(key, offset=start, length=length)
+
+    return _ranged_response(request, size, f'"{etag}"', headers, media_type, read)
+
+
+def file_response(
+    request: Request,
+    path: str,
+    *,
+    etag: str,
+    headers: Optional[dict] = None,
+    media_type: str = "application/pdf",
+) -> Response:
+    """Serve a local (cached) file with the same Range handling as object_response."""
+    fh = open(path, "rb")
+    size = os.fstat(fh.fileno()).st_size
+    return _ranged_response(
+        request, size, f'"{etag}"', headers or {}, media_type,
+        lambda start, length: _iter_file(fh, start, length), fh.close,
+    )
@@ -0,0 +1,211 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from . import db
+from .config import EVENT_FLUSH_INTERVAL_SECONDS, EVENT_BATCH_SIZE, EVENT_FLUSH_MAX_ATTEMPTS, OPENED_EVENT_COALESCE_SECONDS
+from .models import Event, EventChainHead
+from .utils import canonical_json, sha256_bytes
+
+GENESIS_HASH = "0" * 64
+# Only events that are safe to lose may skip the request transaction.
+BUFFERED_EVENT_TYPES = {"opened"}
+
+log = logging.getLogger(__name__)
+
+
+def lock_chain_head(session: Session, env_id: int) -> EventChainHead:
+    """Return the envelope's chain head, row-locked until the caller commits.
+
+    The first append for an envelope (or one whose events predate chain
+    heads) seeds the head from the existing events; a concurrent seed loses
+    the insert race and simply locks the winner's row.
+    """
+    stmt = select(EventChainHead).where(EventChainHead.envelope_id == env_id).with_for_update()
+    head = session.exec(stmt).first()
+    if head is not None:
+        return head
+    last = session.exec(select(Event).where(Event.envelope_id == env_id).order_by(Event.id.desc())).first()
+    count = session.exec(select(func.count()).select_from(Event).where(Event.envelope_id == env_id)).one()
+    head = EventChainHead(envelope_id=env_id, head_hash=last.hash if last else GENESIS_HASH, event_count=count)
+    try:
+        with session.begin_nested():
+            session.add(head)
+    except IntegrityError:
+        head = session.exec(stmt.execution_options(populate_existing=True)).one()
+    return head
+
+
+def _link_event(session: Session, head: EventChainHead, actor: str, type_: str, meta: dict,
+                ip=None, ua=None, at: Optional[datetime] = None):
+    payload = {"actor": actor, "type": type_, "meta": meta}
+    event = Event(
+        envelope_id=head.envelope_id,
+        actor=actor,
+        type=type_,
+        meta_json=canonical_json(payload),
+        prev_hash=head.head_hash,
+        ip=ip,
+        ua=ua,
+        at=at or datetime.utcnow(),
+    )
+    event.hash = sha256_bytes((head.head_hash + event.meta_json).encode())
+    head.head_hash = event.hash
+    head.event_count += 1
+    head.updated_at = datetime.utcnow()
+    session.add(event)
+    session.add(head)
+
+
+class EventWriter:
+    """Batches high-frequency page-open events off the request path.
+
+    Buffered events are written by a background thread every
+    EVENT_FLUSH_INTERVAL_SECONDS (sooner once EVENT_BATCH_SIZE are queued),
+    with all envelopes in one transaction. Repeated `opened` events from the
+    same signer and IP within OPENED_EVENT_COALESCE_SECONDS are dropped.
+    A synchronous append_event first drains its envelope's queued events
+    into its own transaction, so they are not chained after it. A batch that
+    fails is retried; events still failing after EVENT_FLUSH_MAX_ATTEMPTS
+    flushes are logged and dropped. Events still queued when the process
+    dies are lost, which is why only BUFFERED_EVENT_TYPES are buffered.
+    """
+
+    def __init__(self, flush_interval: float = EVENT_FLUSH_INTERVAL_SECONDS,
+                 batch_size: int = EVENT_BATCH_SIZE,
+                 coalesce_seconds: int = OPENED_EVENT_COALESCE_SECONDS,
+                 max_attempts: int = EVENT_FLUSH_MAX_ATTEMPTS):
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.coalesce_window = timedelta(seconds=coalesce_seconds)
+        self._pending: List[dict] = []
+        self._recent_opens = {}  # (envelope_id, actor, ip) -> last recorded open
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, env_id: int, actor: str, type_: str, meta: dict, ip=None, ua=None) -> bool:
+        """Queue an event; returns False when it was coalesced away."""
+        now = datetime.utcnow()
+        with self._lock:
+            if type_ == "opened":
+                key = (env_id, actor, ip)
+                last = self._recent_opens.get(key)
+                if last is not None and now - last < self.coalesce_window:
+                    return False
+                self._recent_opens[key] = now
+            self._pending.append({
+                "env_id": env_id, "actor": actor, "type_": type_, "meta": meta,
+                "ip": ip, "ua": ua, "at": now, "attempts": 0,
+            })
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+        return True
+
+    def take(self, env_id: Optional[int] = None) -> List[dict]:
+        """Remove and return queued events, optionally only one envelope's."""
+        with self._lock:
+            if env_id is None:
+                taken, self._pending = self._pending, []
+            else:
+                taken = [e for e in self._pending if e["env_id"] == env_id]
+                self._pending = [e for e in self._pending if e["env_id"] != env_id]
+            return taken
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of events written."""
+        with self._flush_lock:
+            events = self.take()
+            if not events:
+                return 0
+            try:
+                with Session(db.engine) as session:
+                    by_envelope = {}
+                    for event in events:
+                        by_envelope.setdefault(event["env_id"], []).append(event)
+                    # lock heads in a fixed order so concurrent flushers can't deadlock
+                    for env_id in sorted(by_envelope):
+                        head = lock_chain_head(session, env_id)
+                        for event in by_envelope[env_id]:
+                            _link_event(session, head, event["actor"], event["type_"], event["meta"],
+                                        event["ip"], event["ua"], event["at"])
+                    session.commit()
+            except Exception:
+                retry = []
+                for event in events:
+                    event["attempts"] += 1
+                    if event["attempts"] < self.max_attempts:
+                        retry.append(event)
+                    else:
+                        log.error("dropping %s event for envelope %s after %d failed flushes",
+                                  event["type_"], event["env_id"], event["attempts"])
+                with self._lock:
+                    self._pending[:0] = retry
+                raise
+            self._forget_old_opens()
+            return len(events)
+
+    def _forget_old_opens(self):
+        cutoff = datetime.utcnow() - self.coalesce_window
+        with self._lock:
+            self._recent_opens = {k: t for k, t in self._recent_opens.items() if t >= cutoff}
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception("event flush failed; will retry")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+
+event_writer = EventWriter()
+
+
+def append_event(session: Session, env_id: int, actor: str, type_: str, meta: dict, ip=None, ua=None,
+                 buffered: bool = False):
+    """Append an event to the envelope's chain.
+
+    With buffered=True an `opened` event is handed to the background writer
+    and the caller's session is left untouched; every other event, buffered
+    or not, is linked and committed in the caller's transaction after the
+    envelope's queued events.
+    """
+    if buffered and type_ in BUFFERED_EVENT_TYPES:
+        event_writer.submit(env_id, actor, type_, meta, ip=ip, ua=ua)
+        return
+    queued = event_writer.take(env_id)
+    head = lock_chain_head(session, env_id)
+    for event in queued:
+        _link_event(session, head, event["actor"], event["type_"], event["meta"],
+                    event["ip"], event["ua"], event["at"])
+    _link_event(session, head, actor, type_, meta, ip=ip, ua=ua)
+    session.commit()
@@ -1,8 +1,9 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import projects, documents, envelopes, signing, project_investors
+from .routers import projects, documents, envelopes, signing, project_investors, audit
 from .db import init_db
+from .events import event_writer
 
 app = FastAPI(title="Signing API (Python stamper)")
 
@@ -12,17 +13,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # pdf.js needs these to switch to range requests cross-origin
+    expose_headers=[
+        "Accept-Ranges", "Content-Range", "Content-Length", "ETag",
+        "X-Page-Count", "X-Page-Range", "X-Page-Geometry",
+        "X-Next-Cursor",
+    ],
 )
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    event_writer.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    event_writer.stop()
 
 app.include_router(projects.router, prefix="/api/projects", tags=["projects"])
 app.include_router(documents.router, prefix="/api/projects", tags=["documents"])  # nested
 app.include_router(project_investors.router, prefix="/api/projects", tags=["project-investors"])
 app.include_router(envelopes.router, prefix="/api/envelopes", tags=["envelopes"])
 app.include_router(signing.router, prefix="/api/sign", tags=["signing"])
+app.include_router(audit.router, prefix="/api/audit", tags=["audit"])
 
 @app.get("/")
 def root():
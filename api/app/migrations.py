@@ -0,0 +1,246 @@
+"""Versioned schema migrations.
+
+`create_all` only creates missing tables, so every change to an existing
+table goes here as a numbered step. Applied versions are recorded in
+`schema_migrations`; each step must be idempotent because a fresh database
+already gets the current schema from `create_all`. A step may return False
+to stay pending (it is retried on the next start).
+
+On Postgres, indexes are built with CREATE INDEX CONCURRENTLY so a live
+database keeps taking writes while they build, and an advisory lock keeps
+several API replicas from migrating at once.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Engine
+
+from .config import MIGRATIONS_CONCURRENT_INDEXES
+from .utils import sha256_bytes
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+_ADVISORY_LOCK_ID = 0x5167_6E31  # arbitrary, shared by every API/worker process
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Engine], Optional[bool]]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    def register(fn):
+        MIGRATIONS.append(Migration(version, name, fn))
+        return fn
+    return register
+
+
+# -- helpers --------------------------------------------------------------------
+
+def _columns(engine: Engine, table: str) -> Optional[set]:
+    try:
+        return {col["name"] for col in inspect(engine).get_columns(table)}
+    except Exception:
+        return None
+
+
+def _add_column(engine: Engine, table: str, column: str, ddl: str):
+    columns = _columns(engine, table)
+    if columns is None or column in columns:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def create_index(engine: Engine, name: str, table: str, columns: List[str], unique: bool = False):
+    """CREATE INDEX IF NOT EXISTS, concurrently on Postgres."""
+    unique_sql = "UNIQUE " if unique else ""
+    cols = ", ".join(columns)
+    if engine.dialect.name == "postgresql" and MIGRATIONS_CONCURRENT_INDEXES:
+        # CONCURRENTLY can't run inside a transaction block.
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # An interrupted concurrent build leaves an INVALID index behind
+            # that IF NOT EXISTS would happily skip; rebuild it.
+            invalid = conn.execute(
+                text(
+                    "SELECT NOT i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+                ),
+                {"name": name},
+            ).scalar()
+            if invalid:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(text(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({cols})"))
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+
+
+# -- steps ----------------------------------------------------------------------
+
+@migration(1, "project access token")
+def _project_access_token(engine: Engine):
+    _add_column(engine, "project", "access_token", "TEXT")
+    create_index(engine, "ix_project_access_token", "project", ["access_token"])
+
+
+@migration(2, "unique project names")
+def _unique_project_names(engine: Engine):
+    with engine.connect() as conn:
+        duplicates = conn.execute(
+            text("SELECT name FROM project GROUP BY name HAVING COUNT(*) > 1")
+        ).fetchall()
+    if duplicates:
+        names = ", ".join(row[0] for row in duplicates if row[0])
+        print(
+            "WARNING: duplicate project names detected; resolve before enforcing uniqueness:",
+            names,
+        )
+        return False
+    create_index(engine, "uq_project_name", "project", ["name"], unique=True)
+
+
+@migration(3, "field font family")
+def _field_font_family(engine: Engine):
+    _add_column(engine, "field", "font_family", "TEXT DEFAULT 'sans'")
+
+
+@migration(4, "document page index")
+def _document_page_index(engine: Engine):
+    _add_column(engine, "document", "page_count", "INTEGER")
+    _add_column(engine, "document", "page_index_json", "TEXT")
+
+
+@migration(5, "foreign key lookup indexes")
+def _foreign_key_indexes(engine: Engine):
+    for name, table, columns in (
+        ("ix_document_project_id", "document", ["project_id"]),
+        ("ix_envelope_project_id", "envelope", ["project_id"]),
+        ("ix_signer_envelope_id", "signer", ["envelope_id"]),
+        ("ix_field_envelope_id", "field", ["envelope_id"]),
+        ("ix_projectinvestor_project_id", "projectinvestor", ["project_id"]),
+        ("ix_signingsession_signer_id", "signingsession", ["signer_id"]),
+        ("ix_signerfieldvalue_signer_id", "signerfieldvalue", ["signer_id"]),
+        ("ix_finalartifact_envelope_id", "finalartifact", ["envelope_id"]),
+        ("ix_event_envelope_id_id", "event", ["envelope_id", "id"]),
+    ):
+        create_index(engine, name, table, columns)
+
+
+@migration(6, "envelope listing keyset index")
+def _envelope_listing_index(engine: Engine):
+    create_index(engine, "ix_envelope_project_id_created_at_id", "envelope", ["project_id", "created_at", "id"])
+
+
+@migration(7, "document and investor listing keyset indexes")
+def _listing_indexes(engine: Engine):
+    create_index(engine, "ix_document_project_id_created_at_id", "document", ["project_id", "created_at", "id"])
+    create_index(
+        engine, "ix_projectinvestor_project_id_routing_order_id", "projectinvestor",
+        ["project_id", "routing_order", "id"],
+    )
+
+
+@migration(8, "hashed project access tokens")
+def _project_access_token_hash(engine: Engine):
+    _add_column(engine, "project", "access_token_hash", "TEXT")
+    with engine.begin() as conn:
+        rows = conn.execute(
+            text("SELECT id, access_token FROM project WHERE access_token IS NOT NULL AND access_token_hash IS NULL")
+        ).fetchall()
+        for project_id, token in rows:
+            conn.execute(
+                text("UPDATE project SET access_token_hash = :digest WHERE id = :id"),
+                {"digest": sha256_bytes(token.encode()), "id": project_id},
+            )
+    create_index(engine, "ix_project_access_token_hash", "project", ["access_token_hash"])
+
+
+@migration(9, "unique signer field values")
+def _unique_signer_field_values(engine: Engine):
+    # Saves used to delete and re-insert, so at most a race left duplicates;
+    # keep the newest row of each pair.
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM signerfieldvalue WHERE id NOT IN "
+            "(SELECT MAX(id) FROM signerfieldvalue GROUP BY signer_id, field_id)"
+        ))
+    create_index(
+        engine, "uq_signerfieldvalue_signer_id_field_id", "signerfieldvalue", ["signer_id", "field_id"], unique=True,
+    )
+
+
+@migration(10, "one final artifact per envelope")
+def _unique_final_artifacts(engine: Engine):
+    # Racing seal jobs could each insert an artifact; keep the newest.
+    with engine.begin() as conn:
+        conn.execute(text(
+            "DELETE FROM finalartifact WHERE id NOT IN "
+            "(SELECT MAX(id) FROM finalartifact GROUP BY envelope_id)"
+        ))
+    create_index(engine, "uq_finalartifact_envelope_id", "finalartifact", ["envelope_id"], unique=True)
+
+
+@migration(11, "drop raw project access tokens")
+def _drop_project_access_token(engine: Engine):
+    columns = _columns(engine, "project")
+    if columns is None or "access_token" not in columns:
+        return
+    # Step 8 hashed every token that existed then; catch any issued since.
+    _project_access_token_hash(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_project_access_token"))
+        conn.execute(text("UPDATE project SET access_token = NULL"))
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE project DROP COLUMN access_token"))
+    except Exception:
+        pass  # SQLite before 3.35 can't drop columns; the column stays empty
+
+
+# -- runner ---------------------------------------------------------------------
+
+def applied_versions(engine: Engine) -> set:
+    _metadata.create_all(engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def migrate(engine: Engine) -> List[int]:
+    """Apply pending migrations in version order; returns the versions applied."""
+    lock_conn = None
+    if engine.dialect.name == "postgresql":
+        lock_conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+    try:
+        done = applied_versions(engine)
+        applied = []
+        for step in sorted(MIGRATIONS, key=lambda m: m.version):
+            if step.version in done:
+                continue
+            if step.apply(engine) is False:
+                continue
+            with engine.begin() as conn:
+                conn.execute(schema_migrations.insert().values(
+                    version=step.version, name=step.name, applied_at=datetime.utcnow(),
+                ))
+            applied.append(step.version)
+        return applied
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _ADVISORY_LOCK_ID})
+            lock_conn.close()
@@ -2,7 +2,7 @@
 from typing import Optional
 from datetime import datetime
 from sqlmodel import SQLModel, Field as ORMField
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 
 class Tenant(SQLModel, table=True):
     id: Optional[int] = ORMField(default=None, primary_key=True)
@@ -21,20 +21,27 @@ class Project(SQLModel, table=True):
     tenant_id: int
     name: str
     status: str = "active"
-    access_token: Optional[str] = ORMField(default=None, index=True)
+    # Only the digest is stored; the token itself is shown once when issued.
+    access_token_hash: Optional[str] = ORMField(default=None, index=True)
 
 class Document(SQLModel, table=True):
+    # keyset pagination of a project's documents, newest first
+    __table_args__ = (Index("ix_document_project_id_created_at_id", "project_id", "created_at", "id"),)
     id: Optional[int] = ORMField(default=None, primary_key=True)
-    project_id: int
+    project_id: int = ORMField(index=True)
     filename: str
     s3_key: str
     sha256: Optional[str] = None
+    page_count: Optional[int] = None
+    page_index_json: Optional[str] = None  # see pdf_index.build_page_index
     version: int = 1
     created_at: datetime = ORMField(default_factory=datetime.utcnow)
 
 class Envelope(SQLModel, table=True):
+    # keyset pagination of a project's envelopes, newest first
+    __table_args__ = (Index("ix_envelope_project_id_created_at_id", "project_id", "created_at", "id"),)
     id: Optional[int] = ORMField(default=None, primary_key=True)
-    project_id: int
+    project_id: int = ORMField(index=True)
     document_id: int
     subject: str = "Please sign"
     message: str = ""
@@ -46,7 +53,7 @@ class Envelope(SQLModel, table=True):
 
 class Signer(SQLModel, table=True):
     id: Optional[int] = ORMField(default=None, primary_key=True)
-    envelope_id: int
+    envelope_id: int = ORMField(index=True)
     name: str
     email: str
     role: str = "Investor"
@@ -56,7 +63,7 @@ class Signer(SQLModel, table=True):
 
 class Field(SQLModel, table=True):
     id: Optional[int] = ORMField(default=None, primary_key=True)
-    envelope_id: int
+    envelope_id: int = ORMField(index=True)
     page: int
     x: float
     y: float
@@ -70,8 +77,10 @@ class Field(SQLModel, table=True):
     font_family: str = ORMField(default="sans")
 
 class ProjectInvestor(SQLModel, table=True):
+    # keyset pagination of a project's investors in routing order
+    __table_args__ = (Index("ix_projectinvestor_project_id_routing_order_id", "project_id", "routing_order", "id"),)
     id: Optional[int] = ORMField(default=None, primary_key=True)
-    project_id: int
+    project_id: int = ORMField(index=True)
     name: str
     email: str
     role: str = "Investor"
@@ -82,7 +91,7 @@ class ProjectInvestor(SQLModel, table=True):
 
 class SigningSession(SQLModel, table=True):
     id: Optional[int] = ORMField(default=None, primary_key=True)
-    signer_id: int
+    signer_id: int = ORMField(index=True)
     token_hash: str
     ip_first: Optional[str] = None
     ua_first: Optional[str] = None
@@ -90,13 +99,22 @@ class SigningSession(SQLModel, table=True):
     completed_at: Optional[datetime] = None
 
 class SignerFieldValue(SQLModel, table=True):
+    # one row per signer and field; saves upsert against it
+    __table_args__ = (UniqueConstraint("signer_id", "field_id", name="uq_signerfieldvalue_signer_id_field_id"),)
     id: Optional[int] = ORMField(default=None, primary_key=True)
-    signer_id: int
+    signer_id: int = ORMField(index=True)
     field_id: int
     value_json: str = "{}"
     created_at: datetime = ORMField(default_factory=datetime.utcnow)
 
 class Event(SQLModel, table=True):
+    # Ids must never be reused once archived rows are deleted (SQLite would
+    # otherwise hand out the max rowid again).
+    __table_args__ = (
+        # chain reads walk one envelope's events in id order
+        Index("ix_event_envelope_id_id", "envelope_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
     id: Optional[int] = ORMField(default=None, primary_key=True)
     envelope_id: int
     actor: str  # system|signer:<id>|user:<id>
@@ -108,9 +126,56 @@ class Event(SQLModel, table=True):
     prev_hash: Optional[str] = None
     hash: Optional[str] = None
 
+class EventChainHead(SQLModel, table=True):
+    # Latest link of an envelope's event hash chain; appends lock this row
+    # instead of scanning Event for the previous hash.
+    envelope_id: int = ORMField(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    head_hash: str
+    event_count: int = 0
+    updated_at: datetime = ORMField(default_factory=datetime.utcnow)
+
+class EventCheckpoint(SQLModel, table=True):
+    # Verified prefix of an envelope's event chain: everything up to
+    # last_event_id was rehashed once and is summarised by merkle_root, so
+    # later verification only has to rehash newer events.
+    id: Optional[int] = ORMField(default=None, primary_key=True)
+    envelope_id: int = ORMField(index=True)
+    last_event_id: int
+    event_count: int
+    head_hash: str
+    merkle_root: str
+    frontier_json: str = "[]"  # [[size, hash], ...] perfect-subtree roots for O(log n) extension
+    created_at: datetime = ORMField(default_factory=datetime.utcnow)
+
+class EventMerkleNode(SQLModel, table=True):
+    # Perfect subtrees of an envelope's checkpointed Merkle tree, written as
+    # checkpoints extend the frontier. The node at (level, position) covers
+    # leaves [position * 2**level, (position + 1) * 2**level); level 0 holds
+    # the leaves. Inclusion proofs read O(log n) of these.
+    __table_args__ = (Index("ix_eventmerklenode_envelope_id_hash", "envelope_id", "hash"),)
+    envelope_id: int = ORMField(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    level: int = ORMField(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    position: int = ORMField(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    hash: str
+
+class EventArchive(SQLModel, table=True):
+    # Event rows of a completed envelope moved to a gzipped JSONL object
+    # next to its .audit.json; the hot table no longer holds them.
+    envelope_id: int = ORMField(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    s3_key: str
+    sha256: str
+    first_event_id: int
+    last_event_id: int
+    event_count: int
+    head_hash: str
+    merkle_root: str
+    archived_at: datetime = ORMField(default_factory=datetime.utcnow)
+
 class FinalArtifact(SQLModel, table=True):
+    # one per envelope; a duplicate seal job loses on this constraint
+    __table_args__ = (UniqueConstraint("envelope_id", name="uq_finalartifact_envelope_id"),)
     id: Optional[int] = ORMField(default=None, primary_key=True)
-    envelope_id: int
+    envelope_id: int = ORMField(index=True)
     s3_key_pdf: str
     s3_key_audit_json: str
     sha256_final: str
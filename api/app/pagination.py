@@ -0,0 +1,111 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+Pages are fetched with `WHERE (sort keys) < (last row's keys)` instead of
+OFFSET, so every page costs the same no matter how deep the client is.
+List bodies stay plain JSON arrays; the opaque cursor for the next page is
+returned in the X-Next-Cursor header and is absent on the last page.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+from .config import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """`limit` and `cursor` query parameters, for use as a dependency."""
+
+    def __init__(
+        self,
+        limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+class DateRange:
+    """Optional `since` / `until` bounds (inclusive / exclusive) on a timestamp column."""
+
+    def __init__(self, since: Optional[datetime] = Query(None), until: Optional[datetime] = Query(None)):
+        self.since = since
+        self.until = until
+
+    def apply(self, stmt, column):
+        if self.since is not None:
+            stmt = stmt.where(column >= self.since)
+        if self.until is not None:
+            stmt = stmt.where(column < self.until)
+        return stmt
+
+
+def name_prefix(stmt, column, prefix: Optional[str]):
+    """Case-sensitive prefix match that can use a plain index on `column`."""
+    if prefix:
+        stmt = stmt.where(column.startswith(prefix, autoescape=True))
+    return stmt
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(v) if col.type.python_type is datetime else col.type.python_type(v)
+            for col, v in zip(columns, values)
+        ]
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(400, "invalid cursor")
+
+
+class Keyset:
+    """A stable sort over `columns` (last one unique, usually the id)."""
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def _after(self, values: list):
+        # (a, b, c) > (x, y, z) expanded, since row-value comparisons aren't
+        # portable across the databases we run on.
+        clauses = []
+        for i, col in enumerate(self.columns):
+            beyond = col < values[i] if self.descending else col > values[i]
+            clauses.append(and_(*[self.columns[j] == values[j] for j in range(i)], beyond))
+        return or_(*clauses)
+
+    def apply(self, stmt, page: PageParams):
+        """Order, filter past the cursor and fetch one extra row to detect a next page."""
+        if page.cursor:
+            stmt = stmt.where(self._after(decode_cursor(page.cursor, self.columns)))
+        order = [col.desc() if self.descending else col.asc() for col in self.columns]
+        return stmt.order_by(*order).limit(page.limit + 1)
+
+    def paginate(self, rows: Sequence, page: PageParams, response: Response,
+                 key: Optional[Callable[[Any], Tuple]] = None) -> List:
+        """Trim the look-ahead row and set the next cursor header from the last row kept."""
+        rows = list(rows)
+        if len(rows) <= page.limit:
+            return rows
+        rows = rows[:page.limit]
+        last = rows[-1]
+        values = key(last) if key else [getattr(last, col.key) for col in self.columns]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(values)
+        return rows
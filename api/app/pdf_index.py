@@ -0,0 +1,73 @@
+import json
+import re
+from typing import Optional
+from pypdf import PdfReader
+
+# Per-document page geometry, computed once at upload and stored on
+# Document.page_index_json so envelope validation, the sealer and the sign
+# page don't have to fetch and parse the PDF to learn its page layout.
+
+_LINEARIZED_RE = re.compile(rb"<<\s*/Linearized\s.*?>>", re.S)
+_LINEARIZED_KEYS = {
+    b"L": "file_length",
+    b"O": "first_page_object",
+    b"E": "first_page_end",
+    b"N": "page_count",
+    b"T": "main_xref_offset",
+}
+
+
+def _box(box):
+    return [round(float(v), 3) for v in (box.left, box.bottom, box.right, box.top)]
+
+
+def _linearization(head: bytes) -> Optional[dict]:
+    match = _LINEARIZED_RE.search(head)
+    if not match:
+        return None
+    params = match.group(0)
+    info = {}
+    for key, name in _LINEARIZED_KEYS.items():
+        found = re.search(rb"/" + key + rb"\s+(\d+)", params)
+        if found:
+            info[name] = int(found.group(1))
+    hint = re.search(rb"/H\s*\[\s*(\d+)\s+(\d+)", params)
+    if hint:
+        info["hint_offset"], info["hint_length"] = int(hint.group(1)), int(hint.group(2))
+    return info
+
+
+def build_page_index(stream) -> Optional[dict]:
+    """Read page count, boxes and rotation from a seekable PDF stream.
+
+    Returns None for anything pypdf can't parse; uploads are not rejected
+    for that, they just go without an index.
+    """
+    try:
+        stream.seek(0)
+        linearized = _linearization(stream.read(1024))
+        stream.seek(0)
+        reader = PdfReader(stream)
+        pages = []
+        for page in reader.pages:
+            entry = {"mediabox": _box(page.mediabox)}
+            cropbox = _box(page.cropbox)
+            if cropbox != entry["mediabox"]:
+                entry["cropbox"] = cropbox
+            rotation = page.rotation % 360
+            if rotation:
+                entry["rotate"] = rotation
+            pages.append(entry)
+    except Exception:
+        return None
+    index = {"page_count": len(pages), "pages": pages}
+    if linearized:
+        index["linearized"] = linearized
+    return index
+
+
+def load_page_index(page_index_json: Optional[str]) -> Optional[dict]:
+    if not page_index_json:
+        return None
+    return json.loads(page_index_json)
+
@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from minio.error import S3Error
+from sqlmodel import Session
+from ..db import get_session
+from ..models import Envelope, Project
+from ..auth import require_admin_access
+from ..audit import ArchiveUnavailable, verify_envelope, checkpoint_envelope, find_event, prove_event, project_root
+from .. import storage
+from ..blobs import BLOB_PREFIX, blob_key
+from ..signatures import SIGNATURE_PREFIX
+
+router = APIRouter()
+
+@router.get("/envelopes/{envelope_id}")
+def verify_envelope_chain(
+    envelope_id: int,
+    full: bool = False,
+    session: Session = Depends(get_session),
+    ctx=Depends(require_admin_access),
+):
+    if not session.get(Envelope, envelope_id):
+        raise HTTPException(404, "envelope not found")
+    return verify_envelope(session, envelope_id, full=full)
+
+@router.post("/envelopes/{envelope_id}/checkpoint")
+def checkpoint_envelope_chain(
+    envelope_id: int,
+    session: Session = Depends(get_session),
+    ctx=Depends(require_admin_access),
+):
+    if not session.get(Envelope, envelope_id):
+        raise HTTPException(404, "envelope not found")
+    return checkpoint_envelope(session, envelope_id)
+
+@router.get("/events/{event_id}/proof")
+def event_inclusion_proof(
+    event_id: int,
+    session: Session = Depends(get_session),
+    ctx=Depends(require_admin_access),
+):
+    try:
+        event = find_event(session, event_id)
+        if not event:
+            raise HTTPException(404, "event not found")
+        return prove_event(session, event)
+    except ArchiveUnavailable as exc:
+        raise HTTPException(404, str(exc))
+
+@router.get("/projects/{project_id}")
+def project_chain_root(
+    project_id: int,
+    session: Session = Depends(get_session),
+    ctx=Depends(require_admin_access),
+):
+    if not session.get(Project, project_id):
+        raise HTTPException(404, "project not found")
+    return project_root(session, project_id)
+
+@router.get("/blobs/{digest}")
+def get_value_blob(
+    digest: str,
+    ctx=Depends(require_admin_access),
+):
+    """Return the stored bytes behind a digest recorded in a `filled` event."""
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        raise HTTPException(400, "digest must be a lowercase hex SHA-256")
+    # Values reference signature images by digest, so those are served too.
+    for prefix in (BLOB_PREFIX, SIGNATURE_PREFIX):
+        key = blob_key(digest, prefix)
+        try:
+            stat = storage.stat_object(key)
+            data = storage.get_bytes(key)
+        except S3Error:
+            continue
+        return Response(data, media_type=stat.content_type)
+    raise HTTPException(404, "blob not found")
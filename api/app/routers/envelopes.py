@@ -3,11 +3,12 @@ from html import escape
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
 from ..db import get_session
-from ..models import Envelope, Signer, Field, Document, Event, ProjectInvestor
+from ..models import Envelope, Signer, Field, Document, ProjectInvestor
 from ..schemas import EnvelopeCreate, EnvelopeSend
 from ..email import send_email, format_sender_name
-from ..utils import canonical_json, sha256_bytes, make_token
+from ..tokens import make_sign_token
 from ..auth import require_admin_access
+from ..events import append_event
 
 router = APIRouter()
 WEB_BASE_URL = os.getenv("WEB_BASE_URL") or os.getenv("NEXT_PUBLIC_WEB_BASE") or "http://localhost:3000"
@@ -16,25 +17,6 @@ def _sign_link(token: str) -> str:
     base = WEB_BASE_URL.rstrip('/')
     return f"{base}/sign/{token}"
 
-def _append_event(session: Session, env_id: int, actor: str, type_: str, meta: dict, ip=None, ua=None):
-    last = session.exec(
-        select(Event).where(Event.envelope_id == env_id).order_by(Event.id.desc())
-    ).first()
-    prev_hash = last.hash if last else "0" * 64
-    payload = {"actor": actor, "type": type_, "meta": meta}
-    event = Event(
-        envelope_id=env_id,
-        actor=actor,
-        type=type_,
-        meta_json=canonical_json(payload),
-        prev_hash=prev_hash,
-        ip=ip,
-        ua=ua,
-    )
-    event.hash = sha256_bytes((prev_hash + event.meta_json).encode())
-    session.add(event)
-    session.commit()
-
 @router.post("")
 def create_envelope(
     data: EnvelopeCreate,
@@ -44,12 +26,17 @@ def create_envelope(
     doc = session.get(Document, data.document_id)
     if not doc or doc.project_id != data.project_id:
         raise HTTPException(400, "document mismatch")
+    if doc.page_count:
+        for f in data.fields:
+            if not 1 <= f.page <= doc.page_count:
+                raise HTTPException(400, f"field page {f.page} out of range (document has {doc.page_count} pages)")
     env = Envelope(
         project_id=data.project_id,
         document_id=data.document_id,
         subject=data.subject,
         message=data.message,
         status="draft",
+        expires_at=data.expires_at,
     )
     session.add(env); session.commit(); session.refresh(env)
 
@@ -99,7 +86,7 @@ def create_envelope(
             font_family=f.font_family or "sans",
         ))
     session.commit()
-    _append_event(session, env.id, "system", "created", {"envelope_id": env.id})
+    append_event(session, env.id, "system", "created", {"envelope_id": env.id})
 
     # Return a small, explicit body so curl shows it
     return {"id": env.id, "status": env.status}
@@ -137,7 +124,7 @@ def send_envelope(
     requester_email = (env.requester_email or "").strip() or None
     intro = env.message or f"{requester_name} invited you to review and sign this document."
     for s in signers:
-        token = make_token({"signer_id": s.id, "envelope_id": envelope_id})
+        token = make_sign_token(s.id, envelope_id)
         link = _sign_link(token)
         custom_subject = env.subject.strip() if env.subject else None
         subject_core = custom_subject or filename
@@ -182,7 +169,7 @@ Open document: {link}
             reply_to=requester_email,
         )
 
-    _append_event(session, env.id, "system", "sent", {})
+    append_event(session, env.id, "system", "sent", {})
     return {"ok": True}
 
 @router.get("/{envelope_id}")
@@ -234,7 +221,7 @@ def dev_magic_links(
     ).all()
     links = []
     for s in signers:
-        token = make_token({"signer_id": s.id, "envelope_id": envelope_id})
+        token = make_sign_token(s.id, envelope_id)
         links.append({
             "signer": {"id": s.id, "name": s.name, "email": s.email},
             "link": _sign_link(token)
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlmodel import Session, select
 from ..db import get_session
 from ..models import Project, ProjectInvestor
 from ..schemas import ProjectInvestorCreate, ProjectInvestorUpdate
 from ..auth import require_admin_access, require_project_or_admin
+from ..pagination import DateRange, Keyset, PageParams, name_prefix
 
 router = APIRouter()
 
@@ -13,17 +15,25 @@ def _ensure_project(session: Session, project_id: int):
         raise HTTPException(404, "project not found")
     return project
 
+INVESTOR_ORDER = Keyset(ProjectInvestor.routing_order, ProjectInvestor.id)
+
 @router.get("/{project_id}/investors")
 def list_investors(
     project_id: int,
+    response: Response,
+    name: Optional[str] = Query(None, description="name prefix"),
+    role: Optional[str] = None,
+    created: DateRange = Depends(),
+    page: PageParams = Depends(),
     session: Session = Depends(get_session),
     ctx=Depends(require_project_or_admin),
 ):
     _ensure_project(session, project_id)
-    investors = session.exec(
-        select(ProjectInvestor).where(ProjectInvestor.project_id == project_id).order_by(ProjectInvestor.routing_order, ProjectInvestor.id)
-    ).all()
-    return investors
+    stmt = select(ProjectInvestor).where(ProjectInvestor.project_id == project_id)
+    if role:
+        stmt = stmt.where(ProjectInvestor.role == role)
+    stmt = created.apply(name_prefix(stmt, ProjectInvestor.name, name), ProjectInvestor.created_at)
+    return INVESTOR_ORDER.paginate(session.exec(INVESTOR_ORDER.apply(stmt, page)).all(), page, response)
 
 @router.post("/{project_id}/investors", status_code=201)
 def create_investor(
@@ -1,8 +1,9 @@
 
 import os
-import secrets
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Response, status
-from sqlmodel import Session, select
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, Query, Request, Response, status
+from sqlalchemy import or_
+from sqlmodel import Session, select, delete
 from minio.error import S3Error
 from ..db import get_session
 from ..models import (
@@ -16,11 +17,22 @@ from ..models import (
     SigningSession,
     SignerFieldValue,
     Event,
+    EventChainHead,
+    EventCheckpoint,
+    EventMerkleNode,
+    EventArchive,
 )
-from ..storage import put_bytes, get_bytes, delete_object
-from ..utils import sha256_bytes, make_token
-from ..auth import require_admin_access, require_project_or_admin
-from ..schemas import ProjectUpdate
+from ..storage import put_stream, delete_object, remove_objects
+from ..downloads import object_response
+from ..utils import HashingReader, canonical_json
+from ..tokens import make_sign_token
+from ..pdf_index import build_page_index
+from ..auth import access_token_cache, issue_project_token, require_admin_access, require_project_or_admin
+from ..schemas import ProjectUpdate, BulkSealRequest
+from ..sealing import sealable_envelope_ids
+from ..tasks import enqueue_bulk_seal
+from ..pagination import DateRange, Keyset, PageParams, name_prefix
+from .signing import forget_layouts
 
 def _serialize_document(doc: Document):
     return {
@@ -51,18 +63,29 @@ def create_project(
     existing = session.exec(select(Project).where(Project.name == name)).first()
     if existing:
         raise HTTPException(status.HTTP_409_CONFLICT, "project name already exists")
-    p = Project(name=name, tenant_id=tenant_id, access_token=secrets.token_urlsafe(32))
+    p = Project(name=name, tenant_id=tenant_id)
+    token = issue_project_token(p)
     session.add(p)
     session.commit()
     session.refresh(p)
-    return p
+    return {**p.model_dump(), "access_token": token}
+
+PROJECT_ORDER = Keyset(Project.id)
 
 @router.get("")
 def list_projects(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    name: Optional[str] = Query(None, description="name prefix"),
+    page: PageParams = Depends(),
     session: Session = Depends(get_session),
     ctx=Depends(require_admin_access),
 ):
-    return session.exec(select(Project)).all()
+    stmt = select(Project)
+    if status_filter:
+        stmt = stmt.where(Project.status == status_filter)
+    stmt = name_prefix(stmt, Project.name, name)
+    return PROJECT_ORDER.paginate(session.exec(PROJECT_ORDER.apply(stmt, page)).all(), page, response)
 
 
 @router.patch("/{project_id}")
@@ -92,63 +115,79 @@ def update_project(
     return project
 
 @router.post("/{project_id}/documents")
-async def upload_document(
+def upload_document(
     project_id: int,
     file: UploadFile = File(...),
     session: Session = Depends(get_session),
     ctx=Depends(require_admin_access),
 ):
+    # Sync route: FastAPI runs it in the threadpool, so the chunked MinIO
+    # upload below never blocks the event loop.
     project = session.get(Project, project_id)
     if not project:
         raise HTTPException(404, "project not found")
-    data = await file.read()
-    sha = sha256_bytes(data)
-    doc = Document(project_id=project_id, filename=file.filename, sha256=sha, s3_key="pending")
+    doc = Document(project_id=project_id, filename=file.filename, s3_key="pending")
     session.add(doc)
     session.flush()
     key = f"projects/{project_id}/uploads/{doc.id}-{file.filename}"
-    put_bytes(key, data, content_type=file.content_type or "application/pdf")
+    reader = HashingReader(file.file)
+    put_stream(key, reader, content_type=file.content_type or "application/pdf")
+    doc.sha256 = reader.hexdigest()
     doc.s3_key = key
+    page_index = build_page_index(file.file)
+    if page_index:
+        doc.page_count = page_index["page_count"]
+        doc.page_index_json = canonical_json(page_index)
     session.add(doc)
     session.commit()
     session.refresh(doc)
     return doc
 
+DOCUMENT_ORDER = Keyset(Document.created_at, Document.id, descending=True)
+
 @router.get("/{project_id}/documents")
 def list_project_documents(
     project_id: int,
+    response: Response,
+    name: Optional[str] = Query(None, description="filename prefix"),
+    created: DateRange = Depends(),
+    page: PageParams = Depends(),
     session: Session = Depends(get_session),
     ctx=Depends(require_project_or_admin),
 ):
     project = session.get(Project, project_id)
     if not project:
         raise HTTPException(404, "project not found")
-    return session.exec(select(Document).where(Document.project_id == project_id).order_by(Document.created_at.desc())).all()
+    stmt = select(Document).where(Document.project_id == project_id)
+    stmt = created.apply(name_prefix(stmt, Document.filename, name), Document.created_at)
+    return DOCUMENT_ORDER.paginate(session.exec(DOCUMENT_ORDER.apply(stmt, page)).all(), page, response)
 
 @router.get("/{project_id}/documents/{document_id}/pdf")
 def download_document_pdf(
     project_id: int,
     document_id: int,
+    request: Request,
     session: Session = Depends(get_session),
     ctx=Depends(require_project_or_admin),
 ):
     document = session.get(Document, document_id)
     if not document or document.project_id != project_id:
         raise HTTPException(404, "document not found")
+    filename = document.filename or f"document-{document_id}.pdf"
     try:
-        pdf_bytes = get_bytes(document.s3_key)
+        return object_response(request, document.s3_key, etag=document.sha256, filename=filename)
     except S3Error:
         raise HTTPException(404, "stored file missing for this document")
-    filename = document.filename or f"document-{document_id}.pdf"
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+
+FINAL_ARTIFACT_ORDER = Keyset(FinalArtifact.completed_at, FinalArtifact.id, descending=True)
 
 @router.get("/{project_id}/final-artifacts")
 def list_project_final_artifacts(
     project_id: int,
+    response: Response,
+    name: Optional[str] = Query(None, description="document filename prefix"),
+    completed: DateRange = Depends(),
+    page: PageParams = Depends(),
     session: Session = Depends(get_session),
     ctx=Depends(require_project_or_admin),
 ):
@@ -162,12 +201,15 @@ def list_project_final_artifacts(
             Envelope.document_id == Document.id,
             Envelope.project_id == project_id,
         )
-        .order_by(FinalArtifact.completed_at.desc())
     )
-    results = session.exec(stmt).all()
-    response = []
+    stmt = completed.apply(name_prefix(stmt, Document.filename, name), FinalArtifact.completed_at)
+    results = FINAL_ARTIFACT_ORDER.paginate(
+        session.exec(FINAL_ARTIFACT_ORDER.apply(stmt, page)).all(), page, response,
+        key=lambda row: (row[0].completed_at, row[0].id),
+    )
+    artifacts = []
     for fa, env, doc in results:
-        response.append(
+        artifacts.append(
             {
                 "envelope_id": env.id,
                 "document_id": doc.id,
@@ -177,7 +219,7 @@ def list_project_final_artifacts(
                 "s3_key_pdf": fa.s3_key_pdf,
             }
         )
-    return response
+    return artifacts
 
 @router.get("/{project_id}/summary")
 def project_summary(
@@ -225,6 +267,7 @@ def project_summary(
 def download_final_pdf(
     project_id: int,
     envelope_id: int,
+    request: Request,
     session: Session = Depends(get_session),
     ctx=Depends(require_project_or_admin),
 ):
@@ -235,17 +278,12 @@ def download_final_pdf(
     if not fa:
         raise HTTPException(404, "final artifact not found")
     doc = session.get(Document, env.document_id)
+    filename_base = doc.filename if doc and doc.filename else f"envelope-{envelope_id}"
+    filename = filename_base if filename_base.lower().endswith(".pdf") else f"{filename_base}.pdf"
     try:
-        pdf_bytes = get_bytes(fa.s3_key_pdf)
+        return object_response(request, fa.s3_key_pdf, etag=fa.sha256_final, filename=filename)
     except S3Error:
         raise HTTPException(404, "stored file missing for this envelope")
-    filename_base = doc.filename if doc and doc.filename else f"envelope-{envelope_id}"
-    filename = filename_base if filename_base.lower().endswith(".pdf") else f"{filename_base}.pdf"
-    return Response(
-        content=pdf_bytes,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
 
 @router.delete("/{project_id}/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_document(
@@ -279,26 +317,64 @@ def delete_final_artifact(
     session.delete(fa)
     session.commit()
 
+ENVELOPE_ORDER = Keyset(Envelope.created_at, Envelope.id, descending=True)
+
 @router.get("/{project_id}/envelopes")
 def list_project_envelopes(
     project_id: int,
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    q: Optional[str] = None,
+    include_links: bool = False,
+    page: PageParams = Depends(),
     session: Session = Depends(get_session),
     ctx=Depends(require_project_or_admin),
 ):
+    """Newest envelopes first, one page at a time (see pagination.py).
+
+    `status` takes one or more comma-separated statuses; `q` matches the
+    subject, document filename or a signer's name/email. Signer magic links
+    are only minted with `include_links=true`.
+    """
     project = session.get(Project, project_id)
     if not project:
         raise HTTPException(404, "project not found")
-    envelopes = session.exec(
-        select(Envelope).where(Envelope.project_id == project_id).order_by(Envelope.created_at.desc())
-    ).all()
-    doc_map = {}
+    stmt = (
+        select(Envelope, Document.filename)
+        .outerjoin(Document, Document.id == Envelope.document_id)
+        .where(Envelope.project_id == project_id)
+    )
+    if status_filter:
+        stmt = stmt.where(Envelope.status.in_([s.strip() for s in status_filter.split(",") if s.strip()]))
+    if q:
+        pattern = f"%{q}%"
+        stmt = stmt.where(or_(
+            Envelope.subject.ilike(pattern),
+            Document.filename.ilike(pattern),
+            select(Signer.id).where(
+                Signer.envelope_id == Envelope.id,
+                or_(Signer.name.ilike(pattern), Signer.email.ilike(pattern)),
+            ).exists(),
+        ))
+    rows = ENVELOPE_ORDER.paginate(
+        session.exec(ENVELOPE_ORDER.apply(stmt, page)).all(), page, response,
+        key=lambda row: (row[0].created_at, row[0].id),
+    )
+
+    signers_by_envelope = {}
+    if rows:
+        signers = session.exec(
+            select(Signer)
+            .where(Signer.envelope_id.in_([env.id for env, _ in rows]))
+            .order_by(Signer.envelope_id, Signer.routing_order, Signer.id)
+        ).all()
+        for signer in signers:
+            signers_by_envelope.setdefault(signer.envelope_id, []).append(signer)
+
     link_base = os.getenv("WEB_BASE_URL") or os.getenv("NEXT_PUBLIC_WEB_BASE") or "http://localhost:3000"
     results = []
-    for env in envelopes:
-        if env.document_id not in doc_map:
-            doc_map[env.document_id] = session.get(Document, env.document_id)
-        doc = doc_map.get(env.document_id)
-        signers = session.exec(select(Signer).where(Signer.envelope_id == env.id).order_by(Signer.routing_order)).all()
+    for env, filename in rows:
+        signers = signers_by_envelope.get(env.id, [])
         completed = sum(1 for s in signers if s.status == "completed")
         results.append(
             {
@@ -306,7 +382,7 @@ def list_project_envelopes(
                 "subject": env.subject,
                 "status": env.status,
                 "created_at": env.created_at,
-                "document": {"id": doc.id if doc else None, "filename": doc.filename if doc else None},
+                "document": {"id": env.document_id if filename is not None else None, "filename": filename},
                 "total_signers": len(signers),
                 "completed_signers": completed,
                 "signers": [
@@ -318,7 +394,10 @@ def list_project_envelopes(
                         "role": s.role,
                         "routing_order": s.routing_order,
                         "completed_at": s.completed_at,
-                        "magic_link": f"{link_base}/sign/{make_token({'signer_id': s.id, 'envelope_id': env.id})}",
+                        "magic_link": (
+                            f"{link_base}/sign/{make_sign_token(s.id, env.id)}"
+                            if include_links else None
+                        ),
                     }
                     for s in signers
                 ],
@@ -326,51 +405,56 @@ def list_project_envelopes(
         )
     return results
 
-def _delete_envelope(session: Session, envelope: Envelope):
-    final_artifacts = session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == envelope.id)).all()
-    for fa in final_artifacts:
-        try:
-            delete_object(fa.s3_key_pdf)
-        except Exception:
-            pass
-        try:
-            delete_object(fa.s3_key_audit_json)
-        except Exception:
-            pass
-        session.delete(fa)
-    fields = session.exec(select(FieldModel).where(FieldModel.envelope_id == envelope.id)).all()
-    for field in fields:
-        session.delete(field)
-    signers = session.exec(select(Signer).where(Signer.envelope_id == envelope.id)).all()
-    for signer in signers:
-        sessions = session.exec(select(SigningSession).where(SigningSession.signer_id == signer.id)).all()
-        for sess in sessions:
-            session.delete(sess)
-        values = session.exec(select(SignerFieldValue).where(SignerFieldValue.signer_id == signer.id)).all()
-        for value in values:
-            session.delete(value)
-        session.delete(signer)
-    events = session.exec(select(Event).where(Event.envelope_id == envelope.id)).all()
-    for event in events:
-        session.delete(event)
-    session.delete(envelope)
+def _delete_envelopes(session: Session, envelope_ids) -> List[str]:
+    """Delete every envelope matched by the `envelope_ids` subquery with set-based DELETEs.
+
+    Returns the MinIO keys that belonged to them; callers remove those after
+    the transaction commits. Their cached signer layouts are dropped here.
+    """
+    signer_ids = select(Signer.id).where(Signer.envelope_id.in_(envelope_ids))
+    keys = []
+    for pdf_key, audit_key in session.exec(
+        select(FinalArtifact.s3_key_pdf, FinalArtifact.s3_key_audit_json).where(FinalArtifact.envelope_id.in_(envelope_ids))
+    ):
+        keys += [pdf_key, audit_key]
+    keys += session.exec(select(EventArchive.s3_key).where(EventArchive.envelope_id.in_(envelope_ids))).all()
+    forget_layouts(session.exec(select(Envelope.id).where(Envelope.id.in_(envelope_ids))).all())
+
+    for stmt in (
+        delete(SigningSession).where(SigningSession.signer_id.in_(signer_ids)),
+        delete(SignerFieldValue).where(SignerFieldValue.signer_id.in_(signer_ids)),
+        delete(Signer).where(Signer.envelope_id.in_(envelope_ids)),
+        delete(FieldModel).where(FieldModel.envelope_id.in_(envelope_ids)),
+        delete(Event).where(Event.envelope_id.in_(envelope_ids)),
+        delete(EventChainHead).where(EventChainHead.envelope_id.in_(envelope_ids)),
+        delete(EventCheckpoint).where(EventCheckpoint.envelope_id.in_(envelope_ids)),
+        delete(EventMerkleNode).where(EventMerkleNode.envelope_id.in_(envelope_ids)),
+        delete(EventArchive).where(EventArchive.envelope_id.in_(envelope_ids)),
+        delete(FinalArtifact).where(FinalArtifact.envelope_id.in_(envelope_ids)),
+        delete(Envelope).where(Envelope.id.in_(envelope_ids)),
+    ):
+        session.exec(stmt.execution_options(synchronize_session=False))
+    return keys
 
 @router.delete("/{project_id}/envelopes/{envelope_id}", status_code=status.HTTP_204_NO_CONTENT)
 def revoke_envelope(
     project_id: int,
     envelope_id: int,
+    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
     ctx=Depends(require_admin_access),
 ):
     envelope = session.get(Envelope, envelope_id)
     if not envelope or envelope.project_id != project_id:
         raise HTTPException(404, "envelope not found")
-    _delete_envelope(session, envelope)
+    keys = _delete_envelopes(session, select(Envelope.id).where(Envelope.id == envelope_id))
     session.commit()
+    background_tasks.add_task(remove_objects, keys)
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_project(
     project_id: int,
+    background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
     ctx=Depends(require_admin_access),
 ):
@@ -378,27 +462,34 @@ def delete_project(
     if not project:
         raise HTTPException(404, "project not found")
 
-    # delete documents + files
-    documents = session.exec(select(Document).where(Document.project_id == project_id)).all()
-    for doc in documents:
-        try:
-            delete_object(doc.s3_key)
-        except Exception:
-            pass
-        session.delete(doc)
-
-    # delete envelopes and related data
-    envelopes = session.exec(select(Envelope).where(Envelope.project_id == project_id)).all()
-    for env in envelopes:
-        _delete_envelope(session, env)
-
-    # project investors
-    investors = session.exec(select(ProjectInvestor).where(ProjectInvestor.project_id == project_id)).all()
-    for investor in investors:
-        session.delete(investor)
-
-    session.delete(project)
+    token_digest = project.access_token_hash
+    keys = list(session.exec(select(Document.s3_key).where(Document.project_id == project_id)).all())
+    keys += _delete_envelopes(session, select(Envelope.id).where(Envelope.project_id == project_id))
+    for stmt in (
+        delete(Document).where(Document.project_id == project_id),
+        delete(ProjectInvestor).where(ProjectInvestor.project_id == project_id),
+        delete(Project).where(Project.id == project_id),
+    ):
+        session.exec(stmt.execution_options(synchronize_session=False))
     session.commit()
+    access_token_cache.invalidate(token_digest)
+    # Objects go after the rows are gone, in batched multi-object deletes
+    # that don't hold the request's transaction open.
+    background_tasks.add_task(remove_objects, keys)
+
+@router.post("/{project_id}/seal")
+def bulk_seal_project(
+    project_id: int,
+    payload: BulkSealRequest,
+    session: Session = Depends(get_session),
+    ctx=Depends(require_admin_access),
+):
+    project = session.get(Project, project_id)
+    if not project:
+        raise HTTPException(404, "project not found")
+    envelope_ids = sealable_envelope_ids(session, project_id, payload.envelope_ids, payload.reseal)
+    task_id = enqueue_bulk_seal(envelope_ids, payload.reseal) if envelope_ids else None
+    return {"task_id": task_id, "envelope_ids": envelope_ids}
 
 @router.post("/{project_id}/access-token")
 def regenerate_project_token(
@@ -409,8 +500,9 @@ def regenerate_project_token(
     project = session.get(Project, project_id)
     if not project:
         raise HTTPException(404, "project not found")
-    project.access_token = secrets.token_urlsafe(32)
+    old_digest = project.access_token_hash
+    token = issue_project_token(project)
     session.add(project)
     session.commit()
-    session.refresh(project)
-    return {"access_token": project.access_token}
+    access_token_cache.invalidate(old_digest)
+    return {"access_token": token}
@@ -1,31 +1,42 @@
+import binascii
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from html import escape
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile
+from minio.error import S3Error
+from sqlalchemy import func
 from sqlmodel import Session, select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.inspection import inspect as sa_inspect
 from ..db import get_session
-from ..models import Signer, Envelope, Field, Event, Document, FinalArtifact, SignerFieldValue
+from ..models import Envelope, Signer, Field, Document, FinalArtifact, SignerFieldValue
 from ..schemas import SignSave, ConsentAccept
-from ..utils import read_token, canonical_json, sha256_bytes
-from ..storage import get_bytes, put_bytes
-from ..email import send_email, format_sender_name
-import json
+from ..utils import b64png_to_bytes, canonical_json, sha256_bytes
+from ..tokens import SigningContext, signing_context, signing_write_context
+from .. import storage
+from ..downloads import object_response, file_response, not_modified
+from ..pdf_index import load_page_index
+from ..events import append_event
+from ..blobs import store_values
+from ..config import SIGN_LAYOUT_CACHE_SIZE, SIGNATURE_MAX_UPLOAD_BYTES
+from ..signatures import (
+    InvalidSignatureImage,
+    InvalidStrokes,
+    has_signature,
+    is_strokes,
+    normalize_strokes,
+    parse_signature_ref,
+    signature_ref,
+    store_signature,
+)
+from ..sealing import mark_seal_failed
+from ..tasks import enqueue_seal
+from ..worker_stub import load_template, extract_pages
 
 router = APIRouter()
 
 # ---------- helpers ----------
-def _append_event(session: Session, env_id: int, actor: str, type_: str, meta: dict, ip=None, ua=None):
-    last = session.exec(select(Event).where(Event.envelope_id==env_id).order_by(Event.id.desc())).first()
-    prev_hash = last.hash if last else "0"*64
-    payload = {"actor": actor, "type": type_, "meta": meta}
-    event = Event(
-        envelope_id=env_id, actor=actor, type=type_,
-        meta_json=canonical_json(payload), prev_hash=prev_hash,
-        ip=ip, ua=ua
-    )
-    event.hash = sha256_bytes((prev_hash + event.meta_json).encode())
-    session.add(event); session.commit()
-
 def sa_to_dict(obj):
     if obj is None:
         return {}
@@ -35,165 +46,339 @@ def sa_to_dict(obj):
         data[col.key] = getattr(obj, col.key)
     return data
 
-def _persist_field_values(session: Session, signer: Signer, values: dict):
-    if not values:
+def _value_json(meta):
+    """Canonical JSON for a submitted value, or None when the field is being cleared."""
+    payload = meta if isinstance(meta, dict) else {"value": meta}
+    value = payload.get("value")
+    if value is None:
+        return None
+    if isinstance(value, str) and not value.strip():
+        return None
+    return canonical_json(payload)
+
+def _signature_value(meta):
+    """Validate drawn strokes, or swap an inline base64 image for a reference to its stored blob."""
+    payload = dict(meta) if isinstance(meta, dict) else {"value": meta}
+    value = payload.get("value")
+    if is_strokes(value):
+        try:
+            payload["value"] = normalize_strokes(value)
+        except InvalidStrokes as exc:
+            raise HTTPException(400, str(exc))
+        return payload
+    if isinstance(value, (dict, list)):
+        raise HTTPException(400, "signature must be strokes or a PNG image")
+    if not isinstance(value, str) or not value.strip():
+        return payload
+    digest = parse_signature_ref(value)
+    if digest is not None:
+        if not has_signature(digest):
+            raise HTTPException(400, "unknown signature image; upload it first")
+        return payload
+    try:
+        payload["value"] = signature_ref(store_signature(b64png_to_bytes(value)))
+    except (binascii.Error, InvalidSignatureImage):
+        raise HTTPException(400, "signature must be a PNG image")
+    return payload
+
+def _upsert_field_values(session: Session, signer_id: int, rows: dict):
+    now = datetime.utcnow()
+    values = [
+        {"signer_id": signer_id, "field_id": field_id, "value_json": value_json, "created_at": now}
+        for field_id, value_json in rows.items()
+    ]
+    dialect = session.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        session.exec(delete(SignerFieldValue).where(
+            SignerFieldValue.signer_id == signer_id, SignerFieldValue.field_id.in_(rows),
+        ))
+        session.add_all(SignerFieldValue(**row) for row in values)
         return
-    fields = session.exec(select(Field).where(Field.envelope_id == signer.envelope_id)).all()
-    field_map = {f.id: f for f in fields}
-    session.exec(delete(SignerFieldValue).where(SignerFieldValue.signer_id == signer.id))
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(SignerFieldValue).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["signer_id", "field_id"],
+        set_={"value_json": stmt.excluded.value_json, "created_at": stmt.excluded.created_at},
+        where=SignerFieldValue.value_json != stmt.excluded.value_json,
+    )
+    session.exec(stmt)
+
+def _persist_field_values(session: Session, signer: Signer, values: dict, replace: bool = True):
+    """Write only the values that changed.
+
+    With `replace`, `values` is the signer's whole form and stored values of
+    fields missing from it are dropped. Without it only the fields present
+    are touched, so an empty partial save is a no-op while an empty whole
+    form clears everything. Empty values clear their field either way.
+    Returns (written {field_id: value}, cleared field ids).
+    """
+    if not values and not replace:
+        return {}, []
+    submitted = {}
     for field_id, meta in values.items():
         try:
-            fid_int = int(field_id)
+            submitted[int(field_id)] = meta
         except (TypeError, ValueError):
             continue
-        field = field_map.get(fid_int)
-        if not field:
-            continue
+    existing = dict(session.exec(
+        select(SignerFieldValue.field_id, SignerFieldValue.value_json).where(SignerFieldValue.signer_id == signer.id)
+    ).all())
+    fields = session.exec(
+        select(Field).where(Field.envelope_id == signer.envelope_id, Field.id.in_(submitted))
+    ).all() if submitted else []
+    kept, changed, written = set(), {}, {}
+    for field in fields:
         if field.role and signer.role and field.role != signer.role:
             continue
-        payload = meta if isinstance(meta, dict) else {"value": meta}
-        value = payload.get("value")
-        if value is None:
-            continue
-        if isinstance(value, str) and not value.strip():
+        meta = submitted[field.id]
+        if field.type in ("signature", "initials"):
+            meta = _signature_value(meta)
+        value_json = _value_json(meta)
+        if value_json is None:
             continue
-        sfv = SignerFieldValue(
-            signer_id=signer.id,
-            field_id=fid_int,
-            value_json=canonical_json(payload),
-        )
-        session.add(sfv)
+        kept.add(field.id)
+        if existing.get(field.id) != value_json:
+            changed[field.id] = value_json
+            written[str(field.id)] = meta
+    if replace:
+        cleared = set(existing) - kept
+    else:
+        cleared = {fid for fid in submitted if fid in existing and fid not in kept}
+    if cleared:
+        session.exec(delete(SignerFieldValue).where(
+            SignerFieldValue.signer_id == signer.id, SignerFieldValue.field_id.in_(cleared),
+        ))
+    if changed:
+        _upsert_field_values(session, signer.id, changed)
     session.flush()
-
-def _collect_envelope_values(session: Session, envelope_id: int):
-    fields = session.exec(select(Field).where(Field.envelope_id == envelope_id)).all()
-    field_map = {f.id: f for f in fields}
-    signer_ids = session.exec(select(Signer.id).where(Signer.envelope_id == envelope_id)).all()
-    if not signer_ids:
-        return {}
-    rows = session.exec(
-        select(SignerFieldValue).where(SignerFieldValue.signer_id.in_(signer_ids))
-    ).all()
-    combined = {}
-    for row in rows:
-        field = field_map.get(row.field_id)
-        if not field:
-            continue
-        try:
-            data = json.loads(row.value_json or "{}")
-        except json.JSONDecodeError:
-            data = {}
-        value = data.get("value")
-        if value is None:
-            continue
-        if isinstance(value, str) and not value.strip():
-            continue
-        combined[str(field.id)] = {
-            "type": field.type,
-            "page": field.page,
-            "x": field.x,
-            "y": field.y,
-            "w": field.w,
-            "h": field.h,
-            "value": value,
-            "font": data.get("font") or field.font_family or "sans",
-        }
-    return combined
+    return written, sorted(cleared)
 
 # ---------- routes ----------
 
-@router.get("/{token}")
-def load_signing_session(token: str, request: Request, session: Session = Depends(get_session)):
-    # decode token and load signer/envelope/fields
-    data = read_token(token)
-    signer = session.get(Signer, data.get("signer_id"))
-    if not signer:
-        raise HTTPException(404, "not found")
-    env = session.get(Envelope, signer.envelope_id)
-    if not env:
-        raise HTTPException(404, "not found")
-    final_artifact = session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == env.id)).first()
-    all_signers = session.exec(select(Signer).where(Signer.envelope_id == env.id)).all()
-    waiting_on = len([s for s in all_signers if s.status != "completed" and s.id != signer.id])
-    fields = session.exec(select(Field).where(Field.envelope_id==env.id)).all()
-    filtered_fields = []
+# A signer's fields are fixed once the envelope is created, so the layout is
+# built once and served from memory with a strong ETag. The document's page
+# index can still be filled in later (app.scripts.backfill_page_index), so
+# its page count is part of the key and a backfilled layout gets a new entry.
+_layouts: "OrderedDict[tuple, tuple]" = OrderedDict()
+_layouts_lock = threading.Lock()
+
+def forget_layouts(envelope_ids) -> None:
+    """Drop cached layouts of deleted envelopes so a reused id cannot serve them."""
+    envelope_ids = set(envelope_ids)
+    with _layouts_lock:
+        for key in [key for key in _layouts if key[0] in envelope_ids]:
+            del _layouts[key]
+
+def _signer_layout(session: Session, signer: Signer, env) -> tuple:
+    """(etag, JSON body, dict) of the document info and fields visible to `signer`."""
+    doc = session.get(Document, env.document_id)
+    key = (env.id, signer.id, doc.page_count if doc else None)
+    with _layouts_lock:
+        cached = _layouts.get(key)
+        if cached is not None:
+            _layouts.move_to_end(key)
+            return cached
+    fields = session.exec(select(Field).where(Field.envelope_id == env.id).order_by(Field.id)).all()
+    visible = []
     for field in fields:
         if field.signer_id and field.signer_id != signer.id:
             continue
         if field.signer_id is None and field.role and signer.role and field.role != signer.role:
             continue
-        filtered_fields.append(field)
-    _append_event(session, env.id, f"signer:{signer.id}", "opened", {}, ip=request.client.host, ua=request.headers.get("user-agent"))
-    return {
+        visible.append(sa_to_dict(field))
+    layout = {
+        "document": {
+            "id": doc.id,
+            "filename": doc.filename,
+            "page_count": doc.page_count,
+            "page_index": load_page_index(doc.page_index_json),
+        } if doc else None,
+        "fields": visible,
+    }
+    body = canonical_json(layout).encode()
+    cached = (f'"{sha256_bytes(body)}"', body, layout)
+    with _layouts_lock:
+        _layouts[key] = cached
+        while len(_layouts) > SIGN_LAYOUT_CACHE_SIZE:
+            _layouts.popitem(last=False)
+    return cached
+
+@router.get("/{token}")
+def load_signing_session(
+    request: Request,
+    include_layout: bool = True,
+    ctx: SigningContext = Depends(signing_context),
+    session: Session = Depends(get_session),
+):
+    signer, env = ctx.signer, ctx.envelope
+    # Everything that changes while people sign, in one query.
+    waiting = (
+        select(func.count(Signer.id))
+        .where(Signer.envelope_id == env.id, Signer.status != "completed", Signer.id != signer.id)
+        .scalar_subquery()
+    )
+    final_artifact, waiting_on = session.exec(
+        select(FinalArtifact, waiting)
+        .select_from(Envelope)
+        .outerjoin(FinalArtifact, FinalArtifact.envelope_id == Envelope.id)
+        .where(Envelope.id == env.id)
+    ).first()
+    # Buffered: page loads stay read-only and repeat opens are coalesced.
+    append_event(session, env.id, f"signer:{signer.id}", "opened", {}, ip=request.client.host, ua=request.headers.get("user-agent"), buffered=True)
+    payload = {
         "envelope": sa_to_dict(env),
         "signer": sa_to_dict(signer),
         "waiting_on": waiting_on,
         "final_artifact": sa_to_dict(final_artifact) if final_artifact else None,
-        "fields": [sa_to_dict(f) for f in filtered_fields],
     }
+    etag, _, layout = _signer_layout(session, signer, env)
+    payload["layout_etag"] = etag
+    if include_layout:
+        payload.update(layout)
+    return payload
+
+@router.get("/{token}/layout")
+def get_signing_layout(
+    request: Request,
+    ctx: SigningContext = Depends(signing_context),
+    session: Session = Depends(get_session),
+):
+    """The document info and fields for this signer; revalidate with If-None-Match."""
+    etag, body, _ = _signer_layout(session, ctx.signer, ctx.envelope)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 @router.get("/{token}/pdf")
-def get_original_pdf(token: str, session: Session = Depends(get_session)):
-    data = read_token(token)
-    signer = session.get(Signer, data.get("signer_id"))
-    if not signer:
-        raise HTTPException(404, "not found")
-    env = session.get(Envelope, signer.envelope_id)
-    if not env:
-        raise HTTPException(404, "not found")
+def get_original_pdf(request: Request, ctx: SigningContext = Depends(signing_context), session: Session = Depends(get_session)):
+    env = ctx.envelope
     doc = session.get(Document, env.document_id)
     if not doc:
         raise HTTPException(404, "not found")
-    pdf_bytes = get_bytes(doc.s3_key)
-    return Response(content=pdf_bytes, media_type="application/pdf")
+    try:
+        return object_response(request, doc.s3_key, etag=doc.sha256)
+    except S3Error:
+        raise HTTPException(404, "stored file missing for this document")
 
 @router.get("/{token}/final-pdf")
-def get_final_pdf(token: str, session: Session = Depends(get_session)):
-    data = read_token(token)
-    signer = session.get(Signer, data.get("signer_id"))
-    if not signer:
-        raise HTTPException(404, "not found")
-    env = session.get(Envelope, signer.envelope_id)
-    if not env:
-        raise HTTPException(404, "not found")
+def get_final_pdf(request: Request, ctx: SigningContext = Depends(signing_context), session: Session = Depends(get_session)):
+    env = ctx.envelope
     final_artifact = session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == env.id)).first()
     if not final_artifact:
         raise HTTPException(404, "final artifact not ready")
-    pdf_bytes = get_bytes(final_artifact.s3_key_pdf)
-    return Response(content=pdf_bytes, media_type="application/pdf")
+    try:
+        return object_response(request, final_artifact.s3_key_pdf, etag=final_artifact.sha256_final)
+    except S3Error:
+        raise HTTPException(404, "stored file missing for this envelope")
 
-@router.post("/{token}/save")
-def save_partial(token: str, payload: SignSave, session: Session = Depends(get_session)):
-    data = read_token(token)
-    signer = session.get(Signer, data.get("signer_id"))
-    if not signer:
+def _parse_page_span(spec: str):
+    first, sep, last = spec.partition("-")
+    try:
+        first = int(first)
+        last = int(last) if sep else first
+    except ValueError:
+        raise HTTPException(400, "pages must be a page number or a range like 3-5")
+    if first < 1 or last < first:
+        raise HTTPException(400, "pages must be a page number or a range like 3-5")
+    return first, last
+
+@router.get("/{token}/pages/{pages}")
+def get_pdf_pages(pages: str, request: Request, ctx: SigningContext = Depends(signing_context), session: Session = Depends(get_session)):
+    """Serve one page ("3") or a page range ("3-5") of the original as its own PDF."""
+    env = ctx.envelope
+    doc = session.get(Document, env.document_id)
+    if not doc:
         raise HTTPException(404, "not found")
-    env = session.get(Envelope, signer.envelope_id)
-    _persist_field_values(session, signer, payload.values or {})
-    _append_event(session, env.id, f"signer:{signer.id}", "filled", {"values": payload.values})
-    return {"ok": True}
+    first, last = _parse_page_span(pages)
+
+    def template():
+        return load_template(doc.sha256, lambda: storage.object_cache.read(doc.sha256, doc.s3_key))
+
+    index = load_page_index(doc.page_index_json)
+    try:
+        if index:
+            page_count = index["page_count"]
+            geometry = index["pages"][first - 1:last]
+        else:
+            tpl = template()
+            page_count = len(tpl.pages)
+            geometry = [{"mediabox": [0, 0, w, h]} for w, h in tpl.geometry[first - 1:last]]
+        if last > page_count:
+            raise HTTPException(404, f"document has {page_count} pages")
+        # Extracted spans are cached next to whole objects, keyed by the
+        # document hash, so every envelope of a document shares them.
+        name = f"{doc.sha256}.p{first}-{last}"
+        path = None
+        if doc.sha256:
+            path = storage.object_cache.path_for_generated(name, lambda: extract_pages(template(), first, last))
+        body = extract_pages(template(), first, last) if path is None else None
+    except S3Error:
+        raise HTTPException(404, "stored file missing for this document")
+    headers = {
+        "X-Page-Count": str(page_count),
+        "X-Page-Range": f"{first}-{last}",
+        "X-Page-Geometry": canonical_json(geometry),
+        "Cache-Control": "private, max-age=86400",
+    }
+    if body is not None:
+        return Response(body, media_type="application/pdf", headers=headers)
+    return file_response(request, path, etag=name, headers=headers)
+
+def _save_values(ctx: SigningContext, session: Session, values: dict, replace: bool):
+    signer, env = ctx.signer, ctx.envelope
+    written, cleared = _persist_field_values(session, signer, values or {}, replace=replace)
+    if not written and not cleared:
+        # Autosaves of an unchanged form write nothing at all.
+        return {"ok": True, "changed": 0}
+    # The chain commits to each value through its digest; the values
+    # themselves live once in blob storage instead of in every event row.
+    meta = {"values": store_values(written)}
+    if cleared:
+        meta["cleared"] = cleared
+    # Written with the values, in the same transaction, before the save is acknowledged.
+    append_event(session, env.id, f"signer:{signer.id}", "filled", meta)
+    return {"ok": True, "changed": len(written) + len(cleared)}
+
+@router.post("/{token}/save")
+def save_partial(payload: SignSave, ctx: SigningContext = Depends(signing_write_context), session: Session = Depends(get_session)):
+    """Save the signer's whole form; fields left out are cleared."""
+    return _save_values(ctx, session, payload.values, replace=True)
+
+@router.patch("/{token}/save")
+def patch_values(payload: SignSave, ctx: SigningContext = Depends(signing_write_context), session: Session = Depends(get_session)):
+    """Save only the fields sent; an empty value clears that field."""
+    return _save_values(ctx, session, payload.values, replace=False)
+
+@router.post("/{token}/signatures")
+def upload_signature(
+    file: UploadFile = File(...),
+    ctx: SigningContext = Depends(signing_write_context),
+):
+    """Store a signature/initials PNG once; fields then reference the returned `ref`."""
+    data = file.file.read(SIGNATURE_MAX_UPLOAD_BYTES + 1)
+    if len(data) > SIGNATURE_MAX_UPLOAD_BYTES:
+        raise HTTPException(413, "signature image is too large")
+    try:
+        digest = store_signature(data)
+    except InvalidSignatureImage as exc:
+        raise HTTPException(400, str(exc))
+    return {"ref": signature_ref(digest), "sha256": digest}
 
 @router.post("/{token}/consent")
-def accept_consent(token: str, payload: ConsentAccept, session: Session = Depends(get_session)):
-    data = read_token(token)
-    signer = session.get(Signer, data.get("signer_id"))
-    if not signer:
-        raise HTTPException(404, "not found")
-    env = session.get(Envelope, signer.envelope_id)
+def accept_consent(payload: ConsentAccept, ctx: SigningContext = Depends(signing_write_context), session: Session = Depends(get_session)):
+    signer, env = ctx.signer, ctx.envelope
     if not payload.accepted:
         raise HTTPException(400, "consent required")
-    _append_event(session, env.id, f"signer:{signer.id}", "consented", {})
+    append_event(session, env.id, f"signer:{signer.id}", "consented", {})
     return {"ok": True}
 
 @router.post("/{token}/complete")
-def complete_signing(token: str, payload: SignSave, session: Session = Depends(get_session)):
-    data = read_token(token)
-    signer = session.get(Signer, data.get("signer_id"))
-    if not signer:
-        raise HTTPException(404, "not found")
-    env = session.get(Envelope, signer.envelope_id)
+def complete_signing(payload: SignSave, ctx: SigningContext = Depends(signing_write_context), session: Session = Depends(get_session)):
+    signer, env = ctx.signer, ctx.envelope
 
-    _persist_field_values(session, signer, payload.values or {})
+    # Completing without values keeps what autosave already stored.
+    _persist_field_values(session, signer, payload.values or {}, replace=bool(payload.values))
     signer.status = "completed"
     signer.completed_at = datetime.utcnow()
     session.add(signer); session.flush()
@@ -202,7 +387,7 @@ def complete_signing(token: str, payload: SignSave, session: Session = Depends(g
         select(Signer).where(Signer.envelope_id == env.id, Signer.status != "completed")
     ).all()
     response: dict = {"ok": True}
-    _append_event(session, env.id, f"signer:{signer.id}", "completed", {"signer_id": signer.id})
+    append_event(session, env.id, f"signer:{signer.id}", "completed", {"signer_id": signer.id})
 
     if remaining:
         session.commit()
@@ -217,74 +402,26 @@ def complete_signing(token: str, payload: SignSave, session: Session = Depends(g
         session.commit()
         return response
 
-    aggregate_values = _collect_envelope_values(session, env.id)
-    doc = session.get(Document, env.document_id)
-    original = get_bytes(doc.s3_key)
-    from ..worker_stub import seal_pdf
-    final_pdf, audit_json, sha_final = seal_pdf(original, env.id, aggregate_values)
-    key_pdf = f"projects/{doc.project_id}/final/envelopes/{env.id}.pdf"
-    key_audit = f"projects/{doc.project_id}/final/envelopes/{env.id}.audit.json"
-    put_bytes(key_pdf, final_pdf, content_type="application/pdf")
-    put_bytes(key_audit, audit_json.encode(), content_type="application/json")
-    fa = FinalArtifact(envelope_id=env.id, s3_key_pdf=key_pdf, s3_key_audit_json=key_audit, sha256_final=sha_final)
-    env.status = "completed"
-    session.add(fa)
+    env.status = "sealing"
     session.add(env)
     session.commit()
-    _append_event(session, env.id, "system", "sealed", {"sha256_final": sha_final})
-    response["sha256_final"] = sha_final
-    response["sealed"] = True
-
-    # Notify all parties with the executed PDF attached
-    signers = session.exec(select(Signer).where(Signer.envelope_id == env.id)).all()
-    filename = doc.filename or f"Envelope {env.id}"
-    subject = f"Completed: {filename}"
-    sha_line = f"Final SHA256: {sha_final}"
-    requester_given_name = (env.requester_name or "").strip() or None
-    requester_email = (env.requester_email or "").strip() or None
-    invited_by = requester_given_name or "Your team"
-    invited_contact = f"{invited_by}{f' · {requester_email}' if requester_email else ''}"
-    plain_body = (
-        f"All parties have finished signing {filename}.\n"
-        f"Requested by: {invited_contact}\n\n"
-        f"{sha_line}\n\nA copy of the executed PDF is attached for your records."
-    )
-    base_name = filename[:-4] if filename.lower().endswith(".pdf") else filename
-    attachment_name = f"{base_name} - executed.pdf"
-    html_body = f"""
-<html>
-  <body style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; background: #f5f6f8; padding: 24px;">
-    <div style="max-width: 520px; margin: 0 auto; background: #ffffff; border-radius: 12px; padding: 24px; box-shadow: 0 10px 25px rgba(15,23,42,0.08);">
-      <h2 style="margin-top: 0; font-size: 20px; color: #0f172a;">Completed</h2>
-      <p style="font-size: 14px; color: #1e293b; line-height: 1.5;">
-        All parties have finished signing <strong>{escape(filename)}</strong>.
-      </p>
-      <p style="font-size: 13px; color: #475569; margin-top: -4px;">
-        Requested by {escape(invited_contact)}
-      </p>
-      <p style="font-size: 13px; color: #475569; background: #f8fafc; padding: 12px 16px; border-radius: 8px;">
-        {escape(sha_line)}
-      </p>
-      <p style="font-size: 13px; color: #475569;">A copy of the executed PDF is attached for your records.</p>
-    </div>
-  </body>
-</html>
-"""
-    attachments = [{
-        "filename": attachment_name,
-        "content": final_pdf,
-        "maintype": "application",
-        "subtype": "pdf",
-    }]
-    sender_label = format_sender_name(requester_given_name)
-    for s in signers:
-        send_email(
-            s.email,
-            subject,
-            plain_body,
-            html_body=html_body,
-            attachments=attachments,
-            sender_name=sender_label,
-            reply_to=requester_email,
-        )
+    response["sealed"] = False
+    try:
+        enqueue_seal(env.id)
+    except Exception as exc:
+        # The signature is saved either way; report the failure instead of
+        # leaving the envelope in `sealing` with no job behind it.
+        mark_seal_failed(session, env.id, f"could not queue sealing: {exc!r}")
+        response["status"] = "seal_failed"
+        return response
+    response["status"] = "sealing"
     return response
+
+@router.get("/{token}/seal-status")
+def seal_status(ctx: SigningContext = Depends(signing_context), session: Session = Depends(get_session)):
+    env = ctx.envelope
+    final_artifact = session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == env.id)).first()
+    if final_artifact:
+        return {"status": "sealed", "sealed": True, "sha256_final": final_artifact.sha256_final}
+    status = env.status if env.status in ("sealing", "seal_failed") else "pending"
+    return {"status": status, "sealed": False, "sha256_final": None}
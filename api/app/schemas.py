@@ -1,4 +1,5 @@
 
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -31,6 +32,7 @@ class EnvelopeCreate(BaseModel):
     message: str = ""
     signers: List[SignerCreate]
     fields: List[FieldCreate]
+    expires_at: Optional[datetime] = None  # signing links stop working after this
 
 class EnvelopeSend(BaseModel):
     subject: Optional[str] = None
@@ -44,6 +46,10 @@ class SignSave(BaseModel):
 class ConsentAccept(BaseModel):
     accepted: bool
 
+class BulkSealRequest(BaseModel):
+    envelope_ids: Optional[List[int]] = None  # default: every sealable envelope in the project
+    reseal: bool = False
+
 class ProjectInvestorCreate(BaseModel):
     name: str
     email: str
@@ -0,0 +1,34 @@
+"""Move event rows of sealed envelopes to compressed JSONL objects in MinIO.
+
+    python -m app.scripts.archive_events
+    python -m app.scripts.archive_events --days 0 --envelopes 10 11 12
+
+Runs nightly from the worker's beat schedule as well.
+"""
+import argparse
+
+from sqlmodel import Session
+
+from app.archive import archive_completed
+from app.config import EVENT_ARCHIVE_AFTER_DAYS
+from app.db import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive event chains of sealed envelopes")
+    parser.add_argument("--days", type=int, default=EVENT_ARCHIVE_AFTER_DAYS, help="only envelopes sealed at least this many days ago")
+    parser.add_argument("--envelopes", type=int, nargs="+", help="archive these envelope ids regardless of age")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        reports = archive_completed(session, older_than_days=args.days, envelope_ids=args.envelopes)
+    for report in reports:
+        if report["archived"]:
+            print(f"Envelope {report['envelope_id']}: archived {report['moved']} event(s) to {report['s3_key']}")
+        else:
+            print(f"Envelope {report['envelope_id']}: skipped ({report['reason']})")
+    print(f"Archived {sum(1 for r in reports if r['archived'])} of {len(reports)} envelope(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Checkpoint the event chain of every envelope that changed since the last sweep.
+
+    python -m app.scripts.audit_sweep
+
+Runs nightly from the worker's beat schedule as well; exits non-zero when a
+chain fails verification.
+"""
+import sys
+
+from sqlmodel import Session
+
+from app.audit import sweep
+from app.db import engine
+
+
+with Session(engine) as session:
+    reports = sweep(session)
+failed = [r for r in reports if not r["ok"]]
+for report in reports:
+    status = "ok" if report["ok"] else "FAILED"
+    print(f"Envelope {report['envelope_id']}: {status}, rehashed {report['rehashed']} of {report['event_count']} events")
+    for error in report["errors"]:
+        print(f"  {error}")
+print(f"Checked {len(reports)} envelopes, {len(failed)} failed")
+sys.exit(1 if failed else 0)
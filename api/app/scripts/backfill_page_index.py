@@ -0,0 +1,32 @@
+"""Compute the page index for documents uploaded before it existed.
+
+    python -m app.scripts.backfill_page_index
+"""
+from io import BytesIO
+
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.models import Document
+from app.pdf_index import build_page_index
+from app.storage import get_bytes
+from app.utils import canonical_json
+
+
+with Session(engine) as session:
+    documents = session.exec(select(Document).where(Document.page_count.is_(None))).all()
+    for doc in documents:
+        try:
+            data = get_bytes(doc.s3_key)
+        except Exception as exc:
+            print(f"Skipping doc {doc.id}: {exc}")
+            continue
+        index = build_page_index(BytesIO(data))
+        if not index:
+            print(f"Skipping doc {doc.id}: not a readable PDF")
+            continue
+        doc.page_count = index["page_count"]
+        doc.page_index_json = canonical_json(index)
+        session.add(doc)
+        session.commit()
+        print(f"Indexed doc {doc.id}: {doc.page_count} pages")
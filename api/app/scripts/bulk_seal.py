@@ -0,0 +1,47 @@
+"""Seal (or re-seal) many envelopes at once using a process pool.
+
+    python -m app.scripts.bulk_seal --project 3
+    python -m app.scripts.bulk_seal --envelopes 10 11 12 --reseal --workers 8
+"""
+import argparse
+import time
+
+from sqlmodel import Session
+
+from app.db import engine
+from app.sealing import bulk_seal, sealable_envelope_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk seal envelopes")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--project", type=int, help="seal every completed envelope in this project")
+    target.add_argument("--envelopes", type=int, nargs="+", help="seal these envelope ids")
+    parser.add_argument("--reseal", action="store_true", help="re-seal envelopes that already have a final PDF")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        envelope_ids = sealable_envelope_ids(session, args.project, args.envelopes, args.reseal)
+        if not envelope_ids:
+            print("Nothing to seal.")
+            return
+        print(f"Sealing {len(envelope_ids)} envelope(s)...")
+
+        def progress(entry, done, total):
+            if entry["ok"]:
+                detail = f"seal {entry['seal_seconds']:.2f}s upload {entry['upload_seconds']:.2f}s {entry['sha256_final'][:12]}"
+            else:
+                detail = f"FAILED {entry['error']}"
+            print(f"[{done}/{total}] envelope {entry['envelope_id']}: {detail}")
+
+        start = time.perf_counter()
+        report = bulk_seal(session, envelope_ids, reseal=args.reseal, workers=args.workers, progress=progress)
+        failed = [entry["envelope_id"] for entry in report if not entry["ok"]]
+        print(f"Done in {time.perf_counter() - start:.1f}s: {len(report) - len(failed)} sealed, {len(failed)} failed")
+        if failed:
+            print("Failed envelopes:", ", ".join(str(env_id) for env_id in failed))
+
+
+if __name__ == "__main__":
+    main()
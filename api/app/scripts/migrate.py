@@ -0,0 +1,29 @@
+"""Apply pending schema migrations (the API also does this on startup).
+
+    python -m app.scripts.migrate
+    python -m app.scripts.migrate --status
+"""
+import argparse
+
+from app.db import engine, init_db
+from app.migrations import MIGRATIONS, applied_versions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.status:
+        done = applied_versions(engine)
+        for step in sorted(MIGRATIONS, key=lambda m: m.version):
+            state = "applied" if step.version in done else "pending"
+            print(f"{step.version:>4}  {state:<8} {step.name}")
+        return
+    init_db()
+    pending = [m.version for m in MIGRATIONS if m.version not in applied_versions(engine)]
+    print("Schema up to date." if not pending else f"Still pending: {pending}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from html import escape
+from typing import Callable, List, Optional
+import json
+import multiprocessing
+import os
+import time
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from . import storage
+from .config import BULK_SEAL_UPLOAD_THREADS, SEAL_STALE_MINUTES
+from .email import send_email, format_sender_name
+from .events import append_event
+from .models import Document, Envelope, Event, Field, FinalArtifact, Signer, SignerFieldValue
+from .signatures import signature_bytes
+from .worker_stub import load_template, seal_pdf
+
+# Sealing runs in the Celery worker (worker/worker.py); the API only enqueues
+# it once the last signer completes, see tasks.enqueue_seal.
+
+
+def collect_envelope_values(session: Session, envelope_id: int):
+    fields = session.exec(select(Field).where(Field.envelope_id == envelope_id)).all()
+    field_map = {f.id: f for f in fields}
+    signer_ids = session.exec(select(Signer.id).where(Signer.envelope_id == envelope_id)).all()
+    if not signer_ids:
+        return {}
+    rows = session.exec(
+        select(SignerFieldValue).where(SignerFieldValue.signer_id.in_(signer_ids))
+    ).all()
+    combined = {}
+    for row in rows:
+        field = field_map.get(row.field_id)
+        if not field:
+            continue
+        try:
+            data = json.loads(row.value_json or "{}")
+        except json.JSONDecodeError:
+            data = {}
+        value = data.get("value")
+        if value is None:
+            continue
+        if isinstance(value, str) and not value.strip():
+            continue
+        combined[str(field.id)] = {
+            "type": field.type,
+            "page": field.page,
+            "x": field.x,
+            "y": field.y,
+            "w": field.w,
+            "h": field.h,
+            "value": value,
+            "font": data.get("font") or field.font_family or "sans",
+        }
+    return combined
+
+
+def seal_envelope(session: Session, envelope_id: int) -> FinalArtifact:
+    """Seal a fully signed envelope, store its artifacts and notify signers.
+
+    Idempotent and resumable: an envelope that already has its FinalArtifact
+    (a retry after a later step failed, or a duplicate enqueue) is not sealed
+    again, but any missing `sealed` event or completion email is still sent.
+    Two jobs racing to insert the artifact are settled by the unique
+    constraint on FinalArtifact.envelope_id; the loser returns the winner's.
+    """
+    env = session.get(Envelope, envelope_id)
+    if not env:
+        raise ValueError(f"envelope {envelope_id} not found")
+    doc = session.get(Document, env.document_id)
+    existing = session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == envelope_id)).first()
+    if existing:
+        _finish_sealed(session, env, doc, existing)
+        return existing
+    aggregate_values = collect_envelope_values(session, env.id)
+    template = load_template(doc.sha256, lambda: storage.object_cache.read(doc.sha256, doc.s3_key))
+    final_pdf, audit_json, sha_final = seal_pdf(template, env.id, aggregate_values, load_blob=signature_bytes)
+    key_pdf, key_audit = _artifact_keys(doc.project_id, env.id)
+    _upload_artifacts(key_pdf, key_audit, final_pdf, audit_json)
+    try:
+        fa = _record_sealed(session, env, key_pdf, key_audit, sha_final)
+    except IntegrityError:
+        session.rollback()
+        return session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == envelope_id)).one()
+    _notify_completed(session, env, doc, final_pdf, sha_final)
+    return fa
+
+
+def _has_event(session: Session, envelope_id: int, type_: str) -> bool:
+    stmt = select(Event.id).where(Event.envelope_id == envelope_id, Event.type == type_)
+    return session.exec(stmt.limit(1)).first() is not None
+
+
+def _finish_sealed(session: Session, env: Envelope, doc: Document, fa: FinalArtifact):
+    """Redo whatever a failed run left out after the artifact was recorded."""
+    if not _has_event(session, env.id, "sealed"):
+        env.status = "completed"
+        session.add(env)
+        append_event(session, env.id, "system", "sealed", {"sha256_final": fa.sha256_final})
+    notified = {
+        json.loads(meta)["meta"].get("signer_id")
+        for meta in session.exec(
+            select(Event.meta_json).where(Event.envelope_id == env.id, Event.type == "notified")
+        ).all()
+    }
+    signers = session.exec(select(Signer).where(Signer.envelope_id == env.id)).all()
+    if any(s.id not in notified for s in signers):
+        final_pdf = storage.get_bytes(fa.s3_key_pdf)
+        _notify_completed(session, env, doc, final_pdf, fa.sha256_final, skip=notified)
+
+
+def _artifact_keys(project_id: int, envelope_id: int):
+    base = f"projects/{project_id}/final/envelopes/{envelope_id}"
+    return f"{base}.pdf", f"{base}.audit.json"
+
+
+def _upload_artifacts(key_pdf: str, key_audit: str, final_pdf: bytes, audit_json: str) -> float:
+    start = time.perf_counter()
+    storage.put_bytes(key_pdf, final_pdf, content_type="application/pdf")
+    storage.put_bytes(key_audit, audit_json.encode(), content_type="application/json")
+    return time.perf_counter() - start
+
+
+def _record_sealed(session: Session, env: Envelope, key_pdf: str, key_audit: str, sha_final: str, existing: FinalArtifact = None):
+    if existing:
+        fa = existing
+        fa.s3_key_pdf, fa.s3_key_audit_json, fa.sha256_final = key_pdf, key_audit, sha_final
+        fa.completed_at = datetime.utcnow()
+    else:
+        fa = FinalArtifact(envelope_id=env.id, s3_key_pdf=key_pdf, s3_key_audit_json=key_audit, sha256_final=sha_final)
+    env.status = "completed"
+    session.add(fa)
+    session.add(env)
+    meta = {"sha256_final": sha_final}
+    if existing:
+        meta["resealed"] = True
+    # The artifact row and its `sealed` event commit together.
+    append_event(session, env.id, "system", "sealed", meta)
+    session.refresh(fa)
+    return fa
+
+
+def sealable_envelope_ids(session: Session, project_id: Optional[int] = None, envelope_ids: Optional[List[int]] = None, reseal: bool = False) -> List[int]:
+    """Envelopes whose signers have all completed; unsealed ones only unless `reseal`."""
+    stmt = select(Envelope.id).where(
+        select(Signer.id).where(Signer.envelope_id == Envelope.id).exists(),
+        ~select(Signer.id).where(Signer.envelope_id == Envelope.id, Signer.status != "completed").exists(),
+    )
+    if project_id is not None:
+        stmt = stmt.where(Envelope.project_id == project_id)
+    if envelope_ids is not None:
+        stmt = stmt.where(Envelope.id.in_(envelope_ids))
+    if not reseal:
+        stmt = stmt.where(~select(FinalArtifact.id).where(FinalArtifact.envelope_id == Envelope.id).exists())
+    return list(session.exec(stmt.order_by(Envelope.id)).all())
+
+
+def _seal_job(envelope_id: int, doc_sha: Optional[str], doc_key: str, values: dict):
+    # Runs in a pool process; the template cache is per process and the
+    # original comes from the shared on-disk object cache the parent warmed.
+    start = time.perf_counter()
+    template = load_template(doc_sha, lambda: storage.object_cache.read(doc_sha, doc_key))
+    final_pdf, audit_json, sha_final = seal_pdf(template, envelope_id, values, load_blob=signature_bytes)
+    return final_pdf, audit_json, sha_final, time.perf_counter() - start
+
+
+class _InlineExecutor(Executor):
+    """Runs each job in the calling process, for where a pool can't start."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+def _seal_executor(workers: Optional[int]) -> Executor:
+    # Celery prefork children are daemonic and may not have children of their
+    # own; there the worker pool itself provides the parallelism.
+    if workers == 0 or multiprocessing.current_process().daemon:
+        return _InlineExecutor()
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+
+
+def bulk_seal(
+    session: Session,
+    envelope_ids: List[int],
+    *,
+    reseal: bool = False,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[dict, int, int], None]] = None,
+) -> List[dict]:
+    """Seal many envelopes with a process pool sized to the cores.
+
+    PDF work runs in worker processes while finished results are uploaded
+    from a thread pool, so uploads overlap with sealing. DB rows are written
+    from the calling thread. `workers=0`, or running inside a daemonic
+    process, seals in the calling process instead. Envelopes that already
+    have a final PDF are skipped unless `reseal`. No completion emails are
+    sent: this is for backfills and re-seals. Returns one report entry per
+    envelope, also passed to `progress(entry, done, total)` as each one
+    finishes.
+    """
+    jobs = {}
+    docs = {}
+    sealed = set()
+    if not reseal:
+        sealed = set(session.exec(select(FinalArtifact.envelope_id).where(FinalArtifact.envelope_id.in_(envelope_ids))).all())
+    for env_id in envelope_ids:
+        env = session.get(Envelope, env_id)
+        if not env or env_id in sealed:
+            continue
+        doc = docs.get(env.document_id) or session.get(Document, env.document_id)
+        docs[env.document_id] = doc
+        jobs[env_id] = (env, doc, collect_envelope_values(session, env_id))
+    for doc in docs.values():
+        storage.object_cache.path_for(doc.sha256, doc.s3_key)
+
+    total = len(jobs)
+    report = []
+
+    def finish(entry):
+        report.append(entry)
+        if progress:
+            progress(entry, len(report), total)
+
+    with _seal_executor(workers) as pool, ThreadPoolExecutor(max_workers=BULK_SEAL_UPLOAD_THREADS) as uploader:
+        sealing = {
+            pool.submit(_seal_job, env_id, doc.sha256, doc.s3_key, values): env_id
+            for env_id, (env, doc, values) in jobs.items()
+        }
+        uploads = {}
+        for fut in as_completed(sealing):
+            env_id = sealing[fut]
+            env, doc, _ = jobs[env_id]
+            try:
+                final_pdf, audit_json, sha_final, seal_seconds = fut.result()
+            except Exception as exc:
+                finish({"envelope_id": env_id, "ok": False, "error": repr(exc)})
+                continue
+            key_pdf, key_audit = _artifact_keys(doc.project_id, env_id)
+            upload = uploader.submit(_upload_artifacts, key_pdf, key_audit, final_pdf, audit_json)
+            uploads[upload] = (env_id, key_pdf, key_audit, sha_final, seal_seconds)
+        for fut in as_completed(uploads):
+            env_id, key_pdf, key_audit, sha_final, seal_seconds = uploads[fut]
+            entry = {"envelope_id": env_id, "seal_seconds": round(seal_seconds, 3)}
+            try:
+                entry["upload_seconds"] = round(fut.result(), 3)
+                env = jobs[env_id][0]
+                existing = session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == env_id)).first()
+                _record_sealed(session, env, key_pdf, key_audit, sha_final, existing)
+            except Exception as exc:
+                session.rollback()
+                entry.update(ok=False, error=repr(exc))
+            else:
+                entry.update(ok=True, sha256_final=sha_final)
+            finish(entry)
+    return report
+
+
+def stale_sealing_ids(session: Session, older_than_minutes: int = SEAL_STALE_MINUTES) -> List[int]:
+    """Envelopes stuck in `sealing` with no artifact since their last signer finished.
+
+    Their seal job was never queued (broker outage, crash after the commit)
+    or was lost; the worker's sweep queues them again.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+    last_completed = (
+        select(func.max(Signer.completed_at)).where(Signer.envelope_id == Envelope.id).scalar_subquery()
+    )
+    stmt = select(Envelope.id).where(
+        Envelope.status == "sealing",
+        ~select(FinalArtifact.id).where(FinalArtifact.envelope_id == Envelope.id).exists(),
+        last_completed <= cutoff,
+    )
+    return list(session.exec(stmt.order_by(Envelope.id)).all())
+
+
+def mark_seal_failed(session: Session, envelope_id: int, error: str):
+    env = session.get(Envelope, envelope_id)
+    if not env or env.status == "completed":
+        return
+    env.status = "seal_failed"
+    session.add(env)
+    session.commit()
+    append_event(session, env.id, "system", "seal_failed", {"error": error[:500]})
+
+
+def _notify_completed(session: Session, env: Envelope, doc: Document, final_pdf: bytes, sha_final: str,
+                      skip: frozenset = frozenset()):
+    # Notify all parties with the executed PDF attached; each send is
+    # recorded so a retry only mails the signers that were missed.
+    signers = [s for s in session.exec(select(Signer).where(Signer.envelope_id == env.id)).all() if s.id not in skip]
+    filename = doc.filename or f"Envelope {env.id}"
+    subject = f"Completed: {filename}"
+    sha_line = f"Final SHA256: {sha_final}"
+    requester_given_name = (env.requester_name or "").strip() or None
+    requester_email = (env.requester_email or "").strip() or None
+    invited_by = requester_given_name or "Your team"
+    invited_contact = f"{invited_by}{f' · {requester_email}' if requester_email else ''}"
+    plain_body = (
+        f"All parties have finished signing {filename}.\n"
+        f"Requested by: {invited_contact}\n\n"
+        f"{sha_line}\n\nA copy of the executed PDF is attached for your records."
+    )
+    base_name = filename[:-4] if filename.lower().endswith(".pdf") else filename
+    attachment_name = f"{base_name} - executed.pdf"
+    html_body = f"""
+<html>
+  <body style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; background: #f5f6f8; padding: 24px;">
+    <div style="max-width: 520px; margin: 0 auto; background: #ffffff; border-radius: 12px; padding: 24px; box-shadow: 0 10px 25px rgba(15,23,42,0.08);">
+      <h2 style="margin-top: 0; font-size: 20px; color: #0f172a;">Completed</h2>
+      <p style="font-size: 14px; color: #1e293b; line-height: 1.5;">
+        All parties have finished signing <strong>{escape(filename)}</strong>.
+      </p>
+      <p style="font-size: 13px; color: #475569; margin-top: -4px;">
+        Requested by {escape(invited_contact)}
+      </p>
+      <p style="font-size: 13px; color: #475569; background: #f8fafc; padding: 12px 16px; border-radius: 8px;">
+        {escape(sha_line)}
+      </p>
+      <p style="font-size: 13px; color: #475569;">A copy of the executed PDF is attached for your records.</p>
+    </div>
+  </body>
+</html>
+"""
+    attachments = [{
+        "filename": attachment_name,
+        "content": final_pdf,
+        "maintype": "application",
+        "subtype": "pdf",
+    }]
+    sender_label = format_sender_name(requester_given_name)
+    for s in signers:
+        send_email(
+            s.email,
+            subject,
+            plain_body,
+            html_body=html_body,
+            attachments=attachments,
+            sender_name=sender_label,
+            reply_to=requester_email,
+        )
+        append_event(session, env.id, "system", "notified", {"signer_id": s.id})
@@ -0,0 +1,170 @@
+"""Signature and initials values: vector strokes, or images referenced by hash.
+
+The sign pad sends what was drawn as strokes:
+
+    {"format": "strokes", "width": W, "height": H, "pen": 3,
+     "strokes": [[x0, y0, dx1, dy1, dx2, dy2, ...], ...]}
+
+Coordinates are integer pad pixels (y down). Each stroke's first point is
+absolute and later points are deltas. Sealing draws these as PDF paths.
+
+PNG is the fallback. Signers upload a PNG once (POST
+/api/sign/{token}/signatures). It is normalized (whitespace trimmed,
+downscaled, palette-compressed) and stored as a content-addressed blob
+under its own `signatures/` prefix. Field values then carry
+`sha256:<digest>` instead of the base64 image, and sealing reads each
+distinct image once. Only digests stored there are accepted as references,
+so a field value blob can never pass for a signature.
+"""
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageChops, UnidentifiedImageError
+
+from . import storage
+from .blobs import blob_key, has_blob, put_blob
+from .config import SIGNATURE_MAX_HEIGHT, SIGNATURE_MAX_STROKE_POINTS, SIGNATURE_MAX_WIDTH, SIGNATURE_PALETTE_COLORS
+from .utils import sha256_bytes
+
+REF_PREFIX = "sha256:"
+SIGNATURE_PREFIX = "signatures"
+STROKES_FORMAT = "strokes"
+_MAX_PAD_SIZE = 10_000
+_REF_RE = re.compile(r"^sha256:([0-9a-f]{64})$")
+_MAX_SOURCE_PIXELS = 40_000_000
+_TRIM_PADDING = 4
+_NORMALIZED_LIMIT = 1024
+
+# sha256 of an uploaded image -> digest of its normalized blob, so clients
+# that keep re-sending the same base64 PNG don't pay for another decode.
+_normalized: "OrderedDict[str, str]" = OrderedDict()
+_normalized_lock = threading.Lock()
+
+
+class InvalidSignatureImage(ValueError):
+    pass
+
+
+class InvalidStrokes(ValueError):
+    pass
+
+
+def signature_ref(digest: str) -> str:
+    return f"{REF_PREFIX}{digest}"
+
+
+def parse_signature_ref(value) -> Optional[str]:
+    """The blob digest a field value references, or None for inline images."""
+    if not isinstance(value, str):
+        return None
+    match = _REF_RE.match(value)
+    return match.group(1) if match else None
+
+
+def normalize_signature(data: bytes) -> bytes:
+    """Trim the blank margin, downscale and palette-compress a signature PNG."""
+    try:
+        with Image.open(BytesIO(data)) as source:
+            if source.format != "PNG":
+                raise InvalidSignatureImage("signature must be a PNG image")
+            if source.width * source.height > _MAX_SOURCE_PIXELS:
+                raise InvalidSignatureImage("signature image is too large")
+            image = source.convert("RGBA")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise InvalidSignatureImage("signature must be a PNG image") from exc
+
+    # Ink is anything visible and darker than paper; trim to its bounding box.
+    visible = image.getchannel("A").point(lambda a: 255 if a > 16 else 0)
+    dark = image.convert("L").point(lambda v: 255 if v < 240 else 0)
+    bbox = ImageChops.multiply(visible, dark).getbbox()
+    if bbox:
+        left, top, right, bottom = bbox
+        image = image.crop((
+            max(0, left - _TRIM_PADDING),
+            max(0, top - _TRIM_PADDING),
+            min(image.width, right + _TRIM_PADDING),
+            min(image.height, bottom + _TRIM_PADDING),
+        ))
+    image.thumbnail((SIGNATURE_MAX_WIDTH, SIGNATURE_MAX_HEIGHT), Image.Resampling.LANCZOS)
+    image = image.quantize(colors=SIGNATURE_PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+    out = BytesIO()
+    image.save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def store_signature(data: bytes) -> str:
+    """Normalize and store an uploaded PNG; returns the digest of the stored blob."""
+    source_digest = sha256_bytes(data)
+    with _normalized_lock:
+        digest = _normalized.get(source_digest)
+        if digest is not None:
+            _normalized.move_to_end(source_digest)
+            return digest
+    digest = put_blob(normalize_signature(data), "image/png", prefix=SIGNATURE_PREFIX)
+    with _normalized_lock:
+        _normalized[source_digest] = digest
+        while len(_normalized) > _NORMALIZED_LIMIT:
+            _normalized.popitem(last=False)
+    return digest
+
+
+def has_signature(digest: str) -> bool:
+    """Whether `digest` names an image stored by store_signature."""
+    return has_blob(digest, SIGNATURE_PREFIX)
+
+
+def signature_bytes(digest: str) -> bytes:
+    """PNG bytes of a stored signature, through the shared on-disk object cache."""
+    return storage.object_cache.read(digest, blob_key(digest, SIGNATURE_PREFIX))
+
+
+def is_strokes(value) -> bool:
+    return isinstance(value, dict) and value.get("format") == STROKES_FORMAT
+
+
+def _int(value, name: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidStrokes(f"{name} must be a number")
+    return int(round(value))
+
+
+def normalize_strokes(value: dict) -> Optional[dict]:
+    """Validate a strokes value and round it to integers; None when nothing was drawn."""
+    width = _int(value.get("width"), "width")
+    height = _int(value.get("height"), "height")
+    if not (0 < width <= _MAX_PAD_SIZE and 0 < height <= _MAX_PAD_SIZE):
+        raise InvalidStrokes("pad size out of range")
+    pen = value.get("pen", 3)
+    if isinstance(pen, bool) or not isinstance(pen, (int, float)) or not 0 < pen <= 50:
+        raise InvalidStrokes("pen must be between 0 and 50")
+    strokes = value.get("strokes")
+    if not isinstance(strokes, list):
+        raise InvalidStrokes("strokes must be a list")
+    cleaned, points = [], 0
+    for stroke in strokes:
+        if not isinstance(stroke, list) or len(stroke) < 2 or len(stroke) % 2:
+            raise InvalidStrokes("each stroke is a flat list of x, y pairs")
+        cleaned.append([_int(n, "coordinate") for n in stroke])
+        points += len(stroke) // 2
+    if points > SIGNATURE_MAX_STROKE_POINTS:
+        raise InvalidStrokes(f"signature has more than {SIGNATURE_MAX_STROKE_POINTS} points")
+    if not cleaned:
+        return None
+    return {"format": STROKES_FORMAT, "width": width, "height": height, "pen": pen, "strokes": cleaned}
+
+
+def decode_strokes(value: dict) -> List[List[Tuple[int, int]]]:
+    """Absolute pad coordinates of each stroke."""
+    paths = []
+    for stroke in value["strokes"]:
+        x, y = stroke[0], stroke[1]
+        points = [(x, y)]
+        for i in range(2, len(stroke), 2):
+            x += stroke[i]
+            y += stroke[i + 1]
+            points.append((x, y))
+        paths.append(points)
+    return paths
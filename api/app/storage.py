@@ -1,7 +1,25 @@
 
 from minio import Minio
-from .config import MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_BUCKET
+from minio.deleteobjects import DeleteObject
+from .config import (
+    MINIO_ENDPOINT,
+    MINIO_ACCESS_KEY,
+    MINIO_SECRET_KEY,
+    MINIO_BUCKET,
+    UPLOAD_PART_SIZE,
+    DOWNLOAD_CHUNK_SIZE,
+    OBJECT_CACHE_DIR,
+    OBJECT_CACHE_MAX_BYTES,
+)
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+import hashlib
 import io
+import logging
+import os
+import threading
+import time
+import uuid
 
 _client = Minio(
     MINIO_ENDPOINT,
@@ -10,6 +28,8 @@ _client = Minio(
     secure=False
 )
 
+log = logging.getLogger(__name__)
+
 def ensure_bucket():
     if not _client.bucket_exists(MINIO_BUCKET):
         _client.make_bucket(MINIO_BUCKET)
@@ -18,6 +38,12 @@ def put_bytes(key: str, data: bytes, content_type: str = "application/octet-stre
     ensure_bucket()
     _client.put_object(MINIO_BUCKET, key, io.BytesIO(data), length=len(data), content_type=content_type)
 
+def put_stream(key: str, stream, content_type: str = "application/octet-stream", part_size: int = UPLOAD_PART_SIZE):
+    # Unknown length -> MinIO multipart upload reading one part at a time,
+    # so memory stays bounded by part_size regardless of the object size.
+    ensure_bucket()
+    _client.put_object(MINIO_BUCKET, key, stream, length=-1, content_type=content_type, part_size=part_size)
+
 def get_bytes(key: str) -> bytes:
     resp = _client.get_object(MINIO_BUCKET, key)
     data = resp.read()
@@ -25,8 +51,292 @@ def get_bytes(key: str) -> bytes:
     resp.release_conn()
     return data
 
+class ObjectStat(NamedTuple):
+    size: int
+    etag: str
+    content_type: str
+
+
+def stat_object(key: str) -> ObjectStat:
+    """Size, etag and stored content type of an object; raises S3Error when missing."""
+    stat = _client.stat_object(MINIO_BUCKET, key)
+    return ObjectStat(stat.size, stat.etag, stat.content_type or "application/octet-stream")
+
+def iter_object(key: str, offset: int = 0, length: int = 0, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    # length=0 means "to the end of the object", matching Minio.get_object.
+    resp = _client.get_object(MINIO_BUCKET, key, offset=offset, length=length)
+    try:
+        for chunk in resp.stream(chunk_size):
+            yield chunk
+    finally:
+        resp.close()
+        resp.release_conn()
+
 def delete_object(key: str):
     try:
         _client.remove_object(MINIO_BUCKET, key)
     except Exception:
         pass
+
+REMOVE_BATCH_SIZE = 1000  # S3 multi-object delete limit
+
+def remove_objects(keys):
+    """Delete many objects with multi-object DELETE requests; best effort like delete_object."""
+    keys = list(keys)
+    for start in range(0, len(keys), REMOVE_BATCH_SIZE):
+        batch = [DeleteObject(key) for key in keys[start:start + REMOVE_BATCH_SIZE]]
+        try:
+            # remove_objects is lazy: the request is only sent while iterating errors
+            for error in _client.remove_objects(MINIO_BUCKET, batch):
+                log.warning("failed to remove %s: %s", error.name, error.message)
+        except Exception as exc:
+            log.warning("failed to remove %d objects: %s", len(batch), exc)
+
+
+class ObjectCache:
+    """Content-addressed, size-bounded LRU of MinIO objects on local disk.
+
+    Entries are keyed by the object's SHA-256 (Document.sha256 /
+    FinalArtifact.sha256_final), so a key can never serve stale bytes and
+    every envelope of the same document shares one cached file.
+
+    Only one fill per digest runs at a time; concurrent misses wait for it
+    (path_for) or stream straight from MinIO (stream_through). Temp files
+    are named after the filling process, so a restart only removes its own
+    leftovers and ones stale enough that no live fill can own them.
+    """
+
+    STALE_TMP_SECONDS = 3600
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._filling: "dict[str, threading.Event]" = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_existing()
+
+    def _tmp_prefix(self) -> str:
+        return f".tmp-{os.getpid()}-"
+
+    def _tmp_path(self) -> str:
+        return os.path.join(self.directory, f"{self._tmp_prefix()}{uuid.uuid4().hex}")
+
+    def _load_existing(self):
+        found = []
+        stale_before = time.time() - self.STALE_TMP_SECONDS
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue  # another process's fill finished or gave up
+            if name.startswith(".tmp-"):
+                if name.startswith(self._tmp_prefix()) or st.st_mtime < stale_before:
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                continue
+            found.append((st.st_atime, name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._total += size
+        self._evict()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            digest, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.unlink(self._path(digest))
+            except FileNotFoundError:
+                pass
+
+    def lookup(self, digest: Optional[str]) -> Optional[str]:
+        """Return the local path of a cached object, or None on a miss."""
+        if not self.directory or not digest:
+            return None
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return self._path(digest)
+            self.misses += 1
+        return None
+
+    def _claim(self, digest: str) -> Optional[threading.Event]:
+        """Start filling `digest`; returns the running fill's event if there is one."""
+        with self._lock:
+            pending = self._filling.get(digest)
+            if pending is None:
+                self._filling[digest] = threading.Event()
+            return pending
+
+    def _release(self, digest: str):
+        with self._lock:
+            self._filling.pop(digest).set()
+
+    def path_for(self, digest: Optional[str], key: str) -> Optional[str]:
+        """Return a local path holding the object, filling it from MinIO on a miss.
+
+        Returns None when caching is disabled or the object can't be cached
+        (no digest, larger than the cache, or content not matching the digest);
+        callers then fall back to streaming from MinIO.
+        """
+        path = self.lookup(digest)
+        if path is not None or not self.directory or not digest:
+            return path
+        pending = self._claim(digest)
+        if pending is not None:
+            pending.wait()
+            with self._lock:
+                return self._path(digest) if digest in self._entries else None
+        try:
+            return self._fill(digest, key)
+        finally:
+            self._release(digest)
+
+    def _fill(self, digest: str, key: str) -> Optional[str]:
+        size = stat_object(key).size
+        if size > self.max_bytes:
+            return None
+        return self._write(digest, iter_object(key))
+
+    def _write(self, digest: str, chunks) -> Optional[str]:
+        tmp_path = self._tmp_path()
+        hasher = hashlib.sha256()
+        written = 0
+        try:
+            with open(tmp_path, "wb") as fh:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    fh.write(chunk)
+                    written += len(chunk)
+            if hasher.hexdigest() != digest:
+                os.unlink(tmp_path)
+                return None
+            os.replace(tmp_path, self._path(digest))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return self._register(digest, written)
+
+    def stream_through(self, digest: Optional[str], size: int, chunks):
+        """Yield `chunks` (the whole object) while writing them into the cache.
+
+        The response's first byte goes out as soon as MinIO sends it. When
+        another request is already filling the digest, or the object can't
+        be cached, the chunks are passed through untouched.
+        """
+        if not self.directory or not digest or size > self.max_bytes or self._claim(digest) is not None:
+            yield from chunks
+            return
+        tmp_path = self._tmp_path()
+        hasher = hashlib.sha256()
+        complete = False
+        try:
+            with open(tmp_path, "wb") as fh:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    fh.write(chunk)
+                    yield chunk
+            complete = hasher.hexdigest() == digest
+            if complete:
+                os.replace(tmp_path, self._path(digest))
+        finally:
+            if not complete and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            if complete:
+                self._register(digest, size)
+            self._release(digest)
+
+    def fill_in_background(self, digest: Optional[str], key: str):
+        """Warm the cache for `digest` without holding up the caller."""
+        if not self.directory or not digest:
+            return
+        with self._lock:
+            if digest in self._entries or digest in self._filling:
+                return
+        threading.Thread(target=self._fill_quietly, args=(digest, key), daemon=True).start()
+
+    def _fill_quietly(self, digest: str, key: str):
+        if self._claim(digest) is not None:
+            return
+        try:
+            self._fill(digest, key)
+        except Exception:
+            pass  # the next request tries again
+        finally:
+            self._release(digest)
+
+    def _register(self, name: str, size: int) -> Optional[str]:
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = size
+                self._total += size
+            self._evict()
+            if name not in self._entries:
+                return None
+        return self._path(name)
+
+    def path_for_generated(self, name: str, build: Callable[[], bytes]) -> Optional[str]:
+        """Return a local path for bytes derived from a cached object.
+
+        `name` must be derived from the source digest (e.g. "<sha>.p3-5") so
+        it is just as immutable; `build` is only called on a miss. Shares the
+        LRU and size budget with whole objects.
+        """
+        if not self.directory:
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return self._path(name)
+            self.misses += 1
+        data = build()
+        if len(data) > self.max_bytes:
+            return None
+        tmp_path = self._tmp_path()
+        try:
+            with open(tmp_path, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_path, self._path(name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return self._register(name, len(data))
+
+    def read(self, digest: Optional[str], key: str) -> bytes:
+        path = self.path_for(digest, key)
+        if path is not None:
+            try:
+                with open(path, "rb") as fh:
+                    return fh.read()
+            except FileNotFoundError:
+                pass  # evicted between lookup and open
+        return get_bytes(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+            }
+
+
+object_cache = ObjectCache(OBJECT_CACHE_DIR, OBJECT_CACHE_MAX_BYTES)
@@ -0,0 +1,14 @@
+# Producer side of the Celery queue consumed by worker/worker.py.
+from celery import Celery
+from .config import REDIS_URL, WORKER_QUEUE
+
+celery_app = Celery("signing", broker=REDIS_URL, backend=REDIS_URL)
+
+
+def enqueue_seal(envelope_id: int):
+    celery_app.send_task("seal_envelope", args=[envelope_id], queue=WORKER_QUEUE)
+
+
+def enqueue_bulk_seal(envelope_ids: list, reseal: bool = False) -> str:
+    result = celery_app.send_task("bulk_seal", args=[envelope_ids], kwargs={"reseal": reseal}, queue=WORKER_QUEUE)
+    return result.id
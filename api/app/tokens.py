@@ -0,0 +1,99 @@
+"""Magic-link tokens for the signing routes.
+
+A link token is `[signer_id, envelope_id]` signed with a timestamp, which
+keeps URLs short. Links stop working at the envelope's `expires_at`. For
+envelopes without one, they stop working SIGN_TOKEN_MAX_AGE_DAYS after
+issue. Links minted before timestamped tokens (dict payload, no timestamp)
+are still accepted and only expire with their envelope.
+
+`signing_context` is the dependency of the read-only /api/sign/{token}
+routes and `signing_write_context` that of the routes that change anything.
+Both check the token and load the signer and envelope in one query. Signers
+who already finished keep reading their copy after the link expires, but
+an expired link never writes.
+Verified claims are kept in a small LRU, so a page load's burst of requests
+for the same link skips the HMAC and decoding after the first.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from fastapi import Depends, HTTPException
+from itsdangerous import BadData, URLSafeTimedSerializer
+from sqlmodel import Session, select
+
+from .config import SECRET_KEY, SIGN_TOKEN_CACHE_SIZE, SIGN_TOKEN_MAX_AGE_DAYS
+from .db import get_session
+from .models import Envelope, Signer
+from .utils import read_token
+
+_serializer = URLSafeTimedSerializer(SECRET_KEY, salt="signing")
+
+
+class SignClaims(NamedTuple):
+    signer_id: int
+    envelope_id: int
+    issued_at: Optional[datetime]  # None for legacy tokens
+
+
+@dataclass
+class SigningContext:
+    signer: Signer
+    envelope: Envelope
+    claims: SignClaims
+
+
+def make_sign_token(signer_id: int, envelope_id: int) -> str:
+    return _serializer.dumps([signer_id, envelope_id])
+
+
+@lru_cache(maxsize=SIGN_TOKEN_CACHE_SIZE)
+def read_sign_token(token: str) -> SignClaims:
+    """Verify a link token; raises itsdangerous.BadData if it is not ours."""
+    try:
+        (signer_id, envelope_id), issued_at = _serializer.loads(token, return_timestamp=True)
+        return SignClaims(int(signer_id), int(envelope_id), issued_at.replace(tzinfo=None))
+    except (BadData, TypeError, ValueError):
+        data = read_token(token)
+        try:
+            return SignClaims(int(data["signer_id"]), int(data["envelope_id"]), None)
+        except (KeyError, TypeError, ValueError) as exc:
+            raise BadData("malformed signing token") from exc
+
+
+def token_expired(claims: SignClaims, envelope: Envelope, now: Optional[datetime] = None) -> bool:
+    now = now or datetime.utcnow()
+    if envelope.expires_at is not None:
+        return now >= envelope.expires_at
+    if claims.issued_at is not None and SIGN_TOKEN_MAX_AGE_DAYS > 0:
+        return now >= claims.issued_at + timedelta(days=SIGN_TOKEN_MAX_AGE_DAYS)
+    return False
+
+
+def _signing_context(token: str, session: Session, allow_completed: bool) -> SigningContext:
+    try:
+        claims = read_sign_token(token)
+    except BadData:
+        raise HTTPException(404, "not found")
+    row = session.exec(
+        select(Signer, Envelope)
+        .join(Envelope, Envelope.id == Signer.envelope_id)
+        .where(Signer.id == claims.signer_id, Envelope.id == claims.envelope_id)
+    ).first()
+    if row is None:
+        raise HTTPException(404, "not found")
+    signer, envelope = row
+    if token_expired(claims, envelope) and not (allow_completed and signer.status == "completed"):
+        raise HTTPException(410, "signing link expired")
+    return SigningContext(signer=signer, envelope=envelope, claims=claims)
+
+
+def signing_context(token: str, session: Session = Depends(get_session)) -> SigningContext:
+    """For read routes: finished signers keep access to their copy."""
+    return _signing_context(token, session, allow_completed=True)
+
+
+def signing_write_context(token: str, session: Session = Depends(get_session)) -> SigningContext:
+    """For routes that change anything: expired links are refused for everyone."""
+    return _signing_context(token, session, allow_completed=False)
@@ -12,13 +12,33 @@ def b64png_to_bytes(data_url: str) -> bytes:
 def sha256_bytes(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
 
+class HashingReader:
+    """File-like wrapper that hashes and counts bytes as they are read."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n: int = -1) -> bytes:
+        chunk = self._raw.read(n)
+        if chunk:
+            self._hash.update(chunk)
+            self.size += len(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
 def canonical_json(obj) -> str:
     return json.dumps(obj, sort_keys=True, separators=(",", ":"))
 
+# Untimed dict-payload tokens, the format of links sent before tokens.py;
+# new signing links come from tokens.make_sign_token.
+_token_serializer = URLSafeSerializer(SECRET_KEY, salt="signing")
+
 def make_token(payload: dict) -> str:
-    s = URLSafeSerializer(SECRET_KEY, salt="signing")
-    return s.dumps(payload)
+    return _token_serializer.dumps(payload)
 
 def read_token(token: str) -> dict:
-    s = URLSafeSerializer(SECRET_KEY, salt="signing")
-    return s.loads(token)
+    return _token_serializer.loads(token)
@@ -1,13 +1,18 @@
 
-# Inline sealing implementation using pypdf + reportlab.
-# In production, this should be called from a Celery task in the worker container.
+# Sealing implementation using pypdf + reportlab.
+# Called from the Celery worker (worker/worker.py) via sealing.seal_envelope.
 
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.utils import ImageReader
 from io import BytesIO
+from collections import OrderedDict
+from typing import Callable, Optional, Union
 from pypdf import PdfReader, PdfWriter
-import json, base64, hashlib, datetime
+import json, hashlib, datetime, threading
+from .config import TEMPLATE_CACHE_SIZE
+from .utils import b64png_to_bytes
+from .signatures import decode_strokes, is_strokes, parse_signature_ref
 
 FONT_MAP = {
     "sans": ("Helvetica", 10),
@@ -17,9 +22,7 @@ FONT_MAP = {
     "script": ("Helvetica-Oblique", 10),
 }
 
-def _overlay_page(width, height, draw_ops):
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=(width, height))
+def _overlay_page(c, draw_ops):
     for op in draw_ops:
         t = op.get("type")
         if t == "text":
@@ -33,11 +36,86 @@ def _overlay_page(width, height, draw_ops):
             c.rect(x, y, 10, 10, stroke=1, fill=0)
             if op.get("checked"):
                 c.line(x, y, x+10, y+10); c.line(x, y+10, x+10, y)
+        elif t == "strokes":
+            c.saveState()
+            c.setStrokeColorRGB(0.07, 0.07, 0.07)
+            c.setLineWidth(op["line_width"])
+            c.setLineCap(1)
+            c.setLineJoin(1)
+            path = c.beginPath()
+            for points in op["paths"]:
+                path.moveTo(*points[0])
+                for point in points[1:] or points:  # a lone point still draws a dot
+                    path.lineTo(*point)
+            c.drawPath(path, stroke=1, fill=0)
+            c.restoreState()
         elif t == "signature":
-            x, y, w, h = op["x"], op["y"], op["w"], op["h"]
-            png = base64.b64decode(op["png_b64"])
-            c.drawImage(ImageReader(BytesIO(png)), x, y, width=w, height=h, mask='auto')
-    c.showPage()
+            # Scale the shared unit-square form into the field box.
+            c.saveState()
+            c.translate(op["x"], op["y"])
+            c.scale(op["w"], op["h"])
+            c.doForm(_image_form_name(op["image"]))
+            c.restoreState()
+
+def _stroke_op(value: dict, x: float, y: float, w: float, h: float) -> dict:
+    """Map pad strokes (pixels, y down) onto the field box, as the signer saw them."""
+    sx = w / value["width"]
+    sy = h / value["height"]
+    paths = [
+        [(x + px * sx, y + h - py * sy) for px, py in points]
+        for points in decode_strokes(value)
+    ]
+    return {"type": "strokes", "paths": paths, "line_width": max(0.5, value.get("pen", 3) * (sx + sy) / 2)}
+
+def _image_form_name(digest: str) -> str:
+    return f"sig_{digest[:32]}"
+
+class _ImageSet:
+    """Signature/initials PNGs for one seal, decoded once per distinct image.
+
+    Values are either `sha256:<digest>` references to stored signature blobs,
+    read through `load_blob`, or (older saves) inline base64 PNGs.
+    """
+
+    def __init__(self, load_blob: Optional[Callable[[str], bytes]] = None):
+        self.images = {}  # content sha256 -> ImageReader
+        self._by_encoded = {}  # base64 payload -> content sha256
+        self._load_blob = load_blob
+
+    def add(self, encoded: str) -> str:
+        ref = parse_signature_ref(encoded)
+        if ref is not None:
+            if ref not in self.images:
+                if self._load_blob is None:
+                    raise ValueError("signature references need a blob loader")
+                self.images[ref] = ImageReader(BytesIO(self._load_blob(ref)))
+            return ref
+        digest = self._by_encoded.get(encoded)
+        if digest is None:
+            png = b64png_to_bytes(encoded)
+            digest = hashlib.sha256(png).hexdigest()
+            self._by_encoded[encoded] = digest
+            if digest not in self.images:
+                self.images[digest] = ImageReader(BytesIO(png))
+        return digest
+
+def _render_overlays(pages, images=None):
+    """Draw every overlay page into one canvas: pages is [(width, height, ops)].
+
+    One reportlab document (and one PdfReader parse of it) for the whole
+    envelope instead of one per page with fields. Each distinct image is
+    embedded once as a Form XObject that every placement references.
+    """
+    buf = BytesIO()
+    c = canvas.Canvas(buf)
+    for digest, image in (images or {}).items():
+        c.beginForm(_image_form_name(digest), 0, 0, 1, 1)
+        c.drawImage(image, 0, 0, width=1, height=1, mask='auto')
+        c.endForm()
+    for width, height, ops in pages:
+        c.setPageSize((width, height))
+        _overlay_page(c, ops)
+        c.showPage()
     c.save()
     return buf.getvalue()
 
@@ -59,14 +137,71 @@ def _append_certificate(writer: PdfWriter, audit: dict):
     cert_reader = PdfReader(buf)
     writer.append_pages_from_reader(cert_reader)
 
-def seal_pdf(original_pdf_bytes: bytes, envelope_id: int, values: dict):
-    reader = PdfReader(BytesIO(original_pdf_bytes))
+class PdfTemplate:
+    """A parsed original PDF that many envelopes can be sealed from.
+
+    Parsing, the page tree walk and per-page geometry happen once; seal_pdf
+    clones pages out of the reader, so the template itself is never modified.
+    """
+
+    def __init__(self, pdf_bytes: bytes, sha256: Optional[str] = None):
+        self.sha256 = sha256 or hashlib.sha256(pdf_bytes).hexdigest()
+        self.reader = PdfReader(BytesIO(pdf_bytes))
+        self.pages = list(self.reader.pages)
+        for page in self.pages:
+            page.get("/Resources")  # resolve now rather than on every seal
+        self.geometry = [(float(p.mediabox.width), float(p.mediabox.height)) for p in self.pages]
+        # PdfReader reads lazily from one stream; serialize access to it.
+        self.lock = threading.Lock()
+
+_template_cache: "OrderedDict[str, PdfTemplate]" = OrderedDict()
+_template_lock = threading.Lock()
+
+def load_template(sha256: Optional[str], fetch: Callable[[], bytes]) -> PdfTemplate:
+    """Return the parsed template for a document, parsing it at most once per process.
+
+    `fetch` is only called on a miss. Documents without a stored hash are
+    parsed fresh every time.
+    """
+    if not sha256:
+        return PdfTemplate(fetch())
+    with _template_lock:
+        template = _template_cache.get(sha256)
+        if template is not None:
+            _template_cache.move_to_end(sha256)
+            return template
+    template = PdfTemplate(fetch(), sha256)
+    with _template_lock:
+        _template_cache[sha256] = template
+        while len(_template_cache) > TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+    return template
+
+def extract_pages(template: PdfTemplate, first: int, last: int) -> bytes:
+    """Copy the 1-based inclusive page span [first, last] into a standalone PDF."""
+    writer = PdfWriter()
+    with template.lock:
+        for page in template.pages[first - 1:last]:
+            writer.add_page(page)
+    buf = BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+def seal_pdf(
+    original: Union[bytes, PdfTemplate],
+    envelope_id: int,
+    values: dict,
+    load_blob: Optional[Callable[[str], bytes]] = None,
+):
+    template = original if isinstance(original, PdfTemplate) else PdfTemplate(original)
     writer = PdfWriter()
     draw_map = {}  # page_index -> [ops]
+    images = _ImageSet(load_blob)
     # values expected: { field_id: {"type": "...", "page": int, "x": float, "y": float, "w": float, "h": float, "value": any} }
-    num_pages = len(reader.pages)
-    for i in range(num_pages):
-        writer.add_page(reader.pages[i])
+    num_pages = len(template.pages)
+    with template.lock:
+        for page in template.pages:
+            writer.add_page(page)
     for fid, v in values.items():
         t = v.get("type")
         if not v.get("value"):
@@ -86,6 +221,8 @@ def seal_pdf(original_pdf_bytes: bytes, envelope_id: int, values: dict):
             })
         elif t == "checkbox":
             draw_map[p].append({"type": "checkbox", "x": v["x"], "y": v["y"], "checked": bool(v.get("value"))})
+        elif t in ("signature", "initials") and is_strokes(v["value"]):
+            draw_map[p].append(_stroke_op(v["value"], v["x"], v["y"], v.get("w") or 180.0, v.get("h") or 80.0))
         elif t in ("signature", "initials"):
             draw_map[p].append({
                 "type": "signature",
@@ -93,21 +230,22 @@ def seal_pdf(original_pdf_bytes: bytes, envelope_id: int, values: dict):
                 "y": v["y"],
                 "w": v.get("w") or 180.0,
                 "h": v.get("h") or 80.0,
-                "png_b64": v["value"],
+                "image": images.add(v["value"]),
             })
 
-    # Paint overlays per page
-    for pidx, ops in draw_map.items():
-        page = reader.pages[pidx]
-        width = float(page.mediabox.width)
-        height = float(page.mediabox.height)
-        overlay_pdf = _overlay_page(width, height, ops)
+    # Paint all overlays in a single pass, then stamp them page by page
+    page_indexes = sorted(draw_map)
+    if page_indexes:
+        overlay_pdf = _render_overlays([
+            (*template.geometry[pidx], draw_map[pidx])
+            for pidx in page_indexes
+        ], images.images)
         overlay_reader = PdfReader(BytesIO(overlay_pdf))
-        # Merge (stamp) overlay on page
-        writer.pages[pidx].merge_page(overlay_reader.pages[0])
+        for pidx, overlay in zip(page_indexes, overlay_reader.pages):
+            writer.pages[pidx].merge_page(overlay)
 
     # Build audit summary
-    sha_before = hashlib.sha256(original_pdf_bytes).hexdigest()
+    sha_before = template.sha256
     now = datetime.datetime.utcnow().isoformat() + "Z"
     audit = {
         "envelope_id": envelope_id,
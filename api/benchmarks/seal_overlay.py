@@ -0,0 +1,101 @@
+"""Seal time vs. number of pages carrying fields.
+
+Run from the api directory:
+
+    python -m benchmarks.seal_overlay [--pages 120] [--repeat 3]
+
+Compares the single-pass overlay engine in worker_stub.seal_pdf against the
+previous approach (one reportlab canvas + one PdfReader parse per page).
+seal_pdf also renders the certificate page, so it carries a small fixed cost
+that the per-page baseline does not.
+"""
+import argparse
+import time
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from app.utils import b64png_to_bytes
+from app.worker_stub import seal_pdf
+
+SIGNATURE_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/Pf8icQAAAABJRU5ErkJggg=="
+
+
+def make_document(pages: int) -> bytes:
+    buf = BytesIO()
+    c = canvas.Canvas(buf)
+    for n in range(pages):
+        c.drawString(72, 720, f"Limited Partnership Agreement - page {n + 1}")
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def make_values(pages_with_fields: int) -> dict:
+    values = {}
+    for page in range(1, pages_with_fields + 1):
+        values[f"t{page}"] = {"type": "text", "page": page, "x": 72, "y": 60, "w": 120, "h": 20, "value": f"p{page}"}
+        values[f"i{page}"] = {
+            "type": "initials", "page": page, "x": 480, "y": 40, "w": 60, "h": 30, "value": SIGNATURE_B64,
+        }
+    return values
+
+
+def legacy_stamp(original: bytes, values: dict) -> bytes:
+    """Per-page overlay: a canvas, image decode and PdfReader parse for every page."""
+    reader = PdfReader(BytesIO(original))
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    draw_map = {}
+    for v in values.values():
+        draw_map.setdefault(int(v["page"]) - 1, []).append(v)
+    for pidx, fields in draw_map.items():
+        page = reader.pages[pidx]
+        buf = BytesIO()
+        c = canvas.Canvas(buf, pagesize=(float(page.mediabox.width), float(page.mediabox.height)))
+        for v in fields:
+            if v["type"] == "text":
+                c.setFont("Helvetica", 10)
+                c.drawString(v["x"], v["y"], v["value"])
+            else:
+                png = ImageReader(BytesIO(b64png_to_bytes(v["value"])))
+                c.drawImage(png, v["x"], v["y"], width=v["w"], height=v["h"], mask="auto")
+        c.showPage()
+        c.save()
+        writer.pages[pidx].merge_page(PdfReader(BytesIO(buf.getvalue())).pages[0])
+    out = BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    original = make_document(args.pages)
+    steps = sorted({1, 10, 30, 60, args.pages} & set(range(1, args.pages + 1)))
+    print(f"document: {args.pages} pages, {len(original) / 1024:.0f} KiB")
+    print(f"{'pages w/ fields':>16} {'single-pass (ms)':>17} {'per-page (ms)':>14} {'speedup':>8}")
+    for n in steps:
+        values = make_values(n)
+        single = best_of(args.repeat, lambda: seal_pdf(original, 1, values))
+        legacy = best_of(args.repeat, lambda: legacy_stamp(original, values))
+        print(f"{n:>16} {single * 1000:>17.1f} {legacy * 1000:>14.1f} {legacy / single:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
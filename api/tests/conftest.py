@@ -1,4 +1,6 @@
+import hashlib
 import os
+from collections import OrderedDict
 from typing import Dict
 
 import pytest
@@ -15,6 +17,7 @@ from app.db import get_session  # noqa: E402
 from app import storage as storage_module  # noqa: E402
 from app.routers import projects as projects_router  # noqa: E402
 from app import email as email_module  # noqa: E402
+from app.auth import access_token_cache  # noqa: E402
 
 
 @pytest.fixture(scope="session")
@@ -36,29 +39,77 @@ def setup_db(test_engine):
 
 
 @pytest.fixture
-def mock_storage(monkeypatch) -> Dict[str, bytes]:
+def mock_storage(monkeypatch, tmp_path) -> Dict[str, bytes]:
     store: Dict[str, bytes] = {}
+    content_types: Dict[str, str] = {}
 
     def fake_put_bytes(key: str, data: bytes, content_type: str = "application/octet-stream"):
         store[key] = bytes(data)
+        content_types[key] = content_type
+
+    def fake_put_stream(key: str, stream, content_type: str = "application/octet-stream", part_size: int = 0):
+        chunks = []
+        while True:
+            chunk = stream.read(64 * 1024)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        store[key] = b"".join(chunks)
+        content_types[key] = content_type
 
     def fake_get_bytes(key: str) -> bytes:
         if key not in store:
-            raise S3Error("NoSuchKey", "missing", f"/{key}", "test-request", "test-host")
+            raise S3Error("NoSuchKey", "missing", f"/{key}", "test-request", "test-host", None)
         return store[key]
 
+    def fake_stat_object(key: str):
+        if key not in store:
+            raise S3Error("NoSuchKey", "missing", f"/{key}", "test-request", "test-host", None)
+        return storage_module.ObjectStat(
+            len(store[key]), hashlib.md5(store[key]).hexdigest(), content_types.get(key, "application/octet-stream"),
+        )
+
+    def fake_iter_object(key: str, offset: int = 0, length: int = 0, chunk_size: int = 4):
+        data = store[key]
+        end = offset + length if length else len(data)
+        for start in range(offset, end, chunk_size):
+            yield data[start:min(start + chunk_size, end)]
+
     def fake_delete_object(key: str):
         store.pop(key, None)
 
+    def fake_remove_objects(keys):
+        for key in keys:
+            store.pop(key, None)
+
     from app.routers import envelopes, signing  # noqa: E402
 
+    monkeypatch.setattr(
+        storage_module,
+        "object_cache",
+        storage_module.ObjectCache(str(tmp_path / "object-cache"), 1024 * 1024),
+    )
+    from app import blobs  # noqa: E402
+
+    monkeypatch.setattr(blobs, "_known", OrderedDict())
+    from app import signatures  # noqa: E402
+
+    monkeypatch.setattr(signatures, "_normalized", OrderedDict())
     for target in (storage_module, projects_router, envelopes, signing):
         if hasattr(target, "put_bytes"):
             monkeypatch.setattr(target, "put_bytes", fake_put_bytes)
+        if hasattr(target, "put_stream"):
+            monkeypatch.setattr(target, "put_stream", fake_put_stream)
         if hasattr(target, "get_bytes"):
             monkeypatch.setattr(target, "get_bytes", fake_get_bytes)
+        if hasattr(target, "stat_object"):
+            monkeypatch.setattr(target, "stat_object", fake_stat_object)
+        if hasattr(target, "iter_object"):
+            monkeypatch.setattr(target, "iter_object", fake_iter_object)
         if hasattr(target, "delete_object"):
             monkeypatch.setattr(target, "delete_object", fake_delete_object)
+        if hasattr(target, "remove_objects"):
+            monkeypatch.setattr(target, "remove_objects", fake_remove_objects)
     return store
 
 
@@ -91,13 +142,25 @@ def sent_emails(monkeypatch):
         monkeypatch.setattr(target, "send_email", fake_send_email)
     from app.routers import envelopes, signing  # noqa: E402
 
+    from app import sealing  # noqa: E402
+
     monkeypatch.setattr(envelopes, "send_email", fake_send_email)
-    monkeypatch.setattr(signing, "send_email", fake_send_email)
+    monkeypatch.setattr(sealing, "send_email", fake_send_email)
     return messages
 
 
 @pytest.fixture
-def client(test_engine, setup_db, mock_storage):
+def seal_queue(monkeypatch):
+    """Capture envelopes handed to the Celery worker instead of hitting Redis."""
+    queued = []
+    from app.routers import signing  # noqa: E402
+
+    monkeypatch.setattr(signing, "enqueue_seal", queued.append)
+    return queued
+
+
+@pytest.fixture
+def client(test_engine, setup_db, mock_storage, seal_queue):
     db_module.engine = test_engine
 
     def override_session():
@@ -105,6 +168,10 @@ def client(test_engine, setup_db, mock_storage):
             yield session
 
     app.dependency_overrides[get_session] = override_session
+    access_token_cache.clear()
+    from app.routers import signing  # noqa: E402
+
+    signing._layouts.clear()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -0,0 +1,255 @@
+import pytest
+from sqlmodel import Session, delete, select
+
+from app.events import GENESIS_HASH, append_event
+from app.models import Event, EventChainHead
+from app.utils import canonical_json, sha256_bytes
+
+
+def chain(session, env_id):
+    return session.exec(select(Event).where(Event.envelope_id == env_id).order_by(Event.id)).all()
+
+
+def test_append_event_links_chain_through_stored_head(test_engine, setup_db):
+    with Session(test_engine) as session:
+        for n in range(3):
+            append_event(session, 1, "system", "filled", {"n": n})
+        append_event(session, 2, "system", "created", {})
+
+        events = chain(session, 1)
+        assert [e.prev_hash for e in events] == [GENESIS_HASH, events[0].hash, events[1].hash]
+        for event in events:
+            assert event.hash == sha256_bytes((event.prev_hash + event.meta_json).encode())
+
+        head = session.get(EventChainHead, 1)
+        assert head.head_hash == events[-1].hash
+        assert head.event_count == 3
+        assert session.get(EventChainHead, 2).event_count == 1
+
+
+def test_append_event_seeds_head_from_existing_events(test_engine, setup_db):
+    with Session(test_engine) as session:
+        meta_json = canonical_json({"actor": "system", "type": "created", "meta": {}})
+        legacy = Event(envelope_id=7, actor="system", type="created", meta_json=meta_json, prev_hash=GENESIS_HASH)
+        legacy.hash = sha256_bytes((GENESIS_HASH + meta_json).encode())
+        session.add(legacy)
+        session.commit()
+
+        append_event(session, 7, "system", "sent", {})
+
+        events = chain(session, 7)
+        assert events[1].prev_hash == legacy.hash
+        head = session.get(EventChainHead, 7)
+        assert head.head_hash == events[1].hash
+        assert head.event_count == 2
+
+
+def test_merkle_frontier_and_proofs_agree_with_full_tree():
+    from app.audit import extend_frontier, frontier_root, inclusion_proof, merkle_root, verify_inclusion
+
+    hashes = [sha256_bytes(str(n).encode()) for n in range(9)]
+    for size in range(1, len(hashes) + 1):
+        leaves = hashes[:size]
+        root = merkle_root(leaves)
+        assert frontier_root(extend_frontier(extend_frontier([], leaves[:size // 2]), leaves[size // 2:])) == root
+        for index, leaf in enumerate(leaves):
+            proof = inclusion_proof(leaves, index)
+            assert len(proof) <= (size - 1).bit_length()
+            assert verify_inclusion(leaf, proof, root)
+        if size > 1:
+            assert not verify_inclusion(leaves[1], inclusion_proof(leaves, 0), root)
+
+
+def test_proofs_come_from_stored_subtrees_across_checkpoints(test_engine, setup_db, monkeypatch):
+    from app import audit
+    from app.models import EventMerkleNode
+
+    with Session(test_engine) as session:
+        for batch in (1, 2, 4, 6):  # checkpoints at 1, 3, 7 and 13 events
+            for _ in range(batch):
+                append_event(session, 11, "system", "filled", {"n": len(chain(session, 11))})
+            audit.checkpoint_envelope(session, 11)
+        events = chain(session, 11)
+        expected = [audit.inclusion_proof([e.hash for e in events], index) for index in range(len(events))]
+
+        def no_full_rebuild(*args, **kwargs):
+            raise AssertionError("proof rebuilt the tree from every event")
+
+        monkeypatch.setattr(audit, "inclusion_proof", no_full_rebuild)
+        for index, event in enumerate(events):
+            proof = audit.prove_event(session, event)
+            assert proof["leaf_index"] == index and proof["tree_size"] == 13
+            assert proof["proof"] == expected[index]
+            assert audit.verify_inclusion(event.hash, proof["proof"], proof["merkle_root"])
+
+        # checkpoints written before nodes were stored are backfilled once
+        session.exec(delete(EventMerkleNode))
+        session.commit()
+        proof = audit.prove_event(session, events[5])
+        assert proof["proof"] == expected[5]
+
+        # an event newer than every checkpoint is checkpointed, then proven
+        append_event(session, 11, "system", "sealed", {})
+        latest = chain(session, 11)[-1]
+        proof = audit.prove_event(session, latest)
+        assert proof["tree_size"] == 14 and proof["checkpoint_id"] is not None
+        assert audit.verify_inclusion(latest.hash, proof["proof"], proof["merkle_root"])
+
+
+def test_checkpoints_rehash_only_new_events_and_catch_tampering(test_engine, setup_db):
+    from app.audit import checkpoint_envelope, prove_event, verify_envelope, verify_inclusion
+
+    with Session(test_engine) as session:
+        for n in range(4):
+            append_event(session, 3, "system", "filled", {"n": n})
+        first = checkpoint_envelope(session, 3)
+        assert first["ok"] and first["rehashed"] == 4
+
+        append_event(session, 3, "system", "completed", {})
+        report = verify_envelope(session, 3)
+        assert report["ok"] and report["rehashed"] == 1 and report["event_count"] == 5
+        second = checkpoint_envelope(session, 3)
+        assert second["rehashed"] == 1
+
+        target = chain(session, 3)[1]
+        proof = prove_event(session, target)
+        assert proof["checkpoint_id"] == second["checkpoint_id"]
+        assert verify_inclusion(target.hash, proof["proof"], second["merkle_root"])
+
+        target.meta_json = canonical_json({"actor": "system", "type": "filled", "meta": {"n": 99}})
+        session.add(target)
+        session.commit()
+        assert verify_envelope(session, 3)["ok"]  # checkpointed prefix is trusted
+        full = verify_envelope(session, 3, full=True)
+        assert not full["ok"]
+        assert any(e.get("event_id") == target.id for e in full["errors"])
+
+
+def test_event_writer_coalesces_opens_and_drains_before_sync_appends(test_engine, setup_db, monkeypatch):
+    from app import db as db_module
+    from app.events import EventWriter
+
+    monkeypatch.setattr(db_module, "engine", test_engine)
+    writer = EventWriter(coalesce_seconds=300)
+    monkeypatch.setattr("app.events.event_writer", writer)
+
+    with Session(test_engine) as session:
+        for _ in range(3):
+            append_event(session, 4, "signer:1", "opened", {}, ip="10.0.0.1", buffered=True)
+        append_event(session, 4, "signer:1", "opened", {}, ip="10.0.0.2", buffered=True)
+        assert writer.pending() == 2
+        assert chain(session, 4) == []
+        # only opens are buffered; a filled event drains them and is written now
+        append_event(session, 4, "signer:1", "filled", {"values": {}}, buffered=True)
+        assert [e.type for e in chain(session, 4)] == ["opened", "opened", "filled"]
+        append_event(session, 5, "signer:2", "opened", {}, ip="10.0.0.1", buffered=True)
+
+        append_event(session, 4, "signer:1", "completed", {})
+        assert [e.type for e in chain(session, 4)] == ["opened", "opened", "filled", "completed"]
+        assert writer.pending() == 1
+
+        assert writer.flush() == 1
+        assert [e.type for e in chain(session, 5)] == ["opened"]
+        append_event(session, 5, "signer:2", "opened", {}, ip="10.0.0.1", buffered=True)
+        assert writer.pending() == 0
+
+
+def test_event_writer_gives_up_on_a_batch_after_max_attempts(test_engine, setup_db, monkeypatch):
+    from app import db as db_module
+    from app.events import EventWriter
+
+    monkeypatch.setattr(db_module, "engine", test_engine)
+    writer = EventWriter(max_attempts=2)
+    writer.submit(6, "signer:1", "opened", {})
+
+    def broken(session, env_id):
+        raise RuntimeError("bad row")
+
+    monkeypatch.setattr("app.events.lock_chain_head", broken)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert writer.pending() == 1
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert writer.pending() == 0
+
+
+def test_archived_chains_verify_and_prove_transparently(test_engine, setup_db, mock_storage):
+    from app.archive import archivable_envelope_ids, archive_envelope
+    from app.audit import find_event, prove_event, verify_envelope, verify_inclusion
+    from app.models import EventArchive, FinalArtifact
+
+    with Session(test_engine) as session:
+        for n in range(3):
+            append_event(session, 8, "system", "filled", {"n": n})
+        assert archive_envelope(session, 8)["reason"] == "envelope is not sealed"
+        session.add(FinalArtifact(
+            envelope_id=8,
+            s3_key_pdf="projects/1/final/envelopes/8.pdf",
+            s3_key_audit_json="projects/1/final/envelopes/8.audit.json",
+            sha256_final="f" * 64,
+        ))
+        session.commit()
+        first_id = chain(session, 8)[0].id
+        assert archivable_envelope_ids(session, older_than_days=0) == [8]
+
+        report = archive_envelope(session, 8)
+        assert report["archived"] and report["s3_key"] == f"projects/1/final/envelopes/8.events.{first_id + 2}.jsonl.gz"
+        assert report["s3_key"] in mock_storage
+        assert chain(session, 8) == []
+        assert archivable_envelope_ids(session, older_than_days=0) == []
+
+        assert verify_envelope(session, 8, full=True)["ok"]
+        archived = find_event(session, first_id)
+        proof = prove_event(session, archived)
+        assert verify_inclusion(archived.hash, proof["proof"], proof["merkle_root"])
+
+        # the chain keeps growing from the stored head, and re-archiving merges
+        append_event(session, 8, "system", "sealed", {})
+        full = verify_envelope(session, 8, full=True)
+        assert full["ok"] and full["event_count"] == 4
+        rearchived = archive_envelope(session, 8)
+        assert rearchived["moved"] == 1 and rearchived["s3_key"] != report["s3_key"]
+        assert report["s3_key"] not in mock_storage
+        assert session.get(EventArchive, 8).s3_key == rearchived["s3_key"]
+        assert session.get(EventArchive, 8).event_count == 4
+        assert verify_envelope(session, 8, full=True)["ok"]
+
+        mock_storage[rearchived["s3_key"]] = b"tampered"
+        assert not verify_envelope(session, 8, full=True)["ok"]
+
+        # a broken archive is logged and skipped; the rest still run
+        from app.archive import archive_completed
+        append_event(session, 8, "system", "viewed", {})
+        append_event(session, 9, "system", "filled", {})
+        session.add(FinalArtifact(
+            envelope_id=9,
+            s3_key_pdf="projects/1/final/envelopes/9.pdf",
+            s3_key_audit_json="projects/1/final/envelopes/9.audit.json",
+            sha256_final="f" * 64,
+        ))
+        session.commit()
+        reports = archive_completed(session, envelope_ids=[8, 9])
+        assert [r["archived"] for r in reports] == [False, True]
+        assert "ArchiveUnavailable" in reports[0]["reason"]
+
+
+def test_project_root_reads_each_envelopes_newest_checkpoint(test_engine, setup_db):
+    from app.audit import checkpoint_envelope, merkle_root, project_root
+    from app.models import Envelope
+
+    with Session(test_engine) as session:
+        for env_id in (21, 22, 23):
+            session.add(Envelope(id=env_id, project_id=4 if env_id != 23 else 5, document_id=1))
+        session.commit()
+        for env_id in (21, 22, 23):
+            append_event(session, env_id, "system", "filled", {})
+            checkpoint_envelope(session, env_id)
+        append_event(session, 21, "system", "sealed", {})
+        newest = checkpoint_envelope(session, 21)
+
+        root = project_root(session, 4)
+        assert [e["envelope_id"] for e in root["envelopes"]] == [21, 22]
+        assert root["envelopes"][0]["checkpoint_id"] == newest["checkpoint_id"]
+        assert root["envelopes"][0]["event_count"] == 2
+        assert root["merkle_root"] == merkle_root([e["merkle_root"] for e in root["envelopes"]])
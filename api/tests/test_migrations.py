@@ -0,0 +1,57 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import SQLModel
+
+from app.migrations import MIGRATIONS, applied_versions, migrate
+
+
+def test_migrate_upgrades_legacy_schema_and_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # tables as they looked before access tokens, fonts, page indexes and FK indexes
+        conn.execute(text("CREATE TABLE project (id INTEGER PRIMARY KEY, tenant_id INTEGER, name TEXT, status TEXT)"))
+        conn.execute(text("CREATE TABLE document (id INTEGER PRIMARY KEY, project_id INTEGER, filename TEXT, s3_key TEXT, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE field (id INTEGER PRIMARY KEY, envelope_id INTEGER, page INTEGER)"))
+        conn.execute(text("CREATE TABLE event (id INTEGER PRIMARY KEY, envelope_id INTEGER, meta_json TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE finalartifact (id INTEGER PRIMARY KEY, envelope_id INTEGER, s3_key_pdf TEXT, "
+            "s3_key_audit_json TEXT, sha256_final TEXT, completed_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO project (tenant_id, name, status) VALUES (1, 'Alpha', 'active')"))
+        conn.execute(text(
+            "INSERT INTO finalartifact (envelope_id, s3_key_pdf, s3_key_audit_json, sha256_final) "
+            "VALUES (1, 'a.pdf', 'a.json', 'old'), (1, 'a.pdf', 'a.json', 'new')"
+        ))
+    SQLModel.metadata.create_all(engine)
+
+    applied = migrate(engine)
+    assert applied == sorted(m.version for m in MIGRATIONS)
+
+    inspector = inspect(engine)
+    project_columns = {c["name"] for c in inspector.get_columns("project")}
+    assert "access_token_hash" in project_columns and "access_token" not in project_columns
+    assert "ix_project_access_token" not in {i["name"] for i in inspector.get_indexes("project")}
+    assert "font_family" in {c["name"] for c in inspector.get_columns("field")}
+    assert {"page_count", "page_index_json"} <= {c["name"] for c in inspector.get_columns("document")}
+    assert "uq_project_name" in {i["name"] for i in inspector.get_indexes("project")}
+    assert "ix_field_envelope_id" in {i["name"] for i in inspector.get_indexes("field")}
+    event_indexes = {i["name"]: i["column_names"] for i in inspector.get_indexes("event")}
+    assert event_indexes["ix_event_envelope_id_id"] == ["envelope_id", "id"]
+    assert "uq_finalartifact_envelope_id" in {i["name"] for i in inspector.get_indexes("finalartifact")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT sha256_final FROM finalartifact")).scalars().all() == ["new"]
+
+    assert migrate(engine) == []
+    assert applied_versions(engine) == set(applied)
+
+
+def test_migrate_defers_unique_names_while_duplicates_exist(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dupes.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE project (id INTEGER PRIMARY KEY, tenant_id INTEGER, name TEXT, status TEXT)"))
+        conn.execute(text("INSERT INTO project (tenant_id, name, status) VALUES (1, 'Alpha', 'active'), (1, 'Alpha', 'active')"))
+    SQLModel.metadata.create_all(engine)
+
+    assert 2 not in migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM project WHERE id = 2"))
+    assert migrate(engine) == [2]
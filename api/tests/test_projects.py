@@ -1,10 +1,18 @@
+import hashlib
+import json
 import os
+
+import pytest
 from sqlmodel import Session, select
 
 from app.models import (
     Document,
     Envelope,
     Event,
+    EventArchive,
+    EventChainHead,
+    EventCheckpoint,
+    EventMerkleNode,
     FinalArtifact,
     Project,
     ProjectInvestor,
@@ -13,6 +21,10 @@ from app.models import (
     SigningSession,
     Field as FieldModel,
 )
+from app.routers import projects as projects_router
+from app.audit import checkpoint_envelope
+from app.events import append_event
+from app.sealing import seal_envelope
 from app.utils import make_token
 
 SIMPLE_PDF = (
@@ -102,6 +114,80 @@ def test_project_summary_with_project_token(client):
     assert len(body["investors"]) == 1
 
 
+def test_project_token_lookups_are_cached_and_invalidated(client, test_engine):
+    from app.auth import access_token_cache, token_digest
+
+    project_id, token = create_project(client, "Cached Token")
+    with Session(test_engine) as session:
+        assert session.get(Project, project_id).access_token_hash == token_digest(token)
+    # shown once: nothing returns the raw token after it was issued
+    listed = client.get("/api/projects", headers=ADMIN_HEADERS).text
+    assert token not in listed and "access_token\"" not in listed
+    url = f"/api/projects/{project_id}/summary"
+    assert client.get(url, headers={"X-Access-Token": token}).status_code == 200
+    assert access_token_cache.get(token_digest(token)) == project_id
+
+    new_token = client.post(f"/api/projects/{project_id}/access-token", headers=ADMIN_HEADERS).json()["access_token"]
+    assert access_token_cache.get(token_digest(token)) is None
+    assert client.get(url, headers={"X-Access-Token": token}).status_code == 403
+    assert client.get(url, headers={"X-Access-Token": new_token}).status_code == 200
+
+    assert client.delete(f"/api/projects/{project_id}", headers=ADMIN_HEADERS).status_code in (200, 204)
+    assert access_token_cache.get(token_digest(new_token)) is None
+    assert client.get(url, headers={"X-Access-Token": new_token}).status_code == 403
+
+
+def test_document_upload_streams_and_hashes(client, test_engine, mock_storage):
+    project_id, _ = create_project(client, "Streaming Upload")
+    content = os.urandom(300 * 1024)
+    document = upload_document(client, project_id, filename="memo.pdf", content=content)
+
+    assert document["sha256"] == hashlib.sha256(content).hexdigest()
+    assert document["s3_key"] == f"projects/{project_id}/uploads/{document['id']}-memo.pdf"
+    assert mock_storage[document["s3_key"]] == content
+
+
+def test_document_upload_records_page_index(client, mock_storage):
+    project_id, _ = create_project(client, "Indexed Upload")
+    document = upload_document(client, project_id, filename="index.pdf", content=SIMPLE_PDF)
+    assert document["page_count"] == 1
+    index = json.loads(document["page_index_json"])
+    assert index == {"page_count": 1, "pages": [{"mediabox": [0.0, 0.0, 300.0, 144.0]}]}
+
+    not_pdf = upload_document(client, project_id, filename="notes.pdf", content=b"not a pdf")
+    assert not_pdf["page_count"] is None
+
+
+def test_create_envelope_rejects_fields_beyond_last_page(client, mock_storage):
+    project_id, _ = create_project(client, "Page Validation")
+    document = upload_document(client, project_id, filename="one-page.pdf", content=SIMPLE_PDF)
+    payload = {
+        "project_id": project_id,
+        "document_id": document["id"],
+        "signers": [{"name": "Sam", "email": "sam@example.com"}],
+        "fields": [{"page": 2, "x": 10, "y": 10, "w": 50, "h": 20, "type": "text"}],
+    }
+    resp = client.post("/api/envelopes", json=payload, headers=ADMIN_HEADERS)
+    assert resp.status_code == 400
+    assert "out of range" in resp.text
+
+
+def test_page_index_reads_linearization_parameters():
+    from app.pdf_index import _linearization
+
+    head = b"%PDF-1.6\n12 0 obj\n<< /Linearized 1 /L 48213 /H [ 660 170 ] /O 14 /E 9301 /N 3 /T 47891 >>\nendobj\n"
+    assert _linearization(head) == {
+        "file_length": 48213,
+        "first_page_object": 14,
+        "first_page_end": 9301,
+        "page_count": 3,
+        "main_xref_offset": 47891,
+        "hint_offset": 660,
+        "hint_length": 170,
+    }
+    assert _linearization(b"%PDF-1.4\n1 0 obj\n<< /Type /Catalog >>") is None
+
+
 def test_document_download_allows_query_token(client, mock_storage):
     project_id, token = create_project(client, "Query Access")
     document = upload_document(client, project_id, filename="query.pdf", content=b"doc-bytes")
@@ -126,6 +212,470 @@ def test_document_download_returns_original_file(client, mock_storage):
     assert "investor-pack.pdf" in response.headers.get("content-disposition", "")
 
 
+def test_document_download_honors_range_requests(client, mock_storage):
+    project_id, _ = create_project(client, "Range Access")
+    content = b"0123456789abcdef"
+    document = upload_document(client, project_id, filename="range.pdf", content=content)
+    url = f"/api/projects/{project_id}/documents/{document['id']}/pdf"
+
+    full = client.get(url, headers=ADMIN_HEADERS)
+    assert full.status_code == 200
+    assert full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+    assert etag == f'"{document["sha256"]}"'
+
+    partial = client.get(url, headers={**ADMIN_HEADERS, "Range": "bytes=2-9"})
+    assert partial.status_code == 206
+    assert partial.content == content[2:10]
+    assert partial.headers["content-range"] == f"bytes 2-9/{len(content)}"
+
+    suffix = client.get(url, headers={**ADMIN_HEADERS, "Range": "bytes=-3", "If-Range": etag})
+    assert suffix.status_code == 206
+    assert suffix.content == content[-3:]
+
+    stale = client.get(url, headers={**ADMIN_HEADERS, "Range": "bytes=0-3", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == content
+
+    beyond = client.get(url, headers={**ADMIN_HEADERS, "Range": "bytes=100-200"})
+    assert beyond.status_code == 416
+    assert beyond.headers["content-range"] == f"bytes */{len(content)}"
+
+
+def test_document_download_served_from_object_cache(client, mock_storage):
+    from app import storage
+
+    project_id, _ = create_project(client, "Cached Access")
+    content = b"cached-document-bytes"
+    document = upload_document(client, project_id, filename="cached.pdf", content=content)
+    url = f"/api/projects/{project_id}/documents/{document['id']}/pdf"
+
+    first = client.get(url, headers=ADMIN_HEADERS)
+    assert first.content == content
+    assert storage.object_cache.stats()["misses"] == 1
+
+    mock_storage.pop(document["s3_key"])
+    second = client.get(url, headers={**ADMIN_HEADERS, "Range": "bytes=7-14"})
+    assert second.status_code == 206
+    assert second.content == content[7:15]
+    stats = storage.object_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["entries"] == 1
+
+
+def test_sign_links_are_compact_and_expire_with_the_envelope(client, test_engine, mock_storage):
+    from datetime import datetime, timedelta
+    from app.tokens import make_sign_token
+
+    project_id, _ = create_project(client, "Expiring Links")
+    document = upload_document(client, project_id, filename="deal.pdf", content=SIMPLE_PDF)
+    payload = {
+        "project_id": project_id,
+        "document_id": document["id"],
+        "signers": [{"name": "Sam", "email": "sam@example.com"}],
+        "fields": [],
+        "expires_at": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+    }
+    envelope_id = client.post("/api/envelopes", json=payload, headers=ADMIN_HEADERS).json()["id"]
+    with Session(test_engine) as session:
+        signer = session.exec(select(Signer).where(Signer.envelope_id == envelope_id)).first()
+    token = make_sign_token(signer.id, envelope_id)
+    legacy = make_token({"signer_id": signer.id, "envelope_id": envelope_id})
+    assert len(token) < len(legacy)
+
+    assert client.get(f"/api/sign/{token}").json()["signer"]["id"] == signer.id
+    assert client.get(f"/api/sign/{legacy}/seal-status").status_code == 200
+    assert client.get(f"/api/sign/{token}x").status_code == 404
+    assert client.get(f"/api/sign/{make_sign_token(signer.id, envelope_id + 1)}").status_code == 404
+
+    with Session(test_engine) as session:
+        envelope = session.get(Envelope, envelope_id)
+        envelope.expires_at = datetime.utcnow() - timedelta(minutes=1)
+        session.add(envelope)
+        session.commit()
+    assert client.get(f"/api/sign/{token}").status_code == 410
+    assert client.get(f"/api/sign/{legacy}/pdf").status_code == 410
+
+    # a finished signer keeps reading their copy, but an expired link never writes
+    with Session(test_engine) as session:
+        done = session.get(Signer, signer.id)
+        done.status = "completed"
+        session.add(done)
+        session.commit()
+    assert client.get(f"/api/sign/{token}").status_code == 200
+    assert client.get(f"/api/sign/{token}/seal-status").status_code == 200
+    assert client.post(f"/api/sign/{token}/save", json={"values": {}}).status_code == 410
+    assert client.post(f"/api/sign/{token}/consent", json={"accepted": True}).status_code == 410
+    assert client.post(f"/api/sign/{token}/complete", json={"values": {}}).status_code == 410
+
+
+def test_sign_saves_upsert_only_changed_values(client, test_engine, mock_storage):
+    from app.tokens import make_sign_token
+
+    project_id, _ = create_project(client, "Autosave")
+    document = upload_document(client, project_id, filename="deal.pdf", content=SIMPLE_PDF)
+    text_field = {"page": 1, "x": 10, "y": 10, "w": 100, "h": 20, "type": "text"}
+    payload = {
+        "project_id": project_id,
+        "document_id": document["id"],
+        "signers": [{"name": "Sam", "email": "sam@example.com"}],
+        "fields": [text_field, text_field],
+    }
+    envelope_id = client.post("/api/envelopes", json=payload, headers=ADMIN_HEADERS).json()["id"]
+    with Session(test_engine) as session:
+        signer = session.exec(select(Signer).where(Signer.envelope_id == envelope_id)).first()
+        first, second = [f.id for f in session.exec(select(FieldModel).where(FieldModel.envelope_id == envelope_id))]
+    url = f"/api/sign/{make_sign_token(signer.id, envelope_id)}/save"
+
+    def stored():
+        with Session(test_engine) as session:
+            rows = session.exec(select(SignerFieldValue).where(SignerFieldValue.signer_id == signer.id)).all()
+            return {row.field_id: (row.id, json.loads(row.value_json)["value"]) for row in rows}
+
+    assert client.post(url, json={"values": {str(first): "a", str(second): "b"}}).json()["changed"] == 2
+    before = stored()
+    assert client.post(url, json={"values": {str(first): "a", str(second): "b"}}).json()["changed"] == 0
+    assert client.patch(url, json={"values": {str(second): {"value": "c"}}}).json()["changed"] == 1
+    after = stored()
+    assert after[first] == before[first]
+    assert after[second] == (before[second][0], "c")
+
+    assert client.patch(url, json={"values": {str(first): ""}}).json()["changed"] == 1
+    assert set(stored()) == {second}
+    assert client.post(url, json={"values": {str(second): "c"}}).json()["changed"] == 0
+
+    with Session(test_engine) as session:
+        filled = session.exec(select(Event).where(Event.envelope_id == envelope_id, Event.type == "filled")).all()
+    assert len(filled) == 3
+    assert json.loads(filled[-1].meta_json)["meta"]["cleared"] == [first]
+
+    # an empty partial save touches nothing; an empty whole form clears everything
+    assert client.patch(url, json={"values": {}}).json()["changed"] == 0
+    assert set(stored()) == {second}
+    assert client.post(url, json={"values": {}}).json()["changed"] == 1
+    assert stored() == {}
+
+
+def test_signature_upload_is_stored_once_and_referenced(client, test_engine, mock_storage):
+    import base64
+    from app.tokens import make_sign_token
+
+    project_id, _ = create_project(client, "Signature Blobs")
+    document = upload_document(client, project_id, filename="deal.pdf", content=SIMPLE_PDF)
+    payload = {
+        "project_id": project_id,
+        "document_id": document["id"],
+        "signers": [{"name": "Sam", "email": "sam@example.com"}],
+        "fields": [{"page": 1, "x": 10, "y": 10, "w": 100, "h": 40, "type": "signature"}],
+    }
+    envelope_id = client.post("/api/envelopes", json=payload, headers=ADMIN_HEADERS).json()["id"]
+    with Session(test_engine) as session:
+        signer = session.exec(select(Signer).where(Signer.envelope_id == envelope_id)).first()
+        field_id = session.exec(select(FieldModel.id).where(FieldModel.envelope_id == envelope_id)).first()
+    base = f"/api/sign/{make_sign_token(signer.id, envelope_id)}"
+    png = base64.b64decode(SIMPLE_SIGNATURE_B64)
+
+    upload = client.post(f"{base}/signatures", files={"file": ("sig.png", png, "image/png")})
+    assert upload.status_code == 200
+    ref = upload.json()["ref"]
+    assert ref == "sha256:" + upload.json()["sha256"]
+    assert client.post(f"{base}/signatures", files={"file": ("sig.png", png, "image/png")}).json()["ref"] == ref
+    assert len([key for key in mock_storage if key.startswith("signatures/")]) == 1
+    assert client.post(f"{base}/signatures", files={"file": ("x.png", b"not an image", "image/png")}).status_code == 400
+
+    assert client.post(f"{base}/save", json={"values": {str(field_id): ref}}).json()["changed"] == 1
+    # the same image sent inline resolves to the same reference: nothing changes
+    assert client.post(f"{base}/save", json={"values": {str(field_id): SIMPLE_SIGNATURE_B64}}).json()["changed"] == 0
+    with Session(test_engine) as session:
+        row = session.exec(select(SignerFieldValue).where(SignerFieldValue.signer_id == signer.id)).one()
+    assert json.loads(row.value_json) == {"value": ref}
+    unknown = "sha256:" + "0" * 64
+    assert client.post(f"{base}/save", json={"values": {str(field_id): unknown}}).status_code == 400
+    # digests of stored field values are not signature images
+    value_digests = [key.rsplit("/", 1)[1] for key in mock_storage if key.startswith("blobs/")]
+    assert value_digests
+    for digest in value_digests:
+        assert client.post(f"{base}/save", json={"values": {str(field_id): f"sha256:{digest}"}}).status_code == 400
+
+    strokes = {"format": "strokes", "width": 200.4, "height": 80, "strokes": [[10, 20, 5.2, -3], [40, 40]]}
+    assert client.patch(f"{base}/save", json={"values": {str(field_id): {"value": strokes}}}).json()["changed"] == 1
+    with Session(test_engine) as session:
+        row = session.exec(select(SignerFieldValue).where(SignerFieldValue.signer_id == signer.id)).one()
+    assert json.loads(row.value_json)["value"] == {
+        "format": "strokes", "width": 200, "height": 80, "pen": 3, "strokes": [[10, 20, 5, -3], [40, 40]],
+    }
+    bad = {**strokes, "strokes": [[1, 2, 3]]}
+    assert client.patch(f"{base}/save", json={"values": {str(field_id): {"value": bad}}}).status_code == 400
+
+
+def test_sign_layout_is_cached_and_etag_validated(client, test_engine, mock_storage):
+    from app.routers import signing
+    from app.tokens import make_sign_token
+
+    project_id, _ = create_project(client, "Layout Cache")
+    document = upload_document(client, project_id, filename="deal.pdf", content=SIMPLE_PDF)
+    payload = {
+        "project_id": project_id,
+        "document_id": document["id"],
+        "signers": [{"name": "Sam", "email": "sam@example.com"}, {"name": "Kim", "email": "kim@example.com"}],
+        "fields": [{"page": 1, "x": 10, "y": 10, "w": 100, "h": 20, "type": "text"}],
+    }
+    envelope_id = client.post("/api/envelopes", json=payload, headers=ADMIN_HEADERS).json()["id"]
+    with Session(test_engine) as session:
+        signer = session.exec(select(Signer).where(Signer.envelope_id == envelope_id).order_by(Signer.id)).first()
+    base = f"/api/sign/{make_sign_token(signer.id, envelope_id)}"
+
+    full = client.get(base).json()
+    assert full["waiting_on"] == 1
+    assert full["final_artifact"] is None
+    assert full["document"]["page_count"] == 1
+    assert len(full["fields"]) == 1
+
+    layout = client.get(f"{base}/layout")
+    etag = layout.headers["etag"]
+    assert etag == full["layout_etag"]
+    assert layout.json() == {"document": full["document"], "fields": full["fields"]}
+    assert client.get(f"{base}/layout", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"{base}/layout", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    lean = client.get(base, params={"include_layout": False}).json()
+    assert "fields" not in lean and lean["layout_etag"] == etag
+    assert list(signing._layouts) == [(envelope_id, signer.id, 1)]
+
+
+def test_sign_layout_cache_follows_page_index_backfill_and_delete(client, test_engine, mock_storage):
+    from app.routers import signing
+    from app.tokens import make_sign_token
+
+    project_id, _ = create_project(client, "Layout Backfill")
+    document = upload_document(client, project_id, filename="deal.pdf", content=SIMPLE_PDF)
+    payload = {
+        "project_id": project_id,
+        "document_id": document["id"],
+        "signers": [{"name": "Sam", "email": "sam@example.com"}],
+        "fields": [{"page": 1, "x": 10, "y": 10, "w": 100, "h": 20, "type": "text"}],
+    }
+    envelope_id = client.post("/api/envelopes", json=payload, headers=ADMIN_HEADERS).json()["id"]
+    with Session(test_engine) as session:
+        signer_id = session.exec(select(Signer.id).where(Signer.envelope_id == envelope_id)).one()
+        doc = session.get(Document, document["id"])
+        page_index_json = doc.page_index_json
+        doc.page_count, doc.page_index_json = None, None
+        session.add(doc)
+        session.commit()
+    base = f"/api/sign/{make_sign_token(signer_id, envelope_id)}"
+
+    before = client.get(f"{base}/layout")
+    assert before.json()["document"]["page_count"] is None
+
+    # what app.scripts.backfill_page_index does from another process
+    with Session(test_engine) as session:
+        doc = session.get(Document, document["id"])
+        doc.page_count, doc.page_index_json = 1, page_index_json
+        session.add(doc)
+        session.commit()
+
+    after = client.get(f"{base}/layout", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.json()["document"]["page_count"] == 1
+    assert after.headers["etag"] != before.headers["etag"]
+
+    assert client.delete(f"/api/projects/{project_id}/envelopes/{envelope_id}", headers=ADMIN_HEADERS).status_code == 204
+    assert not any(key[0] == envelope_id for key in signing._layouts)
+
+
+def test_sign_pages_endpoint_serves_cached_page_spans(client, test_engine, mock_storage):
+    from io import BytesIO
+    from pypdf import PdfReader
+    from app import storage
+
+    project_id, _ = create_project(client, "Page Serving")
+    document = upload_document(client, project_id, filename="pages.pdf", content=SIMPLE_PDF)
+    payload = {
+        "project_id": project_id,
+        "document_id": document["id"],
+        "signers": [{"name": "Sam", "email": "sam@example.com"}],
+        "fields": [],
+    }
+    envelope_id = client.post("/api/envelopes", json=payload, headers=ADMIN_HEADERS).json()["id"]
+    with Session(test_engine) as session:
+        signer = session.exec(select(Signer).where(Signer.envelope_id == envelope_id)).first()
+    token = make_token({"signer_id": signer.id, "envelope_id": envelope_id})
+
+    resp = client.get(f"/api/sign/{token}/pages/1")
+    assert resp.status_code == 200
+    assert resp.headers["x-page-count"] == "1"
+    assert resp.headers["x-page-range"] == "1-1"
+    assert json.loads(resp.headers["x-page-geometry"]) == [{"mediabox": [0.0, 0.0, 300.0, 144.0]}]
+    assert len(PdfReader(BytesIO(resp.content)).pages) == 1
+    misses = storage.object_cache.stats()["misses"]
+
+    again = client.get(f"/api/sign/{token}/pages/1-1", headers={"Range": "bytes=0-3"})
+    assert again.status_code == 206
+    assert again.content == resp.content[:4]
+    assert storage.object_cache.stats()["misses"] == misses
+
+    assert client.get(f"/api/sign/{token}/pages/2").status_code == 404
+    assert client.get(f"/api/sign/{token}/pages/3-2").status_code == 400
+
+
+def test_object_cache_evicts_least_recently_used(tmp_path, mock_storage):
+    from app import storage
+
+    cache = storage.ObjectCache(str(tmp_path / "lru"), max_bytes=10)
+    blobs = {name: name.encode() * 4 for name in ("a", "b", "c")}
+    digests = {}
+    for name, data in blobs.items():
+        mock_storage[name] = data
+        digests[name] = hashlib.sha256(data).hexdigest()
+
+    assert cache.path_for(digests["a"], "a")
+    assert cache.path_for(digests["b"], "b")
+    assert cache.path_for(digests["a"], "a")  # refresh a
+    assert cache.path_for(digests["c"], "c")  # evicts b
+
+    assert not os.path.exists(os.path.join(cache.directory, digests["b"]))
+    assert os.path.exists(os.path.join(cache.directory, digests["a"]))
+    assert cache.stats()["bytes"] == 8
+    assert cache.path_for("0" * 64, "a") is None  # digest mismatch is never cached
+
+
+def test_object_cache_streams_misses_and_fills_once(tmp_path):
+    from app import storage
+
+    cache = storage.ObjectCache(str(tmp_path / "through"), max_bytes=1024)
+    chunks = [b"abc", b"def", b"ghi"]
+    digest = hashlib.sha256(b"".join(chunks)).hexdigest()
+
+    first = cache.stream_through(digest, 9, iter(chunks))
+    assert next(first) == b"abc"  # served before the object is fully read
+    assert cache.lookup(digest) is None
+    # a concurrent miss passes straight through instead of filling again
+    assert list(cache.stream_through(digest, 9, iter(chunks))) == chunks
+    assert [name for name in os.listdir(cache.directory) if name.startswith(".tmp-")] != []
+    assert list(first) == [b"def", b"ghi"]
+    assert cache.lookup(digest) == os.path.join(cache.directory, digest)
+    assert os.listdir(cache.directory) == [digest]
+
+    aborted = cache.stream_through(hashlib.sha256(b"other").hexdigest(), 5, iter([b"oth", b"er"]))
+    next(aborted)
+    aborted.close()  # client went away mid-download
+    assert os.listdir(cache.directory) == [digest]
+
+
+def test_object_cache_startup_only_removes_own_or_stale_temp_files(tmp_path):
+    import time
+    from app import storage
+
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    own = directory / f".tmp-{os.getpid()}-leftover"
+    live = directory / ".tmp-999999999-filling"
+    stale = directory / ".tmp-999999999-abandoned"
+    for path in (own, live, stale):
+        path.write_bytes(b"partial")
+    old = time.time() - storage.ObjectCache.STALE_TMP_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    cache = storage.ObjectCache(str(directory), max_bytes=1024)
+    assert sorted(os.listdir(directory)) == [live.name]
+    assert cache.stats()["entries"] == 0
+
+
+def test_envelope_listing_is_keyset_paginated_and_filtered(client, test_engine, mock_storage):
+    from datetime import datetime, timedelta
+
+    project_id, _ = create_project(client, "Paged Envelopes")
+    document = upload_document(client, project_id, filename="deal.pdf", content=b"deal-data")
+    created = datetime(2024, 1, 1)
+    with Session(test_engine) as session:
+        for n, env_status in enumerate(["sent", "completed", "sent"]):
+            env = Envelope(project_id=project_id, document_id=document["id"], subject=f"Deal {n}",
+                           status=env_status, created_at=created + timedelta(days=n))
+            session.add(env)
+            session.commit()
+            session.add(Signer(envelope_id=env.id, name=f"Signer {n}", email=f"s{n}@example.com"))
+            session.commit()
+
+    url = f"/api/projects/{project_id}/envelopes"
+    first = client.get(url, params={"limit": 2}, headers=ADMIN_HEADERS)
+    assert [e["subject"] for e in first.json()] == ["Deal 2", "Deal 1"]
+    assert first.json()[0]["document"]["filename"] == "deal.pdf"
+    assert first.json()[0]["signers"][0]["magic_link"] is None
+    cursor = first.headers["x-next-cursor"]
+
+    second = client.get(url, params={"limit": 2, "cursor": cursor}, headers=ADMIN_HEADERS)
+    assert [e["subject"] for e in second.json()] == ["Deal 0"]
+    assert "x-next-cursor" not in second.headers
+
+    sent = client.get(url, params={"status": "sent"}, headers=ADMIN_HEADERS).json()
+    assert [e["subject"] for e in sent] == ["Deal 2", "Deal 0"]
+    found = client.get(url, params={"q": "s1@example", "include_links": True}, headers=ADMIN_HEADERS).json()
+    assert [e["subject"] for e in found] == ["Deal 1"]
+    assert "/sign/" in found[0]["signers"][0]["magic_link"]
+
+    assert client.get(url, params={"cursor": "not-a-cursor"}, headers=ADMIN_HEADERS).status_code == 400
+
+
+def test_list_endpoints_are_keyset_paginated_and_filtered(client, test_engine, mock_storage):
+    from datetime import datetime, timedelta
+
+    for name in ("Paged A", "Paged B", "Other C"):
+        create_project(client, name)
+    first = client.get("/api/projects", params={"limit": 1, "name": "Paged"}, headers=ADMIN_HEADERS)
+    assert [p["name"] for p in first.json()] == ["Paged A"]
+    second = client.get(
+        "/api/projects", params={"limit": 1, "name": "Paged", "cursor": first.headers["x-next-cursor"]},
+        headers=ADMIN_HEADERS,
+    )
+    assert [p["name"] for p in second.json()] == ["Paged B"]
+    assert "x-next-cursor" not in second.headers
+
+    project_id = client.get("/api/projects", params={"name": "Other"}, headers=ADMIN_HEADERS).json()[0]["id"]
+    day = datetime(2024, 1, 1)
+    with Session(test_engine) as session:
+        for n in range(3):
+            doc = Document(project_id=project_id, filename=f"deal-{n}.pdf", s3_key=f"k{n}", created_at=day + timedelta(days=n))
+            session.add(doc)
+            session.commit()
+            env = Envelope(project_id=project_id, document_id=doc.id, status="completed")
+            session.add(env)
+            session.commit()
+            session.add(FinalArtifact(
+                envelope_id=env.id, s3_key_pdf=f"final-{n}.pdf", s3_key_audit_json=f"final-{n}.json",
+                sha256_final="0" * 64, completed_at=day + timedelta(days=n),
+            ))
+            session.add(ProjectInvestor(project_id=project_id, name=f"Investor {n}", email=f"i{n}@example.com",
+                                        routing_order=3 - n))
+        session.commit()
+
+    docs_url = f"/api/projects/{project_id}/documents"
+    docs = client.get(docs_url, params={"limit": 2}, headers=ADMIN_HEADERS)
+    assert [d["filename"] for d in docs.json()] == ["deal-2.pdf", "deal-1.pdf"]
+    rest = client.get(docs_url, params={"cursor": docs.headers["x-next-cursor"]}, headers=ADMIN_HEADERS)
+    assert [d["filename"] for d in rest.json()] == ["deal-0.pdf"]
+    ranged = client.get(docs_url, params={"since": "2024-01-02T00:00:00", "until": "2024-01-03T00:00:00"},
+                        headers=ADMIN_HEADERS).json()
+    assert [d["filename"] for d in ranged] == ["deal-1.pdf"]
+
+    investors_url = f"/api/projects/{project_id}/investors"
+    investors = client.get(investors_url, params={"limit": 2}, headers=ADMIN_HEADERS)
+    assert [i["name"] for i in investors.json()] == ["Investor 2", "Investor 1"]
+    assert [i["name"] for i in client.get(
+        investors_url, params={"cursor": investors.headers["x-next-cursor"]}, headers=ADMIN_HEADERS
+    ).json()] == ["Investor 0"]
+
+    artifacts_url = f"/api/projects/{project_id}/final-artifacts"
+    artifacts = client.get(artifacts_url, params={"limit": 2}, headers=ADMIN_HEADERS)
+    assert [a["document_name"] for a in artifacts.json()] == ["deal-2.pdf", "deal-1.pdf"]
+    assert [a["document_name"] for a in client.get(
+        artifacts_url, params={"cursor": artifacts.headers["x-next-cursor"]}, headers=ADMIN_HEADERS
+    ).json()] == ["deal-0.pdf"]
+    assert [a["document_name"] for a in client.get(
+        artifacts_url, params={"name": "deal-1"}, headers=ADMIN_HEADERS
+    ).json()] == ["deal-1.pdf"]
+
+
 def test_project_delete_cascades_all_records(client, test_engine, mock_storage):
     project_id, _ = create_project(client)
     document = upload_document(client, project_id, filename="deal.pdf", content=b"deal-data")
@@ -157,7 +707,14 @@ def test_project_delete_cascades_all_records(client, test_engine, mock_storage):
 
         session.add(SigningSession(signer_id=signer.id, token_hash="tok"))
         session.add(SignerFieldValue(signer_id=signer.id, field_id=field.id, value_json="{}"))
-        session.add(Event(envelope_id=envelope.id, actor="system", type="created", meta_json="{}"))
+        for n in range(4):
+            append_event(session, envelope.id, "system", "filled", {"n": n})
+        assert checkpoint_envelope(session, envelope.id)["ok"]
+        assert session.exec(select(EventMerkleNode)).first() is not None
+        session.add(EventArchive(
+            envelope_id=envelope.id, s3_key="archived.events.jsonl.gz", sha256="a" * 64,
+            first_event_id=1, last_event_id=1, event_count=1, head_hash="0" * 64, merkle_root="0" * 64,
+        ))
 
         final_pdf_key = f"projects/{project_id}/final/envelope-{envelope.id}.pdf"
         final_audit_key = f"{final_pdf_key}.audit.json"
@@ -174,19 +731,20 @@ def test_project_delete_cascades_all_records(client, test_engine, mock_storage):
         mock_storage[doc_record.s3_key] = b"doc"
         mock_storage[final_pdf_key] = b"final"
         mock_storage[final_audit_key] = b"audit"
+        mock_storage["archived.events.jsonl.gz"] = b"events"
 
     delete_response = client.delete(f"/api/projects/{project_id}", headers=ADMIN_HEADERS)
     assert delete_response.status_code == 204
 
     with Session(test_engine) as session:
         assert session.exec(select(Project).where(Project.id == project_id)).first() is None
-        for model in (Document, Envelope, ProjectInvestor, FinalArtifact, Signer, FieldModel, SigningSession, SignerFieldValue, Event):
+        for model in (Document, Envelope, ProjectInvestor, FinalArtifact, Signer, FieldModel, SigningSession, SignerFieldValue, Event, EventChainHead, EventCheckpoint, EventMerkleNode, EventArchive):
             assert session.exec(select(model)).first() is None
 
     assert mock_storage == {}
 
 
-def test_envelope_send_and_sign_flow(client, test_engine, mock_storage, sent_emails):
+def test_envelope_send_and_sign_flow(client, test_engine, mock_storage, sent_emails, seal_queue):
     project_id, project_token = create_project(client, "Beta Project")
     investor_payload = {"name": "Jamie Investor", "email": "jamie@example.com", "units_invested": 2500}
     inv_response = client.post(
@@ -254,14 +812,203 @@ def test_envelope_send_and_sign_flow(client, test_engine, mock_storage, sent_ema
     assert consent_resp.status_code == 200
 
     complete_payload = {"values": {str(field.id): {"value": SIMPLE_SIGNATURE_B64}}}
+    save_resp = client.post(f"/api/sign/{token}/save", json=complete_payload)
+    assert save_resp.status_code == 200
+    with Session(test_engine) as session:
+        filled = session.exec(select(Event).where(Event.envelope_id == envelope_id, Event.type == "filled")).first()
+    digest = json.loads(filled.meta_json)["meta"]["values"][str(field.id)]
+    assert SIMPLE_SIGNATURE_B64 not in filled.meta_json
+    blob_resp = client.get(f"/api/audit/blobs/{digest}", headers=ADMIN_HEADERS)
+    assert hashlib.sha256(blob_resp.content).hexdigest() == digest
+    assert blob_resp.headers["content-type"] == "application/json"
+    # the inline PNG was normalized and stored once; the value references it
+    signature_digest = blob_resp.json()["value"].removeprefix("sha256:")
+    signature_resp = client.get(f"/api/audit/blobs/{signature_digest}", headers=ADMIN_HEADERS)
+    assert signature_resp.headers["content-type"] == "image/png"
+    assert signature_resp.content.startswith(b"\x89PNG")
+
     complete_resp = client.post(f"/api/sign/{token}/complete", json=complete_payload)
     assert complete_resp.status_code == 200
     body = complete_resp.json()
-    assert body.get("sealed") is True
-    assert "sha256_final" in body
+    assert body.get("sealed") is False
+    assert body["status"] == "sealing"
+    assert seal_queue == [envelope_id]
+
+    status_resp = client.get(f"/api/sign/{token}/seal-status")
+    assert status_resp.json() == {"status": "sealing", "sealed": False, "sha256_final": None}
+
+    # Run the job the Celery worker would pick up.
+    with Session(test_engine) as session:
+        seal_envelope(session, envelope_id)
 
     with Session(test_engine) as session:
         final_artifact = session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == envelope_id)).first()
         assert final_artifact is not None
         assert mock_storage[final_artifact.s3_key_pdf]
         assert mock_storage[final_artifact.s3_key_audit_json]
+        assert session.get(Envelope, envelope_id).status == "completed"
+        sealed_event = session.exec(select(Event).where(Event.envelope_id == envelope_id, Event.type == "sealed")).first()
+        assert sealed_event is not None
+
+    status_resp = client.get(f"/api/sign/{token}/seal-status")
+    assert status_resp.json()["status"] == "sealed"
+    assert status_resp.json()["sha256_final"] == final_artifact.sha256_final
+    completion_email = sent_emails[-1]
+    assert completion_email["subject"] == "Completed: subscription.pdf"
+    assert completion_email["attachments"][0]["content"] == mock_storage[final_artifact.s3_key_pdf]
+
+
+def _completed_envelope(session, project_id, document_id, signer_status="completed", text="value"):
+    envelope = Envelope(project_id=project_id, document_id=document_id, status="sent")
+    session.add(envelope)
+    session.commit()
+    session.refresh(envelope)
+    signer = Signer(envelope_id=envelope.id, name="Pat", email="pat@example.com", status=signer_status)
+    field = FieldModel(envelope_id=envelope.id, page=1, x=20, y=20, w=100, h=20, type="text")
+    session.add(signer)
+    session.add(field)
+    session.commit()
+    session.add(SignerFieldValue(signer_id=signer.id, field_id=field.id, value_json=f'{{"value":"{text}"}}'))
+    session.commit()
+    return envelope.id
+
+
+def test_sealing_resumes_after_a_failed_email_and_never_duplicates(client, test_engine, mock_storage, sent_emails, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy.exc import IntegrityError
+    from app import sealing
+
+    project_id, _ = create_project(client, "Resumable")
+    document = upload_document(client, project_id, filename="lpa.pdf", content=SIMPLE_PDF)
+    with Session(test_engine) as session:
+        envelope_id = _completed_envelope(session, project_id, document["id"])
+        session.add(Signer(envelope_id=envelope_id, name="Lee", email="lee@example.com", status="completed"))
+        session.commit()
+
+    real_send = sealing.send_email
+
+    def flaky_send(to, *args, **kwargs):
+        if to == "lee@example.com":
+            raise ConnectionError("smtp down")
+        return real_send(to, *args, **kwargs)
+
+    monkeypatch.setattr(sealing, "send_email", flaky_send)
+    with Session(test_engine) as session:
+        with pytest.raises(ConnectionError):
+            sealing.seal_envelope(session, envelope_id)
+    assert [m["to"] for m in sent_emails] == ["pat@example.com"]
+
+    # the retry finds the artifact and only mails the signer that was missed
+    monkeypatch.setattr(sealing, "send_email", real_send)
+    with Session(test_engine) as session:
+        sealing.seal_envelope(session, envelope_id)
+        sealing.seal_envelope(session, envelope_id)
+        types = session.exec(select(Event.type).where(Event.envelope_id == envelope_id)).all()
+        assert types.count("sealed") == 1 and types.count("notified") == 2
+        assert session.get(Envelope, envelope_id).status == "completed"
+        session.add(FinalArtifact(envelope_id=envelope_id, s3_key_pdf="x", s3_key_audit_json="y", sha256_final="z"))
+        with pytest.raises(IntegrityError):
+            session.commit()
+        session.rollback()
+    assert [m["to"] for m in sent_emails] == ["pat@example.com", "lee@example.com"]
+
+    with Session(test_engine) as session:
+        stuck_id = _completed_envelope(session, project_id, document["id"])
+        stuck = session.get(Envelope, stuck_id)
+        stuck.status = "sealing"
+        session.add(stuck)
+        for signer in session.exec(select(Signer).where(Signer.envelope_id == stuck_id)).all():
+            signer.completed_at = datetime.utcnow() - timedelta(hours=1)
+            session.add(signer)
+        session.commit()
+        assert sealing.stale_sealing_ids(session) == [stuck_id]
+        assert sealing.stale_sealing_ids(session, older_than_minutes=120) == []
+
+
+def test_complete_reports_seal_failed_when_the_broker_is_down(client, test_engine, mock_storage, monkeypatch):
+    from app.routers import signing
+    from app.tokens import make_sign_token
+
+    project_id, _ = create_project(client, "Broker Down")
+    document = upload_document(client, project_id, filename="lpa.pdf", content=SIMPLE_PDF)
+    with Session(test_engine) as session:
+        envelope_id = _completed_envelope(session, project_id, document["id"], signer_status="pending")
+        signer = session.exec(select(Signer).where(Signer.envelope_id == envelope_id)).one()
+
+    def unreachable(envelope_id):
+        raise ConnectionError("redis unreachable")
+
+    monkeypatch.setattr(signing, "enqueue_seal", unreachable)
+    token = make_sign_token(signer.id, envelope_id)
+    resp = client.post(f"/api/sign/{token}/complete", json={"values": {}})
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "seal_failed"
+    assert client.get(f"/api/sign/{token}/seal-status").json()["status"] == "seal_failed"
+
+
+def test_bulk_seal_endpoint_and_pool(client, test_engine, mock_storage, monkeypatch):
+    from app import sealing
+
+    project_id, _ = create_project(client, "Closing")
+    document = upload_document(client, project_id, filename="lpa.pdf", content=SIMPLE_PDF)
+    with Session(test_engine) as session:
+        done_a = _completed_envelope(session, project_id, document["id"], text="alpha")
+        done_b = _completed_envelope(session, project_id, document["id"], text="beta")
+        _completed_envelope(session, project_id, document["id"], signer_status="pending")
+
+    queued = []
+    monkeypatch.setattr(projects_router, "enqueue_bulk_seal", lambda ids, reseal: queued.append((ids, reseal)) or "task-1")
+    resp = client.post(f"/api/projects/{project_id}/seal", json={}, headers=ADMIN_HEADERS)
+    assert resp.status_code == 200
+    assert resp.json() == {"task_id": "task-1", "envelope_ids": [done_a, done_b]}
+    assert queued == [([done_a, done_b], False)]
+
+    progress = []
+    with Session(test_engine) as session:
+        report = sealing.bulk_seal(
+            session, [done_a, done_b], workers=2, progress=lambda entry, done, total: progress.append((done, total))
+        )
+    assert sorted(entry["envelope_id"] for entry in report) == [done_a, done_b]
+    assert all(entry["ok"] and entry["seal_seconds"] >= 0 for entry in report)
+    assert progress == [(1, 2), (2, 2)]
+
+    with Session(test_engine) as session:
+        artifacts = session.exec(select(FinalArtifact)).all()
+        assert {fa.envelope_id for fa in artifacts} == {done_a, done_b}
+        assert all(mock_storage[fa.s3_key_pdf] for fa in artifacts)
+        assert sealing.sealable_envelope_ids(session, project_id) == []
+        assert sealing.sealable_envelope_ids(session, project_id, reseal=True) == [done_a, done_b]
+        report = sealing.bulk_seal(session, [done_a], reseal=True, workers=1)
+        assert report[0]["ok"]
+        assert len(session.exec(select(FinalArtifact).where(FinalArtifact.envelope_id == done_a)).all()) == 1
+
+
+def test_bulk_seal_task_runs_under_a_daemonic_parent(client, test_engine, mock_storage, monkeypatch):
+    import importlib.util
+    import multiprocessing
+    from pathlib import Path
+
+    spec = importlib.util.spec_from_file_location("worker", Path(__file__).parents[2] / "worker" / "worker.py")
+    worker = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(worker)
+    monkeypatch.setattr(worker, "engine", test_engine)
+    monkeypatch.setattr(worker.bulk_seal_one, "delay", worker.bulk_seal_one.run)
+
+    project_id, _ = create_project(client, "Closing")
+    document = upload_document(client, project_id, filename="lpa.pdf", content=SIMPLE_PDF)
+    with Session(test_engine) as session:
+        ids = [_completed_envelope(session, project_id, document["id"], text=t) for t in ("alpha", "beta")]
+
+    # Celery prefork children are daemonic; a process pool there would fail
+    # with "daemonic processes are not allowed to have children".
+    results = multiprocessing.Queue()
+    child = multiprocessing.Process(target=lambda: results.put(worker.bulk_seal.run(ids)), daemon=True)
+    child.start()
+    child.join(60)
+    assert child.exitcode == 0
+    assert results.get(timeout=5) == {"queued": ids}
+
+    with Session(test_engine) as session:
+        artifacts = session.exec(select(FinalArtifact)).all()
+        assert sorted(fa.envelope_id for fa in artifacts) == ids
+    assert worker.bulk_seal_one.run(ids[0]) == {"envelope_id": ids[0], "ok": True, "skipped": True}
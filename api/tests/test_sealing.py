@@ -0,0 +1,169 @@
+from io import BytesIO
+
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+
+from app import worker_stub
+from app.worker_stub import PdfTemplate, load_template, seal_pdf
+
+SIMPLE_SIGNATURE_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/Pf8icQAAAABJRU5ErkJggg=="
+
+
+def make_pdf(pages, size=(612, 792)):
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=size)
+    for n in range(pages):
+        c.drawString(72, 720, f"Page {n + 1}")
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def text_field(page, text):
+    return {"type": "text", "page": page, "x": 72, "y": 100, "w": 120, "h": 20, "value": text}
+
+
+def initials_field(page):
+    return {"type": "initials", "page": page, "x": 400, "y": 40, "w": 60, "h": 30, "value": SIMPLE_SIGNATURE_B64}
+
+
+def test_seal_stamps_each_page_with_its_own_fields():
+    original = make_pdf(4)
+    values = {
+        "1": text_field(1, "first-page-value"),
+        "2": text_field(3, "third-page-value"),
+        "3": initials_field(3),
+    }
+
+    final_pdf, audit_json, sha_final = seal_pdf(original, 7, values)
+
+    reader = PdfReader(BytesIO(final_pdf))
+    assert len(reader.pages) == 5  # 4 pages + certificate
+    assert "first-page-value" in reader.pages[0].extract_text()
+    assert "third-page-value" in reader.pages[2].extract_text()
+    assert "value" not in reader.pages[1].extract_text()
+    assert '"envelope_id": 7' in audit_json
+
+
+def test_seal_overlay_follows_each_page_size():
+    original = make_pdf(1, size=(300, 144))
+    values = {"1": text_field(1, "small-page")}
+    final_pdf, _, _ = seal_pdf(original, 1, values)
+    reader = PdfReader(BytesIO(final_pdf))
+    assert float(reader.pages[0].mediabox.width) == 300
+    assert "small-page" in reader.pages[0].extract_text()
+
+
+def _image_xobjects(reader):
+    found = set()
+
+    def walk(resources):
+        xobjects = resources.get("/XObject") if resources else None
+        if not xobjects:
+            return
+        for ref in xobjects.values():
+            obj = ref.get_object()
+            if obj.get("/Subtype") == "/Image":
+                found.add(ref.idnum)
+            elif obj.get("/Subtype") == "/Form":
+                walk(obj.get("/Resources"))
+
+    for page in reader.pages:
+        walk(page.get("/Resources"))
+    return found
+
+
+def test_seal_embeds_repeated_initials_once():
+    original = make_pdf(10)
+    values = {str(page): initials_field(page) for page in range(1, 11)}
+    values["sig"] = {**initials_field(10), "value": f"data:image/png;base64,{SIMPLE_SIGNATURE_B64}", "x": 72}
+
+    final_pdf, _, _ = seal_pdf(original, 1, values)
+
+    reader = PdfReader(BytesIO(final_pdf))
+    assert len(_image_xobjects(reader)) == 1
+
+
+def test_seal_reads_referenced_signatures_once():
+    import base64
+    from app.signatures import normalize_signature
+
+    png = normalize_signature(base64.b64decode(SIMPLE_SIGNATURE_B64))
+    loads = []
+
+    def load_blob(digest):
+        loads.append(digest)
+        return png
+
+    original = make_pdf(3)
+    ref = "sha256:" + "ab" * 32
+    values = {str(page): {**initials_field(page), "value": ref} for page in range(1, 4)}
+
+    final_pdf, _, _ = seal_pdf(original, 1, values, load_blob=load_blob)
+
+    assert loads == ["ab" * 32]
+    assert len(_image_xobjects(PdfReader(BytesIO(final_pdf)))) == 1
+
+
+def test_seal_draws_stroke_signatures_as_vector_paths():
+    strokes = {"format": "strokes", "width": 200, "height": 80, "pen": 3,
+               "strokes": [[10, 40, 20, -10, 20, 20, 20, -20], [150, 60]]}
+    original = make_pdf(1)
+    vector_pdf, _, _ = seal_pdf(original, 1, {"sig": {**initials_field(1), "value": strokes}})
+    raster_pdf, _, _ = seal_pdf(original, 1, {"sig": initials_field(1)})
+
+    reader = PdfReader(BytesIO(vector_pdf))
+    assert not _image_xobjects(reader)
+    content = reader.pages[0].get_contents().get_data().decode("latin-1")
+    assert " l\n" in content and "\nS\n" in content
+    assert len(vector_pdf) < len(raster_pdf)
+
+
+def test_signature_normalization_trims_downscales_and_palettes():
+    from PIL import Image, ImageDraw
+    from app.signatures import normalize_signature
+
+    image = Image.new("RGBA", (2000, 1000), (255, 255, 255, 255))
+    ImageDraw.Draw(image).line((600, 500, 1400, 520), fill=(0, 0, 0, 255), width=12)
+    buf = BytesIO()
+    image.save(buf, format="PNG")
+
+    normalized = Image.open(BytesIO(normalize_signature(buf.getvalue())))
+    assert normalized.mode == "P"
+    assert normalized.width <= 600 and normalized.height <= 240
+    # the white margin is gone: the stroke's aspect ratio is what's left
+    assert normalized.width / normalized.height > 10
+
+
+def test_template_is_parsed_once_and_reusable(monkeypatch):
+    monkeypatch.setattr(worker_stub, "_template_cache", type(worker_stub._template_cache)())
+    original = make_pdf(2)
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        return original
+
+    template = load_template("doc-sha", fetch)
+    assert load_template("doc-sha", fetch) is template
+    assert len(fetches) == 1
+    assert template.geometry == [(612.0, 792.0), (612.0, 792.0)]
+
+    first, _, _ = seal_pdf(template, 1, {"1": text_field(1, "alpha-investor")})
+    second, audit_json, _ = seal_pdf(template, 2, {"1": text_field(2, "beta-investor")})
+
+    second_reader = PdfReader(BytesIO(second))
+    assert "alpha-investor" not in second_reader.pages[0].extract_text()
+    assert "beta-investor" in second_reader.pages[1].extract_text()
+    assert "alpha-investor" in PdfReader(BytesIO(first)).pages[0].extract_text()
+    assert '"sha256_original": "doc-sha"' in audit_json
+
+
+def test_template_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(worker_stub, "_template_cache", type(worker_stub._template_cache)())
+    monkeypatch.setattr(worker_stub, "TEMPLATE_CACHE_SIZE", 2)
+    original = make_pdf(1)
+    for sha in ("a", "b", "c"):
+        load_template(sha, lambda: original)
+    assert list(worker_stub._template_cache) == ["b", "c"]
+    assert isinstance(worker_stub._template_cache["c"], PdfTemplate)
@@ -3,12 +3,12 @@
 import { useCallback, useEffect, useMemo, useState, FormEvent, CSSProperties, KeyboardEvent } from 'react';
 import { useSearchParams } from 'next/navigation';
 import { theme } from '../../lib/theme';
+import { fetchAllPages } from '../../lib/pagination';
 
 type Project = {
   id: number;
   name: string;
   status: string;
-  access_token?: string | null;
 };
 
 type FinalArtifact = {
@@ -185,6 +185,8 @@ export default function AdminPage() {
   const [showProjectForm, setShowProjectForm] = useState(false);
   const [manageProjectsMode, setManageProjectsMode] = useState(false);
   const [selectedProjectIds, setSelectedProjectIds] = useState<number[]>([]);
+  // The API returns a project token only when it is issued; keep it for this session only.
+  const [issuedTokens, setIssuedTokens] = useState<Record<number, string>>({});
   const [centerTab, setCenterTab] = useState<'documents' | 'share'>('documents');
   const [deletingInvestors, setDeletingInvestors] = useState(false);
   const [isMobile, setIsMobile] = useState(false);
@@ -295,7 +297,7 @@ export default function AdminPage() {
       setAdminTokenLoading(true);
       setAdminTokenError(null);
       try {
-        const resp = await fetch(`${baseApi}/api/projects`, {
+        const resp = await fetch(`${baseApi}/api/projects?limit=1`, {
           headers: { 'X-Access-Token': candidate },
         });
         if (!resp.ok) throw new Error('Invalid token');
@@ -353,11 +355,7 @@ export default function AdminPage() {
     if (!adminToken) return;
     setProjectsLoaded(false);
     try {
-      const resp = await fetch(`${baseApi}/api/projects`, {
-        headers: { 'X-Access-Token': adminToken },
-      });
-      if (!resp.ok) throw new Error(`Failed to load projects (${resp.status})`);
-      const data = await resp.json();
+      const data = await fetchAllPages(`${baseApi}/api/projects`, adminToken, 'projects');
       const sorted = Array.isArray(data) ? [...data].sort((a, b) => (a?.id ?? 0) - (b?.id ?? 0)) : [];
       setProjects(sorted);
       cancelProjectEdit();
@@ -400,12 +398,8 @@ useEffect(() => {
       setError(null);
       try {
         const [finalsData, envelopesData] = await Promise.all([
-          fetch(`${baseApi}/api/projects/${selectedProjectId}/final-artifacts`, {
-            headers: { 'X-Access-Token': adminToken },
-          }).then((r) => r.json()),
-          fetch(`${baseApi}/api/projects/${selectedProjectId}/envelopes`, {
-            headers: { 'X-Access-Token': adminToken },
-          }).then((r) => r.json()),
+          fetchAllPages(`${baseApi}/api/projects/${selectedProjectId}/final-artifacts`, adminToken, 'final artifacts'),
+          fetchAllPages(`${baseApi}/api/projects/${selectedProjectId}/envelopes?include_links=true`, adminToken, 'envelopes'),
         ]);
         if (cancelled) return;
         setFinals(finalsData || []);
@@ -454,11 +448,7 @@ useEffect(() => {
     if (!adminToken) return;
     setLoadingInvestors(true);
     try {
-      const resp = await fetch(`${baseApi}/api/projects/${projectId}/investors`, {
-        headers: { 'X-Access-Token': adminToken },
-      });
-      if (!resp.ok) throw new Error(`Failed to load investors (${resp.status})`);
-      const list = await resp.json();
+      const list = await fetchAllPages(`${baseApi}/api/projects/${projectId}/investors`, adminToken, 'investors');
       setInvestors(list || []);
       setSelectedInvestorIds([]);
       setManageInvestorsMode(false);
@@ -498,7 +488,7 @@ useEffect(() => {
     setHoveredInvestorId(null);
     return project;
   }, [projects, selectedProjectId]);
-  const selectedProjectToken = selectedProject?.access_token ?? null;
+  const selectedProjectToken = selectedProject ? issuedTokens[selectedProject.id] ?? null : null;
   const outstandingEnvelopes = useMemo(() => envelopes.filter((env) => env.status !== 'completed'), [envelopes]);
   const envelopeMap = useMemo(() => {
     const map: Record<number, EnvelopeSummary> = {};
@@ -824,6 +814,7 @@ useEffect(() => {
       });
       if (!resp.ok) throw new Error(`Failed to create project (${resp.status})`);
       const project = await resp.json();
+      setIssuedTokens((prev) => ({ ...prev, [project.id]: project.access_token }));
       setNewProjectName('');
       setShowProjectForm(false);
       await loadProjects(project.id);
@@ -885,7 +876,8 @@ useEffect(() => {
         headers: { 'X-Access-Token': adminToken },
       });
       if (!resp.ok) throw new Error(`Failed to regenerate token (${resp.status})`);
-      await loadProjects(projectId);
+      const { access_token: token } = await resp.json();
+      setIssuedTokens((prev) => ({ ...prev, [projectId]: token }));
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to regenerate token');
     }
@@ -1985,7 +1977,7 @@ useEffect(() => {
                           wordBreak: 'break-all',
                         }}
                       >
-                        {selectedProjectToken || 'Not generated yet'}
+                        {selectedProjectToken || 'Hidden: tokens are only shown when issued. Regenerate to get a new one.'}
                       </div>
                     </div>
                     <div style={{ display: 'flex', gap: 10, flexWrap: 'wrap' }}>
@@ -2587,3 +2579,4 @@ useEffect(() => {
   );
 
 }
+
@@ -1,6 +1,7 @@
 'use client';
 
 import { useEffect, useState } from 'react';
+import { fetchAllPages } from '../../lib/pagination';
 
 type Project = {
   id: number;
@@ -48,11 +49,7 @@ export default function InvestorsPage({ onAnyChange, initialProjectId, accessTok
     setLoadingProjects(true);
     setError(null);
     try {
-      const resp = await fetch(`${base}/api/projects`, {
-        headers: { 'X-Access-Token': accessToken },
-      });
-      if (!resp.ok) throw new Error(`Failed to load projects (${resp.status})`);
-      const list = await resp.json();
+      const list: Project[] = await fetchAllPages(`${base}/api/projects`, accessToken, 'projects');
       setProjects(list || []);
       if (list?.length) {
         const match = initialProjectId ? list.find((project) => project.id === initialProjectId) : null;
@@ -79,11 +76,7 @@ export default function InvestorsPage({ onAnyChange, initialProjectId, accessTok
     setLoadingInvestors(true);
     setError(null);
     try {
-      const resp = await fetch(`${base}/api/projects/${projectId}/investors`, {
-        headers: { 'X-Access-Token': accessToken },
-      });
-      if (!resp.ok) throw new Error(`Failed to load investors (${resp.status})`);
-      const list = await resp.json();
+      const list = await fetchAllPages(`${base}/api/projects/${projectId}/investors`, accessToken, 'investors');
       setInvestors(list || []);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load investors');
@@ -5,6 +5,7 @@ import { useRouter, useSearchParams } from 'next/navigation';
 import InvestorsPage from '../investors/page';
 import { GlobalWorkerOptions } from 'pdfjs-dist/legacy/build/pdf';
 import { theme } from '../../lib/theme';
+import { fetchAllPages } from '../../lib/pagination';
 
 if (typeof window !== 'undefined') {
   GlobalWorkerOptions.workerSrc = '/pdf.worker.min.mjs';
@@ -261,7 +262,7 @@ export default function RequestSignPage() {
       setAdminTokenLoading(true);
       setAdminTokenError(null);
       try {
-        const resp = await fetch(`${baseApi}/api/projects`, {
+        const resp = await fetch(`${baseApi}/api/projects?limit=1`, {
           headers: { 'X-Access-Token': candidate },
         });
         if (!resp.ok) throw new Error('Invalid token');
@@ -309,11 +310,7 @@ export default function RequestSignPage() {
   const refreshProjects = async () => {
     if (!adminToken) return;
     try {
-      const resp = await fetch(`${baseApi}/api/projects`, {
-        headers: { 'X-Access-Token': adminToken },
-      });
-      if (!resp.ok) throw new Error(`Failed to load projects (${resp.status})`);
-      const list = await resp.json();
+      const list = await fetchAllPages(`${baseApi}/api/projects`, adminToken, 'projects');
       setProjects(list || []);
     } catch (err) {
       console.warn('project load failed', err);
@@ -365,11 +362,7 @@ export default function RequestSignPage() {
       if (!projectId || !adminToken) return;
       setInvestorsLoading(true);
       try {
-        const resp = await fetch(`${baseApi}/api/projects/${projectId}/investors`, {
-          headers: { 'X-Access-Token': adminToken },
-        });
-        if (!resp.ok) throw new Error(`Failed to load investors (${resp.status})`);
-        const list = await resp.json();
+        const list = await fetchAllPages(`${baseApi}/api/projects/${projectId}/investors`, adminToken, 'investors');
         setProjectInvestors(list || []);
       } catch (err) {
         console.warn('investor load failed', err);
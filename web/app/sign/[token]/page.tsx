@@ -22,6 +22,17 @@ type CompletionResult = {
   status?: string;
   sha?: string;
 };
+
+type StrokeSignature = {
+  format: 'strokes';
+  width: number;
+  height: number;
+  pen: number;
+  strokes: number[][];
+};
+
+const SEALING_MESSAGE = 'All signers complete. Sealing the final document…';
+const SEAL_POLL_INTERVAL_MS = 3000;
 const DEFAULT_FONT = 'sans';
 const FONT_STACKS: Record<string, string> = {
   sans: `'Inter', 'Helvetica Neue', Arial, sans-serif`,
@@ -51,13 +62,20 @@ export default function SignPage() {
 
   useEffect(() => {
     if (!token) return;
-    fetch(`${base}/api/sign/${token}`)
-      .then((r) => {
+    const load = (url: string) =>
+      fetch(url).then((r) => {
+        if (r.status === 410) throw new Error('This signing link has expired. Ask the sender for a new one.');
         if (!r.ok) throw new Error(`HTTP ${r.status}`);
         return r.json();
-      })
-      .then(setData)
-      .catch((e) => setError(String(e)));
+      });
+    // The layout (document + fields) never changes; the browser revalidates
+    // it with its ETag and usually gets a 304, so only signer state is re-sent.
+    Promise.all([
+      load(`${base}/api/sign/${token}?include_layout=false`),
+      load(`${base}/api/sign/${token}/layout`),
+    ])
+      .then(([session, layout]) => setData({ ...session, ...layout }))
+      .catch((e) => setError(e instanceof Error ? e.message : String(e)));
   }, [token]);
 
   useEffect(() => {
@@ -96,21 +114,18 @@ export default function SignPage() {
     setPdfLoading(true);
     const loadPdf = async () => {
       try {
-        const loadFromEndpoint = async (endpoint: 'pdf' | 'final-pdf') => {
-          const r = await fetch(`${base}/api/sign/${token}/${endpoint}`);
-          return r;
+        // pdf.js fetches byte ranges from the API, so early pages render
+        // before the whole document has been downloaded.
+        const onPage = (pages: PageRender[]) => {
+          if (!cancelled) setPdfPages(pages);
         };
-        let response = await loadFromEndpoint(preferFinal ? 'final-pdf' : 'pdf');
-        if (preferFinal && response.status === 404) {
-          response = await loadFromEndpoint('pdf');
+        const endpointUrl = (endpoint: 'pdf' | 'final-pdf') => `${base}/api/sign/${token}/${endpoint}`;
+        try {
+          await renderPdfPages(endpointUrl(preferFinal ? 'final-pdf' : 'pdf'), onPage);
+        } catch (e) {
+          if (!preferFinal || cancelled) throw e;
+          await renderPdfPages(endpointUrl('pdf'), onPage);
         }
-        if (!response.ok) {
-          throw new Error(`PDF HTTP ${response.status}`);
-        }
-        const buffer = await response.arrayBuffer();
-        if (cancelled) return;
-        const pages = await renderPdfPages(buffer);
-        if (!cancelled) setPdfPages(pages);
       } catch (e) {
         if (!cancelled) setPdfError(String(e));
       } finally {
@@ -158,9 +173,12 @@ export default function SignPage() {
     const finalSha = data.final_artifact?.sha256_final;
     const waiting = data.waiting_on ?? 0;
     const sealed = Boolean(finalSha);
+    const sealing = !sealed && data.envelope?.status === 'sealing';
     let message = 'Your signature has been recorded.';
     if (sealed && finalSha) {
       message = `All signers complete. Final SHA256: ${finalSha}`;
+    } else if (sealing) {
+      message = SEALING_MESSAGE;
     } else if (waiting > 0) {
       const noun = waiting === 1 ? 'signer' : 'signers';
       message = `You're all set. Waiting on ${waiting} ${noun} before sealing.`;
@@ -169,17 +187,46 @@ export default function SignPage() {
       message,
       sealed,
       waitingOn: waiting,
-      status: sealed ? 'sealed' : waiting > 0 ? 'waiting' : 'completed',
+      status: sealed ? 'sealed' : sealing ? 'sealing' : waiting > 0 ? 'waiting' : 'completed',
       sha: finalSha,
     });
     setStatusMessage(message);
-  }, [data?.signer?.status, data?.final_artifact?.sha256_final, data?.waiting_on]);
+  }, [data?.signer?.status, data?.envelope?.status, data?.final_artifact?.sha256_final, data?.waiting_on]);
 
-  const handleFieldChange = (field: any, value: any) => {
+  useEffect(() => {
+    // Sealing runs in the background worker; poll until the final PDF exists.
+    if (!token || completion?.status !== 'sealing') return;
+    let cancelled = false;
+    const timer = setInterval(async () => {
+      try {
+        const r = await fetch(`${base}/api/sign/${token}/seal-status`);
+        if (!r.ok) return;
+        const j = await r.json();
+        if (cancelled) return;
+        if (j.sealed && j.sha256_final) {
+          const message = `All signers complete. Final SHA256: ${j.sha256_final}`;
+          setCompletion((prev) => ({ ...prev, message, status: 'sealed', sealed: true, sha: j.sha256_final }));
+          setStatusMessage(message);
+        } else if (j.status === 'seal_failed') {
+          const message = 'Your signature was recorded, but sealing the final document failed. We will follow up by email.';
+          setCompletion((prev) => ({ ...prev, message, status: 'seal_failed' }));
+          setStatusMessage(message);
+        }
+      } catch {
+        // transient network errors: keep polling
+      }
+    }, SEAL_POLL_INTERVAL_MS);
+    return () => {
+      cancelled = true;
+      clearInterval(timer);
+    };
+  }, [token, completion?.status]);
+
+  const handleFieldChange = (field: any, value: any, strokes?: StrokeSignature | null) => {
     const key = String(field.id);
     setFieldValues((prev) => ({
       ...prev,
-      [key]: { ...field, value },
+      [key]: strokes === undefined ? { ...field, value } : { ...field, value, strokes },
     }));
   };
 
@@ -442,6 +489,38 @@ function Consent({ token, consented, onToggle }: { token: string; consented: boo
   );
 }
 
+// Drawn signatures are sent as vector strokes. Anything else is a PNG,
+// uploaded once and sent as a `sha256:` reference instead of base64.
+async function uploadSignatures(base: string, token: string, values: Record<string, any>) {
+  const refs = new Map<string, string>();
+  const out: Record<string, any> = {};
+  for (const [id, entry] of Object.entries(values)) {
+    const { strokes, ...meta } = entry ?? {};
+    const value = meta?.value;
+    const isImage = meta?.type === 'signature' || meta?.type === 'initials';
+    if (isImage && value && strokes) {
+      out[id] = { ...meta, value: strokes };
+      continue;
+    }
+    if (!isImage || typeof value !== 'string' || !value || value.startsWith('sha256:')) {
+      out[id] = meta;
+      continue;
+    }
+    let ref = refs.get(value);
+    if (!ref) {
+      const bytes = Uint8Array.from(atob(value), (c) => c.charCodeAt(0));
+      const form = new FormData();
+      form.append('file', new Blob([bytes], { type: 'image/png' }), 'signature.png');
+      const r = await fetch(`${base}/api/sign/${token}/signatures`, { method: 'POST', body: form });
+      if (!r.ok) throw new Error(`Failed to upload signature (${r.status})`);
+      ref = (await r.json()).ref as string;
+      refs.set(value, ref);
+    }
+    out[id] = { ...meta, value: ref };
+  }
+  return out;
+}
+
 function Complete({
   token,
   values,
@@ -470,7 +549,14 @@ function Complete({
       return;
     }
     setSending(true);
-    const payload = { values };
+    let payload;
+    try {
+      payload = { values: await uploadSignatures(base, token, values) };
+    } catch (err) {
+      onError(err instanceof Error ? err.message : 'Failed to upload signature.');
+      setSending(false);
+      return;
+    }
     const r = await fetch(`${base}/api/sign/${token}/complete`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
@@ -485,6 +571,8 @@ function Complete({
     let message = 'Completion recorded. We will email the final packet once all signers finish.';
     if (j.sealed && j.sha256_final) {
       message = `All signers complete. Final SHA256: ${j.sha256_final}`;
+    } else if (j.status === 'sealing') {
+      message = SEALING_MESSAGE;
     } else if (j.status === 'waiting') {
       const remaining =
         typeof j.waiting_on === 'number' ? `${j.waiting_on} signer(s)` : 'other signers';
@@ -558,7 +646,7 @@ function PdfSigningSurface({
   error: string | null;
   fields: any[];
   values: Record<string, any>;
-  onChange: (field: any, value: any) => void;
+  onChange: (field: any, value: any, strokes?: StrokeSignature | null) => void;
   mode?: 'edit' | 'view';
   renderOverlays?: boolean;
 }) {
@@ -606,7 +694,7 @@ function FieldOverlay({
   field: any;
   pageMeta: PageRender;
   value: any;
-  onChange: (field: any, value: any) => void;
+  onChange: (field: any, value: any, strokes?: StrokeSignature | null) => void;
   mode: 'edit' | 'view';
 }) {
   const screenWidth = field.w * pageMeta.scale;
@@ -770,7 +858,7 @@ function FieldOverlay({
         width={screenWidth}
         height={screenHeight}
         value={value}
-        onChange={(val) => onChange(field, val)}
+        onChange={(val, strokes) => onChange(field, val, strokes)}
       />
     );
   }
@@ -788,13 +876,18 @@ function SignatureFieldCanvas({
   width: number;
   height: number;
   value: string | null;
-  onChange: (val: string | null) => void;
+  onChange: (val: string | null, strokes: StrokeSignature | null) => void;
 }) {
   const canvasRef = useRef<HTMLCanvasElement | null>(null);
   const ctxRef = useRef<CanvasRenderingContext2D | null>(null);
   const ratioRef = useRef(1);
   const drawing = useRef(false);
   const lastPoint = useRef<{ x: number; y: number } | null>(null);
+  // Strokes as [x0, y0, dx1, dy1, ...] in whole pad pixels; see api/app/signatures.py.
+  const strokesRef = useRef<number[][]>([]);
+  const lastStrokePoint = useRef<{ x: number; y: number } | null>(null);
+  // Drawing over an image we have no strokes for (e.g. after a remount) falls back to PNG.
+  const rasterOnly = useRef(false);
 
   useEffect(() => {
     const canvas = canvasRef.current;
@@ -837,7 +930,12 @@ function SignatureFieldCanvas({
     event.preventDefault();
     drawing.current = true;
     event.currentTarget.setPointerCapture(event.pointerId);
-    lastPoint.current = getPoint(event);
+    const point = getPoint(event);
+    lastPoint.current = point;
+    if (value && strokesRef.current.length === 0) rasterOnly.current = true;
+    const start = { x: Math.round(point.x), y: Math.round(point.y) };
+    strokesRef.current.push([start.x, start.y]);
+    lastStrokePoint.current = start;
   };
 
   const draw = (event: ReactPointerEvent<HTMLCanvasElement>) => {
@@ -854,6 +952,13 @@ function SignatureFieldCanvas({
     ctx.lineTo(point.x, point.y);
     ctx.stroke();
     lastPoint.current = point;
+    const stroke = strokesRef.current[strokesRef.current.length - 1];
+    const prev = lastStrokePoint.current;
+    const next = { x: Math.round(point.x), y: Math.round(point.y) };
+    if (stroke && prev && (next.x !== prev.x || next.y !== prev.y)) {
+      stroke.push(next.x - prev.x, next.y - prev.y);
+      lastStrokePoint.current = next;
+    }
   };
 
   const stopDrawing = () => {
@@ -864,7 +969,16 @@ function SignatureFieldCanvas({
     if (!canvas) return;
     const dataUrl = canvas.toDataURL('image/png');
     const base64 = dataUrl.split(',')[1] || dataUrl;
-    onChange(base64);
+    const strokes: StrokeSignature | null = rasterOnly.current
+      ? null
+      : {
+          format: 'strokes',
+          width: Math.max(1, Math.round(width)),
+          height: Math.max(1, Math.round(height)),
+          pen: 3,
+          strokes: strokesRef.current.map((stroke) => [...stroke]),
+        };
+    onChange(base64, strokes);
   };
 
   const clear = () => {
@@ -875,7 +989,9 @@ function SignatureFieldCanvas({
     ctx.setTransform(1, 0, 0, 1, 0, 0);
     ctx.clearRect(0, 0, canvas.width, canvas.height);
     ctx.scale(ratio, ratio);
-    onChange(null);
+    strokesRef.current = [];
+    rasterOnly.current = false;
+    onChange(null, null);
   };
 
   const compact = width < 200 || height < 110;
@@ -965,10 +1081,9 @@ function CompletionView({
   );
 }
 
-async function renderPdfPages(buffer: ArrayBuffer): Promise<PageRender[]> {
+async function renderPdfPages(url: string, onPage?: (pages: PageRender[]) => void): Promise<PageRender[]> {
   const pdfjs = await import('pdfjs-dist/legacy/build/pdf');
-  const typedArray = new Uint8Array(buffer);
-  const pdf = await pdfjs.getDocument({ data: typedArray }).promise;
+  const pdf = await pdfjs.getDocument({ url, rangeChunkSize: 64 * 1024, disableAutoFetch: true }).promise;
   const pages: PageRender[] = [];
   for (let pageNumber = 1; pageNumber <= pdf.numPages; pageNumber += 1) {
     const page = await pdf.getPage(pageNumber);
@@ -991,6 +1106,7 @@ async function renderPdfPages(buffer: ArrayBuffer): Promise<PageRender[]> {
       baseWidth: baseViewport.width,
       baseHeight: baseViewport.height,
     });
+    onPage?.([...pages]);
   }
   return pages;
 }
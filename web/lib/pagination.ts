@@ -0,0 +1,14 @@
+// API list endpoints are cursor-paginated: the body is one page and the
+// X-Next-Cursor header, when present, fetches the next one.
+export async function fetchAllPages<T = any>(url: string, token: string, label = 'items'): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const pageUrl = cursor ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}` : url;
+    const resp = await fetch(pageUrl, { headers: { 'X-Access-Token': token } });
+    if (!resp.ok) throw new Error(`Failed to load ${label} (${resp.status})`);
+    items.push(...(await resp.json()));
+    cursor = resp.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return items;
+}
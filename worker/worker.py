@@ -1,54 +1,91 @@
-
-import os, json, hashlib
+import os
 from celery import Celery
-from minio import Minio
-from stamping import stamp_pdf
-from certificate import render_certificate
-from io import BytesIO
-from pypdf import PdfReader, PdfWriter
+from celery.schedules import crontab
+from sqlmodel import Session
+
+# The worker image ships the API's `app` package so sealing, storage and the
+# event chain share one implementation with the API.
+from app.db import engine
+from app.sealing import seal_envelope as run_seal, bulk_seal as run_bulk_seal, mark_seal_failed, stale_sealing_ids
+from app.audit import sweep as run_audit_sweep
+from app.archive import archive_completed
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 QUEUE = os.environ.get("WORKER_QUEUE", "signing")
-MINIO_ENDPOINT = os.environ.get("MINIO_ENDPOINT", "minio:9000")
-MINIO_ACCESS_KEY = os.environ.get("MINIO_ACCESS_KEY", "minioadmin")
-MINIO_SECRET_KEY = os.environ.get("MINIO_SECRET_KEY", "minioadmin")
-MINIO_BUCKET = os.environ.get("MINIO_BUCKET", "signing")
+SEAL_MAX_RETRIES = int(os.environ.get("SEAL_MAX_RETRIES", "3"))
+AUDIT_SWEEP_HOUR = int(os.environ.get("AUDIT_SWEEP_HOUR", "3"))
 
 cel = Celery("signing", broker=REDIS_URL, backend=REDIS_URL)
+cel.conf.beat_schedule = {
+    "audit-sweep": {
+        "task": "audit_sweep",
+        "schedule": crontab(hour=AUDIT_SWEEP_HOUR, minute=0),
+        "options": {"queue": QUEUE},
+    },
+    "requeue-stale-seals": {
+        "task": "requeue_stale_seals",
+        "schedule": crontab(minute="*/15"),
+        "options": {"queue": QUEUE},
+    },
+    "archive-events": {
+        "task": "archive_events",
+        "schedule": crontab(hour=AUDIT_SWEEP_HOUR, minute=30),
+        "options": {"queue": QUEUE},
+    },
+}
+
+@cel.task(name="seal_envelope", queue=QUEUE, bind=True, max_retries=SEAL_MAX_RETRIES)
+def seal_envelope(self, envelope_id: int):
+    try:
+        with Session(engine) as session:
+            fa = run_seal(session, envelope_id)
+            return {"pdf": fa.s3_key_pdf, "audit": fa.s3_key_audit_json, "sha256_final": fa.sha256_final}
+    except Exception as exc:
+        if self.request.retries >= self.max_retries:
+            with Session(engine) as session:
+                mark_seal_failed(session, envelope_id, repr(exc))
+            raise
+        raise self.retry(exc=exc, countdown=2 ** self.request.retries * 5)
+
+@cel.task(name="requeue_stale_seals", queue=QUEUE)
+def requeue_stale_seals():
+    # Envelopes whose seal job never reached the broker, or was lost.
+    with Session(engine) as session:
+        envelope_ids = stale_sealing_ids(session)
+    for envelope_id in envelope_ids:
+        seal_envelope.delay(envelope_id)
+    return {"queued": envelope_ids}
+
+@cel.task(name="bulk_seal", queue=QUEUE)
+def bulk_seal(envelope_ids: list, reseal: bool = False):
+    # Prefork children are daemonic and can't start a process pool, so fan
+    # out one task per envelope and let the worker pool seal them in parallel.
+    for envelope_id in envelope_ids:
+        bulk_seal_one.delay(envelope_id, reseal=reseal)
+    return {"queued": list(envelope_ids)}
+
+@cel.task(name="bulk_seal_one", queue=QUEUE)
+def bulk_seal_one(envelope_id: int, reseal: bool = False):
+    with Session(engine) as session:
+        report = run_bulk_seal(session, [envelope_id], reseal=reseal, workers=0)
+    return report[0] if report else {"envelope_id": envelope_id, "ok": True, "skipped": True}
+
+@cel.task(name="audit_sweep", queue=QUEUE)
+def audit_sweep():
+    # Only events appended since each envelope's last checkpoint are rehashed.
+    with Session(engine) as session:
+        reports = run_audit_sweep(session)
+    return {
+        "checked": len(reports),
+        "failed": [r["envelope_id"] for r in reports if not r["ok"]],
+    }
 
-minio = Minio(MINIO_ENDPOINT, access_key=MINIO_ACCESS_KEY, secret_key=MINIO_SECRET_KEY, secure=False)
-
-def put_bytes(key: str, data: bytes, content_type: str = "application/octet-stream"):
-    if not minio.bucket_exists(MINIO_BUCKET):
-        minio.make_bucket(MINIO_BUCKET)
-    minio.put_object(MINIO_BUCKET, key, BytesIO(data), length=len(data), content_type=content_type)
-
-def get_bytes(key: str) -> bytes:
-    resp = minio.get_object(MINIO_BUCKET, key)
-    b = resp.read(); resp.close(); resp.release_conn()
-    return b
-
-@cel.task(name="seal_envelope", queue=QUEUE)
-def seal_envelope(envelope_id: int, original_key: str, field_values: dict, project_id: int):
-    original = get_bytes(original_key)
-    stamped = stamp_pdf(original, field_values)
-    # append certificate
-    writer = PdfWriter()
-    reader = PdfReader(BytesIO(stamped))
-    for p in reader.pages:
-        writer.add_page(p)
-    cert_pdf = render_certificate({
-        "envelope_id": envelope_id,
-        "sha256_original": hashlib.sha256(original).hexdigest(),
-    })
-    cert_reader = PdfReader(BytesIO(cert_pdf))
-    for p in cert_reader.pages:
-        writer.add_page(p)
-    buf = BytesIO(); writer.write(buf); final_pdf = buf.getvalue()
-    sha_final = hashlib.sha256(final_pdf).hexdigest()
-    audit = json.dumps({"envelope_id": envelope_id, "sha256_final": sha_final})
-    key_pdf = f"projects/{project_id}/final/envelopes/{envelope_id}.pdf"
-    key_audit = f"projects/{project_id}/final/envelopes/{envelope_id}.audit.json"
-    put_bytes(key_pdf, final_pdf, "application/pdf")
-    put_bytes(key_audit, audit.encode(), "application/json")
-    return {"pdf": key_pdf, "audit": key_audit, "sha256_final": sha_final}
+@cel.task(name="archive_events", queue=QUEUE)
+def archive_events():
+    # Moves event rows of envelopes sealed EVENT_ARCHIVE_AFTER_DAYS ago to MinIO.
+    with Session(engine) as session:
+        reports = archive_completed(session)
+    return {
+        "archived": [r["envelope_id"] for r in reports if r["archived"]],
+        "skipped": {r["envelope_id"]: r["reason"] for r in reports if not r["archived"]},
+    }